@@ -3,11 +3,19 @@ import re
 import json
 import time
 import os
+import asyncio
+import contextvars
+import logging
+from collections import defaultdict
 from dotenv import load_dotenv
-from groq import Groq
-from PyPDF2 import PdfReader
-import pdfplumber
-from docx import Document
+from groq import AsyncGroq, RateLimitError
+from llm_cache import make_response_cache
+from metrics import observe_groq_attempt
+import tracing
+from ats_scorer import score_resume
+from text_extraction import SpooledUpload, detect_file_type_at, extract_text_from_bytes, extract_upload_text, extract_bytes_text
+
+logger = logging.getLogger(__name__)
 
 load_dotenv()
 
@@ -29,37 +37,379 @@ def load_groq_api_keys():
         i += 1
     return keys
 
+GROQ_MODEL = os.getenv("GROQ_MODEL", "meta-llama/llama-4-scout-17b-16e-instruct")
+# Groq endpoint override (e.g. a local stub server for load tests)
+GROQ_BASE_URL = os.getenv("GROQ_BASE_URL") or None
+GROQ_MAX_CONCURRENCY_PER_KEY = int(os.getenv("GROQ_MAX_CONCURRENCY_PER_KEY", 4))
+GROQ_REQUEST_TIMEOUT = float(os.getenv("GROQ_REQUEST_TIMEOUT", 60))
+GROQ_UNHEALTHY_BASE_SECONDS = float(os.getenv("GROQ_UNHEALTHY_BASE_SECONDS", 2))
+# Per-key budgets; set these to the plan limits of your keys
+GROQ_KEY_RPM = int(os.getenv("GROQ_KEY_RPM", 30))
+GROQ_KEY_TPM = int(os.getenv("GROQ_KEY_TPM", 6000))
+# How long a request may wait for budget before giving up
+GROQ_QUEUE_DEADLINE = float(os.getenv("GROQ_QUEUE_DEADLINE", 30))
+# Resume analysis: "llm" full-text prompt (the default, and the original behaviour),
+# or opt in to "local" keyword scoring only or "hybrid" local scoring refined by a
+# short prompt to a smaller model; both add "mode" and keyword fields to the result
+ANALYSIS_MODE = os.getenv("ANALYSIS_MODE", "llm").lower()
+ANALYSIS_MODES = ("local", "llm", "hybrid")
+GROQ_REFINE_MODEL = os.getenv("GROQ_REFINE_MODEL", "llama-3.1-8b-instant")
+
+def parse_rate_limit_duration(value):
+    """Parse Groq reset/retry headers such as '2m59.56s', '7.66s', '450ms' or '3' into seconds"""
+    if value is None:
+        return None
+    value = str(value).strip()
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    units = {"h": 3600, "m": 60, "s": 1, "ms": 0.001}
+    parts = re.findall(r'(\d+(?:\.\d+)?)(ms|h|m|s)', value)
+    if not parts:
+        return None
+    return sum(float(amount) * units[unit] for amount, unit in parts)
+
+def estimate_tokens(kwargs):
+    """Rough token cost of a request (~4 characters per token plus the completion budget)"""
+    prompt_chars = sum(len(str(m.get("content", ""))) for m in kwargs.get("messages", []))
+    return prompt_chars // 4 + int(kwargs.get("max_completion_tokens") or kwargs.get("max_tokens") or 512)
+
+class TokenBucket:
+    """Continuously refilling budget of `capacity` units per minute"""
+
+    def __init__(self, per_minute):
+        self.capacity = float(per_minute)
+        self.level = float(per_minute)
+        self.rate = per_minute / 60.0
+        self.updated = time.monotonic()
+
+    def refill(self, now):
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def seconds_until(self, amount, now):
+        self.refill(now)
+        amount = min(amount, self.capacity)
+        if self.level >= amount:
+            return 0.0
+        return (amount - self.level) / self.rate if self.rate else float("inf")
+
+    def consume(self, amount):
+        self.level -= amount
+
+    def clamp(self, remaining, now):
+        """Trust the server's view of remaining budget when it is lower than ours"""
+        self.refill(now)
+        self.level = min(self.level, float(remaining))
+
+class KeyState:
+    """Health, load and rate budget bookkeeping for one API key"""
+
+    def __init__(self, index, client, max_concurrency, rpm=GROQ_KEY_RPM, tpm=GROQ_KEY_TPM):
+        self.index = index
+        self.client = client
+        self.max_concurrency = max_concurrency
+        self.requests = TokenBucket(rpm)
+        self.tokens = TokenBucket(tpm)
+        self.in_flight = 0
+        self.successes = 0
+        self.failures = 0
+        self.rate_limited = 0
+        self.tokens_used = 0
+        self.consecutive_failures = 0
+        self.unhealthy_until = 0.0
+        self.cooldown_until = 0.0
+        self.total_latency = 0.0
+
+    def is_healthy(self, now):
+        return now >= self.unhealthy_until
+
+    def has_capacity(self):
+        return self.in_flight < self.max_concurrency
+
+    def wait_time(self, cost, now):
+        """Seconds until this key can take a request of `cost` tokens (0 = now)"""
+        return max(
+            self.cooldown_until - now,
+            self.requests.seconds_until(1, now),
+            self.tokens.seconds_until(cost, now),
+            0.0,
+        )
+
+    def headroom(self, now):
+        """Fraction of the tighter of the two budgets still available"""
+        self.requests.refill(now)
+        self.tokens.refill(now)
+        return min(self.requests.level / self.requests.capacity, self.tokens.level / self.tokens.capacity)
+
+    def reserve(self, cost):
+        self.in_flight += 1
+        self.requests.consume(1)
+        self.tokens.consume(cost)
+
+    def refund(self, cost, now):
+        """Return the tokens reserved for a request that failed before using them"""
+        self.tokens.refill(now)
+        self.tokens.level = min(self.tokens.capacity, self.tokens.level + cost)
+
+    def apply_headers(self, headers, now):
+        """Sync budgets with x-ratelimit-* response headers when present"""
+        if not headers:
+            return
+        remaining_requests = headers.get("x-ratelimit-remaining-requests")
+        remaining_tokens = headers.get("x-ratelimit-remaining-tokens")
+        try:
+            if remaining_requests is not None:
+                self.requests.clamp(float(remaining_requests), now)
+            if remaining_tokens is not None:
+                self.tokens.clamp(float(remaining_tokens), now)
+        except ValueError:
+            pass
+
+    def record_success(self, latency, reserved_tokens, used_tokens):
+        self.successes += 1
+        self.consecutive_failures = 0
+        self.unhealthy_until = 0.0
+        self.total_latency += latency
+        if used_tokens is not None:
+            self.tokens_used += used_tokens
+            # Refund (or charge) the difference between the estimate and real usage
+            self.tokens.consume(used_tokens - reserved_tokens)
+
+    def record_rate_limit(self, headers, now):
+        """Put the key into cool-down for as long as the server asks"""
+        self.rate_limited += 1
+        headers = headers or {}
+        delays = [
+            parse_rate_limit_duration(headers.get("retry-after")),
+            parse_rate_limit_duration(headers.get("x-ratelimit-reset-requests"))
+            if headers.get("x-ratelimit-remaining-requests") == "0" else None,
+            parse_rate_limit_duration(headers.get("x-ratelimit-reset-tokens"))
+            if headers.get("x-ratelimit-remaining-tokens") == "0" else None,
+        ]
+        delays = [delay for delay in delays if delay is not None]
+        self.cooldown_until = now + (max(delays) if delays else GROQ_UNHEALTHY_BASE_SECONDS)
+
+    def record_failure(self, now):
+        self.failures += 1
+        self.consecutive_failures += 1
+        # Back off exponentially so a broken key stops receiving traffic
+        backoff = min(GROQ_UNHEALTHY_BASE_SECONDS * (2 ** (self.consecutive_failures - 1)), 300)
+        self.unhealthy_until = now + backoff
+
+    def stats(self, now):
+        self.requests.refill(now)
+        self.tokens.refill(now)
+        return {
+            "index": self.index,
+            "healthy": self.is_healthy(now),
+            "in_flight": self.in_flight,
+            "max_concurrency": self.max_concurrency,
+            "successes": self.successes,
+            "failures": self.failures,
+            "rate_limited": self.rate_limited,
+            "tokens_used": self.tokens_used,
+            "requests_remaining": round(self.requests.level, 1),
+            "requests_per_minute": int(self.requests.capacity),
+            "tokens_remaining": round(self.tokens.level),
+            "tokens_per_minute": int(self.tokens.capacity),
+            "utilization": round(1 - self.headroom(now), 3),
+            "cooling_down_for_seconds": round(max(self.cooldown_until - now, 0), 1),
+            "unhealthy_for_seconds": round(max(self.unhealthy_until - now, 0), 1),
+            "avg_latency": round(self.total_latency / self.successes, 3) if self.successes else 0.0,
+        }
+
 class GroqClientPool:
-    def __init__(self, api_keys):
+    """
+    asyncio-native pool of Groq clients, one per API key.
+
+    Each key carries requests-per-minute and tokens-per-minute budgets. Requests
+    are scheduled onto the key with the most remaining budget; when no key can
+    afford a request it waits (up to queue_deadline) for budget to refill instead
+    of failing. 429 responses put the key into cool-down for as long as the
+    retry-after / x-ratelimit-reset-* headers ask, other errors bench it with
+    exponential backoff.
+    """
+
+    def __init__(self, api_keys, max_concurrency_per_key=GROQ_MAX_CONCURRENCY_PER_KEY,
+                 base_url=GROQ_BASE_URL, timeout=GROQ_REQUEST_TIMEOUT,
+                 rpm=GROQ_KEY_RPM, tpm=GROQ_KEY_TPM, queue_deadline=GROQ_QUEUE_DEADLINE):
         if not api_keys:
             raise Exception("No GROQ_API_KEY# variables found in environment.")
         self.api_keys = api_keys
-        self.clients = [Groq(api_key=key) for key in api_keys]
-        self.current_index = 0
-    
-    def get_current_client(self):
-        return self.clients[self.current_index]
-    
-    def switch_to_next_client(self):
-        self.current_index = (self.current_index + 1) % len(self.clients)
-        print(f"Switching to next API key: index {self.current_index}")
-    
-    def chat_completion(self, **kwargs):
-        attempts = 0
-        max_attempts = len(self.clients)
-        while attempts < max_attempts:
-            client = self.get_current_client()
+        self.queue_deadline = queue_deadline
+        self.keys = [
+            KeyState(index, AsyncGroq(api_key=key, base_url=base_url, timeout=timeout, max_retries=0),
+                     max_concurrency_per_key, rpm=rpm, tpm=tpm)
+            for index, key in enumerate(api_keys)
+        ]
+        self.waiting = 0
+        self.timeouts = 0
+        self._capacity_freed = None  # asyncio.Condition, created on the running loop
+
+    def _condition(self):
+        if self._capacity_freed is None:
+            self._capacity_freed = asyncio.Condition()
+        return self._capacity_freed
+
+    def _pick_key(self, cost, exclude, now):
+        """
+        Returns (key, 0) for the usable key with the most budget headroom, or
+        (None, seconds) with the shortest wait until some key frees up; benched
+        and cooling-down keys count as freeing up when their backoff ends.
+        """
+        best, best_headroom = None, -1.0
+        soonest = float("inf")
+        for key in self.keys:
+            if key.index in exclude:
+                continue
+            if not key.is_healthy(now):
+                soonest = min(soonest, key.unhealthy_until - now)
+                continue
+            wait = key.wait_time(cost, now)
+            if wait > 0 or not key.has_capacity():
+                soonest = min(soonest, wait if wait > 0 else float("inf"))
+                continue
+            headroom = key.headroom(now)
+            if headroom > best_headroom:
+                best, best_headroom = key, headroom
+        return best, soonest
+
+    async def _acquire_key(self, cost, exclude, deadline):
+        condition = self._condition()
+        async with condition:
+            self.waiting += 1
             try:
-                completion = client.chat.completions.create(**kwargs)
+                while True:
+                    now = time.monotonic()
+                    key, soonest = self._pick_key(cost, exclude, now)
+                    if key is not None:
+                        key.reserve(cost)
+                        return key
+                    # Only keys that failed this very call are ruled out; the rest are waited for
+                    if all(k.index in exclude for k in self.keys):
+                        return None
+                    remaining = deadline - now
+                    if remaining <= 0:
+                        self.timeouts += 1
+                        return None
+                    # Wake on a released slot or when budget has refilled or a cool-down
+                    # or backoff has ended, whichever is first
+                    try:
+                        await asyncio.wait_for(condition.wait(), timeout=min(soonest, remaining))
+                    except asyncio.TimeoutError:
+                        pass
+            finally:
+                self.waiting -= 1
+
+    async def _release_key(self, key):
+        condition = self._condition()
+        async with condition:
+            key.in_flight -= 1
+            condition.notify_all()
+
+    async def chat_completion(self, **kwargs):
+        cost = estimate_tokens(kwargs)
+        deadline = time.monotonic() + self.queue_deadline
+        failed = set()
+        while True:
+            key = await self._acquire_key(cost, failed, deadline)
+            if key is None:
+                break
+            start_time = time.monotonic()
+            try:
+                raw = await key.client.chat.completions.with_raw_response.create(**kwargs)
+                completion = await raw.parse()
+                now = time.monotonic()
+                usage = getattr(completion, "usage", None)
+                key.record_success(now - start_time, cost, getattr(usage, "total_tokens", None))
+                key.apply_headers(raw.headers, now)
+                observe_groq_attempt(key.index, "ok", now - start_time)
                 return completion
+            except RateLimitError as e:
+                # Quota, not a broken key: cool down and let the scheduler pick again
+                headers = getattr(getattr(e, "response", None), "headers", None)
+                key.record_rate_limit(headers, time.monotonic())
+                key.refund(cost, time.monotonic())
+                observe_groq_attempt(key.index, "rate_limited", time.monotonic() - start_time)
+                logger.warning(f"API key index {key.index} rate limited; cooling down",
+                               extra={"key_index": key.index})
             except Exception as e:
-                # You can add more specific error handling if needed (e.g., check for rate limit error code)
-                print(f"API key index {self.current_index} failed with error: {e}")
-                self.switch_to_next_client()
-                attempts += 1
-                time.sleep(1)  # brief pause before retrying
+                logger.warning(f"API key index {key.index} failed with error: {str(e)}",
+                               extra={"key_index": key.index})
+                key.record_failure(time.monotonic())
+                key.refund(cost, time.monotonic())
+                failed.add(key.index)
+                observe_groq_attempt(key.index, "error", time.monotonic() - start_time)
+            finally:
+                await self._release_key(key)
         raise Exception("All API keys exhausted or failed.")
 
+    async def chat_completion_stream(self, **kwargs):
+        """
+        Async generator of content deltas. Keys are failed over only until the
+        first token arrives; closing the generator closes the upstream response.
+        """
+        cost = estimate_tokens(kwargs)
+        deadline = time.monotonic() + self.queue_deadline
+        failed = set()
+        while True:
+            key = await self._acquire_key(cost, failed, deadline)
+            if key is None:
+                break
+            start_time = time.monotonic()
+            stream = None
+            started = False
+            try:
+                stream = await key.client.chat.completions.create(stream=True, **kwargs)
+                used_tokens = None
+                async for chunk in stream:
+                    usage = getattr(getattr(chunk, "x_groq", None), "usage", None)
+                    if usage is not None:
+                        used_tokens = getattr(usage, "total_tokens", None)
+                        _record_stream_usage(used_tokens)
+                    if chunk.choices and chunk.choices[0].delta.content:
+                        started = True
+                        yield chunk.choices[0].delta.content
+                key.record_success(time.monotonic() - start_time, cost, used_tokens)
+                observe_groq_attempt(key.index, "ok", time.monotonic() - start_time)
+                return
+            except RateLimitError as e:
+                if started:
+                    raise
+                headers = getattr(getattr(e, "response", None), "headers", None)
+                key.record_rate_limit(headers, time.monotonic())
+                key.refund(cost, time.monotonic())
+                observe_groq_attempt(key.index, "rate_limited", time.monotonic() - start_time)
+                logger.warning(f"API key index {key.index} rate limited; cooling down",
+                               extra={"key_index": key.index})
+            except Exception as e:
+                if started:
+                    raise
+                logger.warning(f"API key index {key.index} failed with error: {str(e)}",
+                               extra={"key_index": key.index})
+                key.record_failure(time.monotonic())
+                key.refund(cost, time.monotonic())
+                failed.add(key.index)
+                observe_groq_attempt(key.index, "error", time.monotonic() - start_time)
+            finally:
+                if stream is not None:
+                    await stream.close()
+                await self._release_key(key)
+        raise Exception("All API keys exhausted or failed.")
+
+    def stats(self):
+        now = time.monotonic()
+        return {
+            "keys": len(self.keys),
+            "in_flight": sum(key.in_flight for key in self.keys),
+            "waiting": self.waiting,
+            "queue_deadline_seconds": self.queue_deadline,
+            "queue_timeouts": self.timeouts,
+            "per_key": [key.stats(now) for key in self.keys],
+        }
+
 # Initialize client pool
 api_keys = load_groq_api_keys()
 client_pool = GroqClientPool(api_keys)
@@ -67,61 +417,13 @@ client_pool = GroqClientPool(api_keys)
 # --- FILE TEXT EXTRACTION FUNCTIONS ---
 
 def detect_file_type(file_bytes):
-    if file_bytes.startswith(b'%PDF'):
-        return 'pdf'
-    if file_bytes.startswith(b'PK\x03\x04'):
-        try:
-            Document(io.BytesIO(file_bytes))
-            return 'docx'
-        except:
-            pass
-    try:
-        file_bytes.decode('utf-8')
-        return 'txt'
-    except UnicodeDecodeError:
-        pass
-    for encoding in ['latin-1', 'cp1252']:
-        try:
-            file_bytes.decode(encoding)
-            return 'txt'
-        except UnicodeDecodeError:
-            continue
-    return None
+    return detect_file_type_at(io.BytesIO(file_bytes))
 
 def extract_text_from_file(file_bytes, filename=None):
-    if filename:
-        ext = filename.lower().split('.')[-1]
-    else:
-        ext = detect_file_type(file_bytes)
-        if not ext:
-            return None
-    
-    if ext == 'pdf':
-        pdf_stream = io.BytesIO(file_bytes)
-        reader = PdfReader(pdf_stream)
-        text = ""
-        for page in reader.pages:
-            text += page.extract_text() or ""
-        return text
-    
-    elif ext == 'docx':
-        doc_stream = io.BytesIO(file_bytes)
-        document = Document(doc_stream)
-        text = "\n".join([para.text for para in document.paragraphs])
-        return text
-    
-    elif ext == 'txt':
-        try:
-            return file_bytes.decode('utf-8')
-        except UnicodeDecodeError:
-            for encoding in ['latin-1', 'cp1252', 'ascii']:
-                try:
-                    return file_bytes.decode(encoding)
-                except UnicodeDecodeError:
-                    continue
+    ext = filename.lower().split('.')[-1] if filename else detect_file_type(file_bytes)
+    if not ext:
         return None
-    else:
-        raise ValueError(f"Unsupported file type: {ext}")
+    return extract_text_from_bytes(file_bytes, ext)
 
 # --- JSON EXTRACTION ---
 
@@ -141,13 +443,13 @@ def extract_json_from_text(text):
 
 # --- GROQ API CALLS USING POOL ---
 
-def get_groq_response(prompt):
+async def get_groq_response(prompt, model=GROQ_MODEL, temperature=0.7, max_completion_tokens=1024):
     try:
-        completion = client_pool.chat_completion(
-            model="meta-llama/llama-4-scout-17b-16e-instruct",
+        completion = await client_pool.chat_completion(
+            model=model,
             messages=[{"role": "user", "content": prompt}],
-            temperature=0.7,
-            max_completion_tokens=1024,
+            temperature=temperature,
+            max_completion_tokens=max_completion_tokens,
             top_p=1,
             stream=False
         )
@@ -157,10 +459,7 @@ def get_groq_response(prompt):
 
 # --- RESUME ANALYSIS FUNCTION ---
 
-def analyze_resume_against_jd(resume_file_bytes, job_description):
-    resume_text = extract_text_from_file(resume_file_bytes)
-
-    input_prompt = """
+ANALYSIS_PROMPT = """
 Act as an ATS (Application Tracking System) expert. Analyze the resume against the job description.
 
 Resume: {text}
@@ -170,96 +469,399 @@ Return ONLY a JSON with:
 {{"JD Match":"X%","MissingKeywords":["keyword1","keyword2"]}}
 """
 
-    formatted_prompt = input_prompt.format(text=resume_text, jd=job_description)
-    response = get_groq_response(formatted_prompt)
-    result = extract_json_from_text(response)
+REFINE_PROMPT = """
+Act as an ATS (Application Tracking System) expert. A keyword matcher compared a resume with a job description.
 
-    if result:
-        match_percentage = result.get("JD Match", "0%").replace("%", "")
-        try:
-            match_value = float(match_percentage)
-        except:
-            match_value = 0
+Job description keywords found in the resume: {matched}
+Job description keywords not found in the resume: {missing}
+Keyword match: {match}
+
+Job Description: {jd}
+
+Correct the missing keywords (drop ones that are not real requirements, add important requirements
+the matcher missed) and adjust the match percentage if needed.
+Return ONLY a JSON with:
+{{"JD Match":"X%","MissingKeywords":["keyword1","keyword2"]}}
+"""
 
-        if match_value >= 80:
-            assessment = "Excellent match! Your resume is well-aligned with this job."
-        elif match_value >= 60:
-            assessment = "Good match. With some improvements, your resume could be great for this role."
+# Keeps the hybrid prompt small; the keyword lists carry the resume side
+REFINE_JD_MAX_CHARS = 3000
+
+def analysis_prompt(resume_text, job_description):
+    return ANALYSIS_PROMPT.format(text=resume_text, jd=job_description)
+
+def refine_prompt(local_result, job_description):
+    return REFINE_PROMPT.format(
+        matched=", ".join(local_result["MatchedKeywords"]) or "none",
+        missing=", ".join(local_result["MissingKeywords"]) or "none",
+        match=local_result["JD Match"],
+        jd=job_description[:REFINE_JD_MAX_CHARS],
+    )
+
+async def analyze_resume_against_jd(resume, job_description, mode=None, pdf_backend=None):
+    with tracing.span("extract_resume_text"):
+        resume_text = await extract_resume_text(resume, pdf_backend)
+    return await analyze_resume_text(resume_text, job_description, mode)
+
+async def analyze_resume_text(resume_text, job_description, mode=None):
+    mode = mode or ANALYSIS_MODE
+    if mode not in ANALYSIS_MODES:
+        raise ValueError(f"Unknown analysis mode: {mode}")
+
+    if mode == "llm":
+        # Same model and response shape as before the other modes existed
+        response = await get_groq_response(analysis_prompt(resume_text, job_description))
+        return parse_analysis(response)
+
+    with tracing.span("ats_score"):
+        local_result = score_resume(resume_text, job_description)
+    if mode == "hybrid":
+        response = await get_groq_response(
+            refine_prompt(local_result, job_description), model=GROQ_REFINE_MODEL,
+            temperature=0.2, max_completion_tokens=256
+        )
+        refined = extract_json_from_text(response)
+        if refined and "JD Match" in refined:
+            refined["MatchedKeywords"] = local_result["MatchedKeywords"]
+            refined["local_match"] = local_result["JD Match"]
+            refined["mode"] = "hybrid"
+            return add_assessment(refined)
+        # Fall back to the local answer rather than failing the request. A model reply
+        # is not logged: it restates the resume and job description.
+        if response.startswith("Error: "):
+            logger.warning(f"Hybrid analysis refinement failed, returning local result: {response}")
         else:
-            assessment = "Your resume needs significant improvements to match this job description."
+            logger.warning(f"Hybrid analysis refinement returned no usable JSON ({len(response)} chars), "
+                           "returning local result")
 
-        result["assessment"] = assessment
-        return result
+    local_result["mode"] = "local"
+    return add_assessment(local_result)
+
+def parse_analysis(response):
+    """Turn the model's JSON answer into the API result with an assessment"""
+    result = extract_json_from_text(response)
+    if result:
+        return add_assessment(result)
     else:
         return {"error": "Failed to parse results"}
 
+def jd_match_percent(result):
+    """The "JD Match" percentage of an analysis result as a number"""
+    match_percentage = str(result.get("JD Match", "0%")).replace("%", "")
+    try:
+        return float(match_percentage)
+    except:
+        return 0
+
+def add_assessment(result):
+    match_value = jd_match_percent(result)
+
+    if match_value >= 80:
+        assessment = "Excellent match! Your resume is well-aligned with this job."
+    elif match_value >= 60:
+        assessment = "Good match. With some improvements, your resume could be great for this role."
+    else:
+        assessment = "Your resume needs significant improvements to match this job description."
+
+    result["assessment"] = assessment
+    return result
+
+# --- TOKEN USAGE METERING ---
+
+# Per-task token counter; set by callers that need to attribute usage (e.g. batch items)
+_usage_meter = contextvars.ContextVar("usage_meter", default=None)
+
+def start_usage_meter():
+    meter = {"total_tokens": 0, "api_calls": 0}
+    _usage_meter.set(meter)
+    return meter
+
+def _record_stream_usage(total_tokens):
+    meter = _usage_meter.get()
+    if meter is not None and total_tokens:
+        meter["api_calls"] += 1
+        meter["total_tokens"] += total_tokens
+
+def record_usage(completion):
+    meter = _usage_meter.get()
+    usage = getattr(completion, "usage", None)
+    if meter is not None:
+        meter["api_calls"] += 1
+        meter["total_tokens"] += getattr(usage, "total_tokens", 0) or 0
+
 # --- PROFILE, EXPERIENCE, PROJECT ENHANCERS ---
 
-def enhance_profile_summary(summary: str) -> str:
-    prompt = (
+response_cache = make_response_cache()
+
+async def cached_enhancement(endpoint: str, prompt: str, temperature: float = 0.7) -> str:
+    """Run an enhancement prompt through the response cache"""
+    async def compute():
+        completion = await client_pool.chat_completion(
+            model=GROQ_MODEL,
+            messages=[{"role": "user", "content": prompt}],
+            temperature=temperature,
+            max_completion_tokens=512,
+            top_p=1,
+            stream=False
+        )
+        record_usage(completion)
+        return completion.choices[0].message.content.strip()
+
+    with tracing.span("enhancement", endpoint=endpoint):
+        return await response_cache.get_or_compute(endpoint, GROQ_MODEL, prompt, temperature, compute)
+
+def profile_summary_prompt(summary: str) -> str:
+    return (
         "You are a professional resume writer. Rewrite the following resume profile summary to make it more impactful, concise, and professional. "
         "Ensure the result is a single paragraph with no bullet points, and do not include any introductory or explanatory text—return only the improved summary:\n\n"
         f"{summary}"
     )
-    completion = client_pool.chat_completion(
-        model="meta-llama/llama-4-scout-17b-16e-instruct",
-        messages=[{"role": "user", "content": prompt}],
-        temperature=0.7,
-        max_completion_tokens=512,
-        top_p=1,
-        stream=False
-    )
-    return completion.choices[0].message.content.strip()
 
-def enhance_professional_experience(experience: str) -> str:
-    prompt = (
+async def enhance_profile_summary(summary: str) -> str:
+    return await cached_enhancement("enhance_profile_summary", profile_summary_prompt(summary))
+
+def professional_experience_prompt(experience: str) -> str:
+    return (
         "You are a professional resume writer. Rewrite the following professional experience to make it results-oriented and impactful. "
         "Focus on achievements and measurable outcomes. Format it as a single paragraph, limited to less than 3 lines. "
         "Do not use bullet points, headers, or any extra labels—only return the enhanced paragraph:\n\n"
         f"{experience}"
     )
-    completion = client_pool.chat_completion(
-        model="meta-llama/llama-4-scout-17b-16e-instruct",
-        messages=[{"role": "user", "content": prompt}],
-        temperature=0.7,
-        max_completion_tokens=512,
-        top_p=1,
-        stream=False
-    )
-    return completion.choices[0].message.content.strip()
 
-def enhance_project_description(project_desc: str) -> str:
-    prompt = (
+async def enhance_professional_experience(experience: str) -> str:
+    return await cached_enhancement("enhance_professional_experience", professional_experience_prompt(experience))
+
+def project_description_prompt(project_desc: str) -> str:
+    return (
         "You are a professional resume writer. Rewrite the following project description to make it clear, results-oriented, and impactful. "
         "Highlight key achievements, technologies used, and measurable outcomes. "
         "Format it as a single paragraph, limited to less than 3 lines. "
         "Do not use bullet points, headers, or any extra labels—only return the enhanced paragraph:\n\n"
         f"{project_desc}"
     )
-    completion = client_pool.chat_completion(
-        model="meta-llama/llama-4-scout-17b-16e-instruct",
-        messages=[{"role": "user", "content": prompt}],
-        temperature=0.7,
-        max_completion_tokens=512,
-        top_p=1,
-        stream=False
-    )
-    return completion.choices[0].message.content.strip()
 
+async def enhance_project_description(project_desc: str) -> str:
+    return await cached_enhancement("enhance_project_description", project_description_prompt(project_desc))
 
-
-def enhance_paragraph(summary: str) -> str:
-    prompt = (
+def paragraph_prompt(summary: str) -> str:
+    return (
         "You are a professional cover letter writer. Rewrite the following cover letter text to a single paragraph to make it more impactful, concise, and professional. "
         "Ensure the result is a single paragraph with no bullet points, and do not include any introductory or explanatory text—return only the improved paragraph for cover letter:\n\n"
         f"{summary}"
     )
-    completion = client_pool.chat_completion(
-        model="meta-llama/llama-4-scout-17b-16e-instruct",
-        messages=[{"role": "user", "content": prompt}],
-        temperature=0.7,
-        max_completion_tokens=512,
-        top_p=1,
-        stream=False
+
+async def enhance_paragraph(summary: str) -> str:
+    return await cached_enhancement("enhance_paragraph", paragraph_prompt(summary))
+
+# --- STREAMING ENHANCEMENT ---
+
+STREAM_PROMPTS = {
+    "enhance_profile_summary": profile_summary_prompt,
+    "enhance_professional_experience": professional_experience_prompt,
+    "enhance_project_description": project_description_prompt,
+    "enhance_paragraph": paragraph_prompt,
+}
+
+class StreamStats:
+    """Time-to-first-token and cancellation counters per streaming endpoint"""
+
+    def __init__(self):
+        self._stats = defaultdict(lambda: defaultdict(float))
+
+    def record(self, endpoint, ttfb=None, completed=False, cancelled=False, cached=False):
+        stats = self._stats[endpoint]
+        stats["streams"] += 1
+        if ttfb is not None:
+            stats["first_token_count"] += 1
+            stats["ttfb_total"] += ttfb
+            stats["ttfb_max"] = max(stats["ttfb_max"], ttfb)
+        stats["completed"] += completed
+        stats["cancelled"] += cancelled
+        stats["cache_hits"] += cached
+
+    def stats(self):
+        result = {}
+        for endpoint, stats in self._stats.items():
+            count = stats["first_token_count"]
+            result[endpoint] = {
+                "streams": int(stats["streams"]),
+                "completed": int(stats["completed"]),
+                "cancelled": int(stats["cancelled"]),
+                "cache_hits": int(stats["cache_hits"]),
+                "avg_ttfb_ms": round(stats["ttfb_total"] / count * 1000, 1) if count else 0.0,
+                "max_ttfb_ms": round(stats["ttfb_max"] * 1000, 1),
+            }
+        return result
+
+stream_stats = StreamStats()
+
+async def stream_completion(endpoint: str, prompt: str, max_completion_tokens: int = 512,
+                            temperature: float = 0.7, use_cache: bool = True):
+    """
+    Yield completion text as it arrives from Groq.
+
+    A cached completion is yielded in one piece. If the consumer stops early
+    (e.g. the client disconnected) the upstream stream is closed, so no more
+    tokens are generated against the key's quota.
+    """
+    start_time = time.perf_counter()
+    ttfb = None
+    completed = cancelled = False
+    try:
+        if use_cache:
+            cached = await response_cache.lookup(endpoint, GROQ_MODEL, prompt, temperature)
+            if cached is not None:
+                ttfb = time.perf_counter() - start_time
+                yield cached
+                completed = True
+                stream_stats.record(endpoint, ttfb, completed=True, cached=True)
+                return
+
+        parts = []
+        async for token in client_pool.chat_completion_stream(
+            model=GROQ_MODEL,
+            messages=[{"role": "user", "content": prompt}],
+            temperature=temperature,
+            max_completion_tokens=max_completion_tokens,
+            top_p=1,
+        ):
+            if ttfb is None:
+                ttfb = time.perf_counter() - start_time
+            parts.append(token)
+            yield token
+        completed = True
+        if use_cache:
+            await response_cache.store(endpoint, GROQ_MODEL, prompt, temperature, "".join(parts).strip())
+        stream_stats.record(endpoint, ttfb, completed=True)
+    except (asyncio.CancelledError, GeneratorExit):
+        cancelled = True
+        stream_stats.record(endpoint, ttfb, cancelled=True)
+        raise
+    finally:
+        if not completed and not cancelled:
+            stream_stats.record(endpoint, ttfb)
+
+def stream_enhancement(endpoint: str, text: str):
+    return stream_completion(endpoint, STREAM_PROMPTS[endpoint](text))
+
+async def extract_resume_text(resume, pdf_backend=None):
+    """Text of a SpooledUpload (read page by page from disk) or of raw file bytes"""
+    # Parsing is CPU-bound, so keep it off the event loop
+    if isinstance(resume, SpooledUpload):
+        return await asyncio.to_thread(extract_upload_text, resume, pdf_backend)
+    return await asyncio.to_thread(extract_bytes_text, resume, pdf_backend)
+
+def stream_analysis(resume_text, job_description):
+    """Stream the raw analysis answer; pass the joined text to parse_analysis once it is done"""
+    return stream_completion(
+        "analyze_resume", analysis_prompt(resume_text, job_description),
+        max_completion_tokens=1024, use_cache=False
+    )
+
+# --- BATCH ENHANCEMENT ---
+
+BATCH_MAX_CONCURRENCY = int(os.getenv("BATCH_MAX_CONCURRENCY", 8))
+
+ENHANCERS = {
+    "summary": enhance_profile_summary,
+    "experience": enhance_professional_experience,
+    "project": enhance_project_description,
+    "paragraph": enhance_paragraph,
+}
+
+async def enhance_batch(items, max_concurrency=BATCH_MAX_CONCURRENCY):
+    """
+    Enhance many texts concurrently.
+
+    Args:
+        items (list): Dicts with "id", "type" (a key of ENHANCERS) and "text"
+        max_concurrency (int): Items sent to the model at the same time
+
+    Returns:
+        dict: Results keyed by item id with per-item latency and token usage
+    """
+    semaphore = asyncio.Semaphore(max_concurrency)
+
+    async def run_item(item):
+        async with semaphore:
+            meter = start_usage_meter()
+            start_time = time.perf_counter()
+            result = {"type": item["type"]}
+            try:
+                result["enhanced"] = await ENHANCERS[item["type"]](item["text"])
+            except Exception as e:
+                result["error"] = str(e)
+            result["latency_ms"] = round((time.perf_counter() - start_time) * 1000, 1)
+            result["tokens"] = meter["total_tokens"]
+            result["cached"] = meter["api_calls"] == 0 and "error" not in result
+            return item["id"], result
+
+    start_time = time.perf_counter()
+    results = dict(await asyncio.gather(*(run_item(item) for item in items)))
+    return {
+        "results": results,
+        "items": len(items),
+        "failed": sum(1 for r in results.values() if "error" in r),
+        "total_tokens": sum(r["tokens"] for r in results.values()),
+        "total_latency_ms": round((time.perf_counter() - start_time) * 1000, 1),
+    }
+
+# --- BULK ANALYSIS ---
+
+# 0 sizes concurrency to the client pool's total per-key concurrency
+BULK_MAX_CONCURRENCY = int(os.getenv("BULK_MAX_CONCURRENCY", 0))
+
+async def analyze_bulk(pairs, mode=None, max_concurrency=None):
+    """
+    Analyze many (resume text, job description) pairs concurrently.
+
+    Args:
+        pairs (list): Dicts with "id", "resume_text" and "job_description"
+        mode (str): Analysis mode passed to analyze_resume_text
+        max_concurrency (int): Analyses in flight at once
+
+    Yields:
+        dict: One {"event": "result"} per pair in completion order, then an
+        {"event": "summary"} with the ids ranked by match and the total latency
+    """
+    max_concurrency = max_concurrency or BULK_MAX_CONCURRENCY or max(
+        1, len(client_pool.keys) * GROQ_MAX_CONCURRENCY_PER_KEY
     )
-    return completion.choices[0].message.content.strip()
\ No newline at end of file
+    semaphore = asyncio.Semaphore(max_concurrency)
+
+    async def run_item(pair):
+        async with semaphore:
+            start_time = time.perf_counter()
+            item = {"event": "result", "id": pair["id"]}
+            try:
+                item["result"] = await analyze_resume_text(pair["resume_text"], pair["job_description"], mode)
+            except Exception as e:
+                item["error"] = str(e)
+            item["latency_ms"] = round((time.perf_counter() - start_time) * 1000, 1)
+            return item
+
+    start_time = time.perf_counter()
+    tasks = [asyncio.ensure_future(run_item(pair)) for pair in pairs]
+    completed = []
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            item = await next_done
+            completed.append(item)
+            yield item
+    finally:
+        # The consumer went away (e.g. client disconnect): stop the remaining calls
+        for task in tasks:
+            task.cancel()
+
+    scored = [item for item in completed if "result" in item and "error" not in item["result"]]
+    scored.sort(key=lambda item: (jd_match_percent(item["result"]), item["result"].get("score", 0)), reverse=True)
+    yield {
+        "event": "summary",
+        "ranking": [
+            {"rank": rank, "id": item["id"], "JD Match": item["result"].get("JD Match")}
+            for rank, item in enumerate(scored, 1)
+        ],
+        "items": len(pairs),
+        "failed": len(pairs) - len(scored),
+        "total_latency_ms": round((time.perf_counter() - start_time) * 1000, 1),
+    }
@@ -1,11 +1,17 @@
 from fastapi import FastAPI, HTTPException
-from fastapi import FastAPI, HTTPException, UploadFile, File, Form, Request, BackgroundTasks, Depends
-from fastapi.responses import FileResponse
+from fastapi import FastAPI, HTTPException, UploadFile, File, Form, Request, Depends, Query
+from fastapi.responses import FileResponse, JSONResponse, StreamingResponse
+from starlette.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
-from typing import List, Optional, Dict
+from typing import List, Optional, Dict, Literal
 import os
+import math
+import asyncio
 import uvicorn
-from generate_resume import generate_resume, generate_coverletter
+from generate_resume import render_resume_pdf, render_coverletter_pdf, render_pool_stats, shutdown_render_pool, init_render_worker
+from job_executor import make_cpu_pool, make_llm_pool, PoolSaturated, POOL_RETRY_AFTER, CPU_POOL_MODE
+from render_pool import RenderPoolBusy
+from template_registry import resume_templates, cover_letter_templates
 import logging
 from typing import Dict, Any, Callable
 import tempfile
@@ -13,13 +19,27 @@ import time
 from collections import defaultdict
 import uuid
 import threading
+import hashlib
+import json
+from tiered_cache import TieredCache
+from photo_processing import PhotoError, PHOTO_PREPROCESS, PHOTO_PRINT_DPI, PHOTO_JPEG_QUALITY
+from pdf_optimizer import optimize_pdf, COMPRESSION_LEVEL, COMPRESSION_LEVELS, COMPRESSION_QUALITY, BALANCED_IMAGE_DPI, MAX_IMAGE_DPI
+from text_extraction import spool_upload, UploadTooLarge, shutdown_page_executor, text_cache, TEXT_CACHE_ENABLED, UPLOAD_SPOOL_DIR, MAX_UPLOAD_BYTES
+from render_pool import RENDER_SCRATCH_DIR
+from janitor import Janitor, JANITOR_ENABLED
+from zip_stream import ZipStream
+from rate_limit import RateLimiter, make_rate_limit_backend
+from middleware import RequestPipelineMiddleware, security_headers
+import metrics
+import tracing
+from job_queue import JobQueue, JobWorker, JobQueueFull, RetryLater, JobRejected, JOB_WORKERS, check_webhook_url
+from contextlib import asynccontextmanager
 
 # PDF Compression imports
-from PyPDF2 import PdfReader, PdfWriter
 import io
 
 # Import the enhanced models
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, ValidationError
 
 class PersonalInfo_2(BaseModel):
     template_name : Optional[str] = Field(None, description="name of cover letter template")
@@ -131,7 +151,6 @@ class CoverLetterRequest(BaseModel):
     cover_letter_info : PersonalInfo_2 = Field(..., description="Information for cover letter")
 
 from dotenv import load_dotenv
-from starlette.middleware.base import BaseHTTPMiddleware
 from fastapi import FastAPI, Response, Request
 from fastapi.middleware.gzip import GZipMiddleware
 
@@ -151,289 +170,145 @@ ENVIRONMENT = os.getenv("ENVIRONMENT", "production")
 DEBUG = os.getenv("DEBUG", "false").lower() == "true"
 PORT = int(os.getenv("PORT", 8000))
 MAX_REQUEST_SIZE = int(os.getenv("MAX_REQUEST_SIZE", 52428800))  # 50MB default
+# Per-route body limits, enforced while the body streams in (see RequestPipelineMiddleware)
+JSON_MAX_BODY_BYTES = int(os.getenv("JSON_MAX_BODY_BYTES", 1024 * 1024))  # enhance / cover letter JSON
+RESUME_MAX_BODY_BYTES = int(os.getenv("RESUME_MAX_BODY_BYTES", 16 * 1024 * 1024))  # room for a base64 photo
+# Path prefix -> body limit; the longest matching prefix wins
+BODY_LIMITS = {
+    "/enhance": JSON_MAX_BODY_BYTES,
+    "/generate-cover-letter/": JSON_MAX_BODY_BYTES,
+    "/generate-resume/": RESUME_MAX_BODY_BYTES,
+    "/jobs/resume": RESUME_MAX_BODY_BYTES,
+    # A whole ResumeRequest, photo included, so not the "/enhance" JSON limit
+    "/enhance/batch": RESUME_MAX_BODY_BYTES,
+    # Bulk endpoints keep MAX_REQUEST_SIZE
+    "/generate-resume/bulk": MAX_REQUEST_SIZE,
+    "/analyze-resume/bulk": MAX_REQUEST_SIZE,
+    # One file plus the multipart framing and form fields
+    "/analyze-resume": MAX_UPLOAD_BYTES + 64 * 1024,
+}
 RATE_LIMIT_CALLS = int(os.getenv("RATE_LIMIT_CALLS", 100))
 RATE_LIMIT_PERIOD = int(os.getenv("RATE_LIMIT_PERIOD", 60))
+# Expensive endpoints (render, LLM) additionally allow one call per this many seconds per client
+ENDPOINT_RATE_LIMIT_PERIOD = float(os.getenv("ENDPOINT_RATE_LIMIT_PERIOD", 5))
+BATCH_MAX_ITEMS = int(os.getenv("BATCH_MAX_ITEMS", 50))
+BULK_ANALYSIS_MAX_ITEMS = int(os.getenv("BULK_ANALYSIS_MAX_ITEMS", 50))
+BULK_RESUME_MAX_ITEMS = int(os.getenv("BULK_RESUME_MAX_ITEMS", 500))
+BULK_RESUME_CONCURRENCY = int(os.getenv("BULK_RESUME_CONCURRENCY", 0))  # 0 = one per CPU pool worker
+BULK_RESUME_BUSY_RETRIES = int(os.getenv("BULK_RESUME_BUSY_RETRIES", 20))
+PDF_STREAM_CHUNK_BYTES = int(os.getenv("PDF_STREAM_CHUNK_BYTES", 64 * 1024))
 SECRET_KEY = os.getenv("SECRET_KEY", "change-this-in-production")
 TEMP_DIR = os.getenv("TEMP_DIR", tempfile.gettempdir())
 
 # PDF Compression configuration
 ENABLE_COMPRESSION = os.getenv("ENABLE_COMPRESSION", "true").lower() == "true"
-COMPRESSION_QUALITY = int(os.getenv("COMPRESSION_QUALITY", 50))
+
+# Rendered PDF cache configuration
+PDF_CACHE_ENABLED = os.getenv("PDF_CACHE_ENABLED", "true").lower() == "true"
+PDF_CACHE_MEMORY_BYTES = int(os.getenv("PDF_CACHE_MEMORY_BYTES", 67108864))  # 64MB default
+# The disk tier is opt-in: cached PDFs hold users' personal data, and by default a
+# render never touches the filesystem. Set PDF_CACHE_DIR (ideally on tmpfs) to enable it.
+PDF_CACHE_DIR = os.getenv("PDF_CACHE_DIR") or None
+PDF_CACHE_DISK_BYTES = int(os.getenv("PDF_CACHE_DISK_BYTES", 536870912))  # 512MB default
 
 ALLOWED_HOSTS = os.getenv("ALLOWED_HOSTS", "").split(",") if os.getenv("ALLOWED_HOSTS") else []
 
 logger.info(f"Environment: {ENVIRONMENT}")
 logger.info(f"Debug mode: {DEBUG}")
 logger.info(f"PDF Compression enabled: {ENABLE_COMPRESSION}")
+logger.info(f"PDF cache enabled: {PDF_CACHE_ENABLED}")
 logger.info(f"Allowed hosts: {ALLOWED_HOSTS}")
 
-# ========== PDF COMPRESSION FUNCTIONS ==========
-
-def compress_pdf(input_path: str, output_path: str = None, compression_level: int = 9) -> str:
-    """
-    Compress a PDF file to reduce its size.
-    
-    Args:
-        input_path (str): Path to the input PDF file
-        output_path (str, optional): Path for the compressed PDF. If None, creates a new temp file
-        compression_level (int): Compression level (0-9, where 9 is maximum compression)
-    
-    Returns:
-        str: Path to the compressed PDF file
-    """
-    try:
-        # Create output path if not provided
-        if output_path is None:
-            temp_dir = tempfile.gettempdir()
-            output_path = os.path.join(temp_dir, f"compressed_{os.path.basename(input_path)}")
-        
-        logger.info(f"Starting PDF compression: {input_path} -> {output_path}")
-        
-        # Read the input PDF
-        reader = PdfReader(input_path)
-        writser = PdfWriter()
-        
-        # Get original file size
-        original_size = os.path.getsize(input_path)
-        
-        # Copy pages to writer with compression
-        for page_num, page in enumerate(reader.pages):
-            try:
-                # Add page to writer
-                writer.add_page(page)
-                
-                # Apply compression to images and content streams
-                if hasattr(page, 'compress_content_streams'):
-                    page.compress_content_streams()
-                    
-            except Exception as page_error:
-                logger.warning(f"Error processing page {page_num + 1}: {str(page_error)}")
-                # Still add the page even if compression fails
-                writer.add_page(page)
-        
-        # Apply additional compression settings
-        try:
-            writer.compress_identical_objects(remove_duplicate_streams=True)
-        except Exception as compression_error:
-            logger.warning(f"Advanced compression failed: {str(compression_error)}")
-        
-        # Write the compressed PDF
-        with open(output_path, 'wb') as output_file:
-            writer.write(output_file)
-        
-        # Get compressed file size and calculate compression ratio
-        compressed_size = os.path.getsize(output_path)
-        compression_ratio = (1 - compressed_size / original_size) * 100 if original_size > 0 else 0
-        
-        logger.info(f"PDF compression completed. Original: {original_size} bytes, "
-                   f"Compressed: {compressed_size} bytes, "
-                   f"Reduction: {compression_ratio:.1f}%")
-        
-        return output_path
-        
-    except Exception as e:
-        logger.error(f"PDF compression failed: {str(e)}")
-        # If compression fails, return the original file
-        logger.warning("Returning original file due to compression failure")
-        return input_path
-
-
-def cleanup_temp_file(file_path: str, delay_seconds: int = 0):
-    """
-    Clean up temporary files after use.
-    
-    Args:
-        file_path (str): Path to the file to be deleted
-        delay_seconds (int): Optional delay before deletion
-    """
-    try:
-        if delay_seconds > 0:
-            time.sleep(delay_seconds)
-        
-        if os.path.exists(file_path) and file_path.startswith(tempfile.gettempdir()):
-            os.remove(file_path)
-            logger.debug(f"Cleaned up temporary file: {file_path}")
-    except Exception as e:
-        logger.warning(f"Failed to cleanup temporary file {file_path}: {str(e)}")
-
-# ========== MIDDLEWARE CLASSES ==========
-
-class ErrorHandlingMiddleware(BaseHTTPMiddleware):
-    async def dispatch(self, request: Request, call_next: Callable) -> Response:
-        try:
-            return await call_next(request)
-        except Exception as e:
-            logger.info(f"Unhandled exception: {str(e)}", exc_info=True)
-            # re raise to let Fast-api handle it
-            raise
-
-class SecurityHeadersMiddleware(BaseHTTPMiddleware):
-    """Add security headers to all responses"""
-    async def dispatch(self, request: Request, call_next: Callable) -> Response:
-        response = await call_next(request)
-        # security headers
-        response.headers['X-Content-Type-Options'] = "nosniff"
-        response.headers['X-Frame-Options'] = "Deny"
-        response.headers['X-XSS-Protection'] = "1; mode=block"
-        if ENVIRONMENT == "production":
-            response.headers['Strict-Transport-Security'] = "max-age=31536000; includeSubDomains"
-        response.headers['Referrer-Policy'] = "strict-origin-when-cross-origin"
-        response.headers['Content-Security-Policy'] = "default-src 'self'"
-        return response
-
-class RequestLoggingMiddleware(BaseHTTPMiddleware):
-    """Log all requests with timing and response status"""
-    
-    async def dispatch(self, request: Request, call_next: Callable) -> Response:
-        # Generate request ID
-        request_id = str(uuid.uuid4())[:8]
-        
-        # Log request
-        start_time = time.time()
-        client_ip = request.client.host
-        method = request.method
-        url = str(request.url)
-        
-        if DEBUG:
-            logger.debug(f"[{request_id}] {method} {url} - IP: {client_ip} - Started")
-        
-        try:
-            # Process request
-            response = await call_next(request)
-            
-            # Calculate duration
-            duration = time.time() - start_time
-            
-            # Log response
-            log_level = logging.DEBUG if response.status_code < 400 else logging.INFO
-            logger.log(log_level,
-                f"[{request_id}] {method} {url} - "
-                f"Status: {response.status_code} - "
-                f"Duration: {duration:.3f}s - "
-                f"IP: {client_ip}"
-            )
-            
-            # Add request ID to response headers
-            response.headers["X-Request-ID"] = request_id
-            
-            return response
-            
-        except Exception as e:
-            duration = time.time() - start_time
-            logger.error(
-                f"[{request_id}] {method} {url} - "
-                f"ERROR: {str(e)} - "
-                f"Duration: {duration:.3f}s - "
-                f"IP: {client_ip}"
-            )
-            raise
-
-class RequestSizeLimitMiddleware(BaseHTTPMiddleware):
-    """Limit request body size to prevent abuse"""
-    
-    def __init__(self, app, max_size: int = MAX_REQUEST_SIZE):
-        super().__init__(app)
-        self.max_size = max_size
-    
-    async def dispatch(self, request: Request, call_next: Callable) -> Response:
-        # Check content length
-        content_length = request.headers.get("content-length")
-        if content_length:
-            content_length = int(content_length)
-            if content_length > self.max_size:
-                logger.warning(f"Request too large: {content_length} bytes from {request.client.host}")
-                raise HTTPException(
-                    status_code=413,
-                    detail=f"Request too large. Max size: {self.max_size} bytes"
-                )
-        
-        return await call_next(request)
-
-class RateLimitMiddleware(BaseHTTPMiddleware):
-    """Global rate limiting middleware"""
-    
-    def __init__(self, app, calls: int = RATE_LIMIT_CALLS, period: int = RATE_LIMIT_PERIOD):
-        super().__init__(app)
-        self.calls = calls
-        self.period = period
-        self.clients = {}
-    
-    async def dispatch(self, request: Request, call_next: Callable) -> Response:
-        # Skip rate limiting for health checks in development
-        if DEBUG and request.url.path in ["/health", "/test"]:
-            return await call_next(request)
-            
-        client_ip = request.client.host
-        current_time = time.time()
-        
-        # Clean old entries
-        if client_ip in self.clients:
-            self.clients[client_ip] = [
-                timestamp for timestamp in self.clients[client_ip]
-                if current_time - timestamp < self.period
-            ]
-        else:
-            self.clients[client_ip] = []
-        
-        # Check rate limit
-        if len(self.clients[client_ip]) >= self.calls:
-            logger.warning(f"Rate limit exceeded for {client_ip}")
-            raise HTTPException(
-                status_code=429,
-                detail=f"Rate limit exceeded. Max {self.calls} calls per {self.period} seconds"
-            )
-        
-        # Add current request
-        self.clients[client_ip].append(current_time)
-        
-        return await call_next(request)
-
-class APIMonitoringMiddleware(BaseHTTPMiddleware):
-    """Monitor API performance and errors"""
-    
-    async def dispatch(self, request: Request, call_next: Callable) -> Response:
-        start_time = time.time()
-        
-        try:
-            response = await call_next(request)
-            
-            # Log metrics
-            duration = time.time() - start_time
-            endpoint = request.url.path
-            method = request.method
-            status_code = response.status_code
-            
-            # Log slow requests
-            if duration > 5.0:  # Log requests taking more than 5 seconds
-                logger.warning(f"SLOW_REQUEST: {method} {endpoint} {status_code} {duration:.3f}s")
-            elif DEBUG:
-                logger.debug(f"API_METRIC: {method} {endpoint} {status_code} {duration:.3f}s")
-            
-            return response
-            
-        except Exception as e:
-            duration = time.time() - start_time
-            logger.error(f"API_ERROR: {request.method} {request.url.path} {duration:.3f}s - {str(e)}")
-            raise
+# ========== TRACING ==========
+
+# Per-request span trees keyed by X-Request-ID (see tracing.py); None when TRACING_ENABLED=false
+tracer = tracing.make_tracer()
+
+# ========== RATE LIMITING ==========
+
+# One GCRA state per client and limiter, shared by all workers (see rate_limit.py)
+rate_limit_backend = make_rate_limit_backend()
+global_limiter = RateLimiter("global", rate_limit_backend, RATE_LIMIT_CALLS, RATE_LIMIT_PERIOD)
+endpoint_limiter = RateLimiter("endpoint", rate_limit_backend, 1, ENDPOINT_RATE_LIMIT_PERIOD)
+
+# ========== JOB EXECUTION POOLS ==========
+
+# CPU-bound render/compress work and blocking LLM calls each get their own bounded pool
+cpu_pool = make_cpu_pool(initializer=init_render_worker)
+llm_pool = make_llm_pool()
+
+# ========== FILE JANITOR ==========
+
+# One periodic sweep replaces per-request cleanup tasks. Caches evict their own
+# files, so only outputs and scratch files that can be orphaned are listed here.
+janitor = Janitor([
+    (os.path.abspath("generated_resumes"), "*.pdf"),
+    (UPLOAD_SPOOL_DIR or tempfile.gettempdir(), "upload_*"),
+    (RENDER_SCRATCH_DIR or tempfile.gettempdir(), "render_pool_*/*"),
+    (TEMP_DIR, "compressed_*.pdf"),
+])
+
+# ========== JOB QUEUE ==========
+
+# The queue lives in SQLite so every gunicorn worker can enqueue and any of them
+# can run a job; the handlers are registered once the PDF builders are defined
+job_queue = JobQueue()
+job_worker = JobWorker(job_queue, handlers={})
+
+# ========== LIFESPAN MANAGEMENT ==========
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Startup
+    resume_templates.preload()
+    cover_letter_templates.preload()
+    if JANITOR_ENABLED:
+        janitor.start()
+    job_worker.start()
+    yield
+    # Shutdown
+    await job_worker.stop()
+    await janitor.stop()
+    logger.info("Shutting down executor pools")
+    cpu_pool.shutdown()
+    llm_pool.shutdown()
+    shutdown_page_executor()
+    shutdown_render_pool()
 
 # ========== FASTAPI APPLICATION SETUP ==========
 
 app = FastAPI(
     title="Enhanced Resume Generator API", 
     version="2.0.0",
-    description="A comprehensive resume generator supporting multiple sections and formats with PDF compression"
+    description="A comprehensive resume generator supporting multiple sections and formats with PDF compression",
+    lifespan=lifespan
 )
 
-# Rate limit records for dependency-based rate limiting
-rate_limit_records = defaultdict(float)
-
-# Add middleware (order matters - first added is outermost)
-app.add_middleware(ErrorHandlingMiddleware)
-app.add_middleware(SecurityHeadersMiddleware)
-app.add_middleware(RequestLoggingMiddleware)
-app.add_middleware(APIMonitoringMiddleware)
-app.add_middleware(RequestSizeLimitMiddleware, max_size=MAX_REQUEST_SIZE)
-app.add_middleware(RateLimitMiddleware, calls=RATE_LIMIT_CALLS, period=RATE_LIMIT_PERIOD)
+@app.exception_handler(PoolSaturated)
+@app.exception_handler(RenderPoolBusy)
+async def busy_exception_handler(request: Request, exc: Exception):
+    """Shed load with 503 + Retry-After instead of queueing behind saturated pools"""
+    logger.warning(f"Load shed on {request.url.path}: {str(exc)}")
+    return JSONResponse(
+        status_code=503,
+        content={"detail": "Server is busy, please retry"},
+        headers={"Retry-After": str(getattr(exc, "retry_after", POOL_RETRY_AFTER))}
+    )
+
+# Add middleware (order matters - last added is outermost)
+# One pure-ASGI layer does request ids, size and rate limits, security headers and timing
+app.add_middleware(
+    RequestPipelineMiddleware,
+    limiter=global_limiter,
+    max_body_size=MAX_REQUEST_SIZE,
+    body_limits=BODY_LIMITS,
+    headers=security_headers(hsts=ENVIRONMENT == "production"),
+    # Skip rate limiting for health checks in development, and always for scrapes
+    rate_limit_exempt=("/metrics", "/health", "/test") if DEBUG else ("/metrics",),
+    debug=DEBUG,
+    observe=metrics.observe_request,
+    tracer=tracer,
+)
 app.add_middleware(GZipMiddleware, minimum_size=1000)
 
 # Add CORS middleware
@@ -449,17 +324,140 @@ app.add_middleware(
 class TextRequest(BaseModel):
     text: str
 
+class BatchItem(BaseModel):
+    id: str = Field(..., description="Caller-chosen id used to key the result")
+    type: Literal["summary", "experience", "project", "paragraph"] = Field(..., description="Which enhancer to use")
+    text: str = Field(..., description="Text to enhance")
+
+class BatchEnhanceRequest(BaseModel):
+    resume: Optional[ResumeRequest] = Field(None, description="Enhance every summary/experience/project field")
+    items: Optional[List[BatchItem]] = Field(None, description="Explicit list of texts to enhance")
+
 # Dependency for rate limiting
 async def rate_limiter(request: Request):
     client_ip = request.client.host
-    current_time = time.time()
+    retry_after = endpoint_limiter.check(client_ip)
+    if retry_after:
+        raise HTTPException(
+            status_code=429,
+            detail="Rate limit exceeded",
+            headers={"Retry-After": str(math.ceil(retry_after))}
+        )
+    if DEBUG:
+        logger.debug(f"Request from {client_ip} allowed")
 
-    if current_time - rate_limit_records[client_ip] < 5:
-        raise HTTPException(status_code=429, detail="Rate limit exceeded")
+# ========== RENDERED PDF CACHE ==========
 
-    rate_limit_records[client_ip] = current_time
-    if DEBUG:
-        logger.debug(f"Request from {client_ip} allowed at {current_time}")
+pdf_cache = TieredCache(
+    "pdf",
+    memory_max_bytes=PDF_CACHE_MEMORY_BYTES if PDF_CACHE_ENABLED else 0,
+    disk_dir=PDF_CACHE_DIR if PDF_CACHE_ENABLED else None,  # None unless PDF_CACHE_DIR is set
+    disk_max_bytes=PDF_CACHE_DISK_BYTES,
+    suffix=".pdf",
+)
+
+def pdf_cache_key(kind: str, clean_data: dict, registry, template_name: str, page_size: str) -> str:
+    """
+    Content address for a rendered PDF: the canonicalised request plus everything
+    else that changes the output bytes (template source, page size, compression).
+    """
+    template_hash = registry.source_hash(template_name) if template_name else ""
+    material = json.dumps({
+        "kind": kind,
+        "data": clean_data,
+        "template": template_name,
+        "template_hash": template_hash,
+        "page_size": page_size,
+        "compression": [ENABLE_COMPRESSION, COMPRESSION_LEVEL, COMPRESSION_QUALITY],
+        "photo": [PHOTO_PREPROCESS, PHOTO_PRINT_DPI, PHOTO_JPEG_QUALITY],
+    }, sort_keys=True, separators=(",", ":"), ensure_ascii=False, default=str)
+    return hashlib.sha256(material.encode("utf-8")).hexdigest()
+
+def etag_matches(request: Request, etag: str) -> bool:
+    if_none_match = request.headers.get("if-none-match")
+    if not if_none_match:
+        return False
+    candidates = [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]
+    return "*" in candidates or etag in candidates
+
+# ========== PDF JOBS (run on the CPU pool) ==========
+
+# Renders stay in memory from wkhtmltopdf to the socket; these jobs never write a file
+
+def finalize_pdf(pdf_bytes: bytes) -> bytes:
+    """Optimize a freshly rendered PDF in memory (if enabled)"""
+    if not ENABLE_COMPRESSION:
+        return pdf_bytes
+    with metrics.time_stage("pdf_optimize"):
+        return optimize_pdf(pdf_bytes)
+
+def build_resume_pdf(clean_data: dict) -> bytes:
+    pdf_bytes = render_resume_pdf(clean_data)
+    logger.info(f"Resume generated: {len(pdf_bytes)} bytes")
+    return finalize_pdf(pdf_bytes)
+
+def build_cover_letter_pdf(clean_data: dict) -> bytes:
+    pdf_bytes = render_coverletter_pdf(clean_data)
+    logger.info(f"Cover letter generated: {len(pdf_bytes)} bytes")
+    return finalize_pdf(pdf_bytes)
+
+def iter_chunks(data: bytes, chunk_size: int = PDF_STREAM_CHUNK_BYTES):
+    """Slice bytes for a StreamingResponse without copying them"""
+    view = memoryview(data)
+    for start in range(0, len(view), chunk_size):
+        yield view[start:start + chunk_size]
+
+def clean_request_data(data: BaseModel) -> dict:
+    """Model dump without None values and empty lists"""
+    clean_data = {}
+    for key, value in data.model_dump().items():
+        if value is not None:
+            if isinstance(value, list) and len(value) == 0:
+                continue
+            clean_data[key] = value
+    return clean_data
+
+def pdf_filename(name: str, suffix: str) -> str:
+    clean_name = "".join(c for c in name if c.isalnum() or c in (' ', '-', '_')).rstrip()
+    return f"{clean_name.replace(' ', '_')}_{suffix}.pdf"
+
+def resume_cache_key(clean_data: dict) -> str:
+    return pdf_cache_key(
+        "resume", clean_data, resume_templates,
+        clean_data.get('template_name'), clean_data.get('page_size')
+    )
+
+async def get_or_build_pdf(cache_key: str, build: Callable, clean_data: dict):
+    """PDF bytes from the cache or a fresh CPU pool build, and whether it was a cache hit"""
+    with tracing.span("pdf_cache_get"):
+        pdf_bytes = await run_in_threadpool(pdf_cache.get, cache_key) if PDF_CACHE_ENABLED else None
+    if pdf_bytes is not None:
+        return pdf_bytes, True
+    pdf_bytes = await cpu_pool.run(build, clean_data)
+    if PDF_CACHE_ENABLED:
+        with tracing.span("pdf_cache_put"):
+            await run_in_threadpool(pdf_cache.put, cache_key, pdf_bytes)
+    return pdf_bytes, False
+
+async def cached_pdf_response(request: Request, cache_key: str, filename: str, build: Callable, clean_data: dict) -> Response:
+    """
+    Serve a PDF from the content-addressed cache, building it on the CPU pool on a miss.
+    Clients that send the ETag back in If-None-Match get a 304 without a body.
+    """
+    etag = f'"{cache_key}"'
+    headers = {
+        "ETag": etag,
+        "Cache-Control": "private, no-cache",
+        "X-Compression-Applied": str(ENABLE_COMPRESSION).lower()
+    }
+    if PDF_CACHE_ENABLED and etag_matches(request, etag):
+        return Response(status_code=304, headers=headers)
+    
+    pdf_bytes, hit = await get_or_build_pdf(cache_key, build, clean_data)
+    headers["X-Cache"] = "HIT" if hit else "MISS"
+    headers["Content-Disposition"] = f"attachment; filename={filename}"
+    headers["Content-Length"] = str(len(pdf_bytes))
+    return StreamingResponse(iter_chunks(pdf_bytes), media_type="application/pdf", headers=headers)
 
 # ========== API ENDPOINTS ==========
 
@@ -479,114 +477,237 @@ def health_check():
     }
 
 @app.post("/generate-resume/")
-def create_resume(data: ResumeRequest, background_tasks: BackgroundTasks, dep=Depends(rate_limiter)):
+async def create_resume(data: ResumeRequest, request: Request, dep=Depends(rate_limiter)):
     """Generate and compress resume PDF"""
     try:
-        # Convert Pydantic model to dict
-        resume_data = data.model_dump()
-        
-        # Clean the data (remove None values and empty lists)
-        clean_data = {}
-        for key, value in resume_data.items():
-            if value is not None:
-                if isinstance(value, list) and len(value) == 0:
-                    continue
-                clean_data[key] = value
-        
-        # Generate resume PDF
-        original_pdf_path = generate_resume(clean_data)
-        logger.info(f"Resume generated: {original_pdf_path}")
-        
-        # Compress the PDF if enabled
-        if ENABLE_COMPRESSION:
-            compressed_pdf_path = compress_pdf(original_pdf_path)
-            final_pdf_path = compressed_pdf_path
-            
-            # Schedule cleanup of both files
-            background_tasks.add_task(cleanup_temp_file, original_pdf_path, 30)
-            if compressed_pdf_path != original_pdf_path:
-                background_tasks.add_task(cleanup_temp_file, compressed_pdf_path, 60)
-        else:
-            final_pdf_path = original_pdf_path
-            background_tasks.add_task(cleanup_temp_file, original_pdf_path, 30)
+        clean_data = clean_request_data(data)
+        filename = pdf_filename(clean_data.get('personal_info', {}).get('name', 'Resume'), "resume")
+        cache_key = resume_cache_key(clean_data)
         
-        # Create a clean filename
-        name = clean_data.get('personal_info', {}).get('name', 'Resume')
-        clean_name = "".join(c for c in name if c.isalnum() or c in (' ', '-', '_')).rstrip()
-        filename = f"{clean_name.replace(' ', '_')}_resume.pdf"
-        
-        # Prepare response headers
-        headers = {
-            "Content-Disposition": f"attachment; filename={filename}",
-            "X-Compression-Applied": str(ENABLE_COMPRESSION).lower()
-        }
-        
-        return FileResponse(
-            final_pdf_path,
-            media_type="application/pdf",
-            filename=filename,
-            headers=headers
-        )
+        return await cached_pdf_response(request, cache_key, filename, build_resume_pdf, clean_data)
         
+    except PhotoError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except (RenderPoolBusy, PoolSaturated):
+        raise
     except Exception as e:
         logger.error(f"Resume generation/compression failed: {str(e)}", exc_info=True)
         raise HTTPException(status_code=500, detail=f"Resume generation failed: {str(e)}")
 
-from ai_helper import enhance_profile_summary,analyze_resume_against_jd, enhance_paragraph, enhance_professional_experience, enhance_project_description
+from ai_helper import enhance_profile_summary,analyze_resume_against_jd, enhance_paragraph, enhance_professional_experience, enhance_project_description, client_pool, response_cache, enhance_batch, stream_enhancement, stream_analysis, extract_resume_text, parse_analysis, stream_stats, analyze_bulk
 @app.post("/generate-cover-letter/")
-def create_cover_letter(data: CoverLetterRequest, background_tasks: BackgroundTasks):
+async def create_cover_letter(data: CoverLetterRequest, request: Request):
     """Generate and compress cover letter PDF"""
     try:
-        # Convert Pydantic model to dict
-        cover_letter_data = data.model_dump()
-        
-        # Clean the data (remove None values and empty lists)
-        clean_data = {}
-        for key, value in cover_letter_data.items():
-            if value is not None:
-                if isinstance(value, list) and len(value) == 0:
-                    continue
-                clean_data[key] = value
-        
-        # Generate cover letter PDF
-        original_pdf_path = generate_coverletter(clean_data)
-        logger.info(f"Cover letter generated: {original_pdf_path}")
-        
-        # Compress the PDF if enabled
-        if ENABLE_COMPRESSION:
-            compressed_pdf_path = compress_pdf(original_pdf_path)
-            final_pdf_path = compressed_pdf_path
-            
-            # Schedule cleanup of both files
-            background_tasks.add_task(cleanup_temp_file, original_pdf_path, 30)
-            if compressed_pdf_path != original_pdf_path:
-                background_tasks.add_task(cleanup_temp_file, compressed_pdf_path, 60)
-        else:
-            final_pdf_path = original_pdf_path
-            background_tasks.add_task(cleanup_temp_file, original_pdf_path, 30)
-        
-        # Create a clean filename
-        name = clean_data.get('cover_letter_info', {}).get('name', 'Cover_Letter')
-        clean_name = "".join(c for c in name if c.isalnum() or c in (' ', '-', '_')).rstrip()
-        filename = f"{clean_name.replace(' ', '_')}_cover_letter.pdf"
-        
-        # Prepare response headers
-        headers = {
-            "Content-Disposition": f"attachment; filename={filename}",
-            "X-Compression-Applied": str(ENABLE_COMPRESSION).lower()
-        }
+        clean_data = clean_request_data(data)
+        filename = pdf_filename(clean_data.get('cover_letter_info', {}).get('name', 'Cover_Letter'), "cover_letter")
         
-        return FileResponse(
-            final_pdf_path,
-            media_type="application/pdf",
-            filename=filename,
-            headers=headers
+        info = clean_data.get('cover_letter_info', {})
+        cache_key = pdf_cache_key(
+            "cover_letter", clean_data, cover_letter_templates,
+            info.get('template_name'), info.get('page_size')
         )
         
+        return await cached_pdf_response(request, cache_key, filename, build_cover_letter_pdf, clean_data)
+        
+    except (RenderPoolBusy, PoolSaturated):
+        raise
     except Exception as e:
         logger.error(f"Cover letter generation/compression failed: {str(e)}", exc_info=True)
         raise HTTPException(status_code=500, detail=f"Cover letter generation failed: {str(e)}")
 
+# ========== BULK RESUME GENERATION ==========
+
+async def read_bulk_resumes(request: Request) -> List[dict]:
+    """
+    Validated, cleaned resume dicts from a JSON array, a {"resumes": [...]} object,
+    or NDJSON (one ResumeRequest per line, Content-Type application/x-ndjson)
+    """
+    content_type = request.headers.get("content-type", "")
+    try:
+        if "ndjson" in content_type:
+            items = []
+            buffer = b""
+            async for chunk in request.stream():
+                lines = (buffer + chunk).split(b"\n")
+                buffer = lines.pop()
+                items.extend(json.loads(line) for line in lines if line.strip())
+                if len(items) > BULK_RESUME_MAX_ITEMS:
+                    break
+            if buffer.strip():
+                items.append(json.loads(buffer))
+        else:
+            items = await request.json()
+            if isinstance(items, dict):
+                items = items.get("resumes")
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=f"Invalid JSON: {str(e)}")
+
+    if not isinstance(items, list) or not items:
+        raise HTTPException(status_code=400, detail="Send a non-empty list of resumes")
+    if len(items) > BULK_RESUME_MAX_ITEMS:
+        raise HTTPException(status_code=400, detail=f"Too many items. Max {BULK_RESUME_MAX_ITEMS} per request")
+
+    resumes = []
+    for index, item in enumerate(items):
+        try:
+            resumes.append(clean_request_data(ResumeRequest.model_validate(item)))
+        except ValidationError as e:
+            raise HTTPException(status_code=422, detail={"index": index, "errors": e.errors(include_url=False, include_context=False)})
+    return resumes
+
+async def build_bulk_resume(clean_data: dict) -> bytes:
+    """Build one resume for a bulk request, waiting out a busy pool instead of failing the archive"""
+    for attempt in range(BULK_RESUME_BUSY_RETRIES + 1):
+        try:
+            pdf_bytes, _ = await get_or_build_pdf(resume_cache_key(clean_data), build_resume_pdf, clean_data)
+            return pdf_bytes
+        except (RenderPoolBusy, PoolSaturated) as e:
+            if attempt == BULK_RESUME_BUSY_RETRIES:
+                raise
+            await asyncio.sleep(min(0.1 * 2 ** attempt, getattr(e, "retry_after", POOL_RETRY_AFTER)))
+
+@app.post("/generate-resume/bulk")
+async def create_resume_bulk(request: Request, dep=Depends(rate_limiter)):
+    """
+    Generate many resumes and stream them back as one ZIP archive.
+
+    Resumes render in parallel on the CPU pool and each PDF is written to the
+    archive as soon as it finishes, so entries arrive in completion order and only
+    the PDFs still rendering are held in memory. The archive ends with a
+    manifest.json listing each input's entry name, size or error.
+    """
+    resumes = await read_bulk_resumes(request)
+    window = BULK_RESUME_CONCURRENCY or cpu_pool.workers
+    width = len(str(len(resumes)))
+    names = [
+        f"{index + 1:0{width}d}_{pdf_filename(data.get('personal_info', {}).get('name', 'Resume'), 'resume')}"
+        for index, data in enumerate(resumes)
+    ]
+    logger.info(f"Bulk resume generation requested: {len(resumes)} resumes, {window} at a time")
+
+    async def archive():
+        start_time = time.perf_counter()
+        stream = ZipStream()
+        manifest = [None] * len(resumes)
+        tasks = {}
+        next_index = 0
+        try:
+            while tasks or next_index < len(resumes):
+                while next_index < len(resumes) and len(tasks) < window:
+                    task = asyncio.create_task(build_bulk_resume(resumes[next_index]))
+                    tasks[task] = next_index
+                    next_index += 1
+                done, _ = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    index = tasks.pop(task)
+                    try:
+                        pdf_bytes = task.result()
+                    except Exception as e:
+                        logger.error(f"Bulk resume {index} failed: {str(e)}")
+                        manifest[index] = {"index": index, "error": str(e)}
+                        continue
+                    manifest[index] = {"index": index, "file": names[index], "bytes": len(pdf_bytes)}
+                    yield stream.add(names[index], pdf_bytes)
+            yield stream.add("manifest.json", json.dumps(manifest, indent=2).encode("utf-8"))
+            yield stream.close()
+            elapsed = time.perf_counter() - start_time
+            failed = sum(1 for entry in manifest if "error" in entry)
+            logger.info(f"Bulk resume archive finished: {len(resumes) - failed} PDFs, {failed} failed, "
+                        f"{stream.bytes_written} bytes in {elapsed:.2f}s ({len(resumes) / elapsed:.2f} resumes/s)")
+        finally:
+            # Client went away (or the archive failed): stop queued renders
+            for task in tasks:
+                task.cancel()
+
+    return StreamingResponse(
+        archive(),
+        media_type="application/zip",
+        headers={"Content-Disposition": "attachment; filename=resumes.zip", "X-Accel-Buffering": "no"},
+    )
+
+# ========== ASYNC PDF JOBS ==========
+
+async def run_resume_job(clean_data: dict) -> bytes:
+    """Job handler: build (or fetch from cache) the PDF for a queued resume"""
+    try:
+        pdf_bytes, _ = await get_or_build_pdf(resume_cache_key(clean_data), build_resume_pdf, clean_data)
+        return pdf_bytes
+    except (RenderPoolBusy, PoolSaturated):
+        raise RetryLater()
+    except PhotoError as e:
+        raise JobRejected(str(e))
+
+job_worker.handlers["resume"] = run_resume_job
+
+def job_status_body(job: dict) -> dict:
+    body = {
+        "job_id": job["id"],
+        "kind": job["kind"],
+        "status": job["status"],
+        "attempts": job["attempts"],
+        "created_at": job["created_at"],
+        "started_at": job["started_at"],
+        "finished_at": job["finished_at"],
+        "status_url": f"/jobs/{job['id']}",
+    }
+    if job["status"] == "done":
+        body["pdf_url"] = f"/jobs/{job['id']}/pdf"
+    if job["status"] == "failed":
+        body["error"] = job["error"]
+    return body
+
+@app.post("/jobs/resume", status_code=202)
+async def enqueue_resume_job(
+    data: ResumeRequest,
+    webhook_url: Optional[str] = Query(None, description="URL POSTed with the job id and status when the job finishes"),
+    dep=Depends(rate_limiter),
+):
+    """Queue a resume PDF for background generation and return its job id immediately"""
+    if webhook_url:
+        try:
+            await run_in_threadpool(check_webhook_url, webhook_url)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+    clean_data = clean_request_data(data)
+    meta = {"filename": pdf_filename(clean_data.get('personal_info', {}).get('name', 'Resume'), "resume")}
+    try:
+        job_id = await run_in_threadpool(job_queue.enqueue, "resume", clean_data, meta, webhook_url)
+    except JobQueueFull as e:
+        logger.warning(f"Job queue full, rejecting resume job: {str(e)}")
+        return JSONResponse(
+            status_code=503,
+            content={"detail": "Job queue is full, please retry"},
+            headers={"Retry-After": str(e.retry_after)}
+        )
+    job = await run_in_threadpool(job_queue.get, job_id)
+    return JSONResponse(status_code=202, content=job_status_body(job), headers={"Location": f"/jobs/{job_id}"})
+
+@app.get("/jobs/{job_id}")
+async def get_job(job_id: str):
+    """Status of a queued PDF job"""
+    job = await run_in_threadpool(job_queue.get, job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job_status_body(job)
+
+@app.get("/jobs/{job_id}/pdf")
+async def get_job_pdf(job_id: str):
+    """Download the PDF of a finished job"""
+    job = await run_in_threadpool(job_queue.get, job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    if job["status"] != "done":
+        raise HTTPException(status_code=409, detail=f"Job is {job['status']}")
+    pdf_bytes = await run_in_threadpool(job_queue.result, job_id)
+    if pdf_bytes is None:
+        raise HTTPException(status_code=404, detail="Job result has expired")
+    headers = {
+        "Content-Disposition": f"attachment; filename={job['meta'].get('filename', 'resume.pdf')}",
+        "Content-Length": str(len(pdf_bytes)),
+    }
+    return StreamingResponse(iter_chunks(pdf_bytes), media_type="application/pdf", headers=headers)
+
 @app.post("/enhance_experience")
 async def enhance_experience(request: TextRequest, dep=Depends(rate_limiter)):
     """Enhance professional experience description"""
@@ -595,10 +716,10 @@ async def enhance_experience(request: TextRequest, dep=Depends(rate_limiter)):
         if not request.text.strip():
             raise HTTPException(status_code=400, detail="Text field cannot be empty")
         
-        result = enhance_professional_experience(request.text)
+        result = await llm_pool.run(enhance_professional_experience, request.text)
         logger.info("Experience enhancement completed successfully")
         return {"enhanced_experience": result}
-    except HTTPException:
+    except (HTTPException, PoolSaturated):
         raise
     except Exception as e:
         logger.error(f"Error enhancing experience: {str(e)}", exc_info=True)
@@ -612,10 +733,10 @@ async def enhance_summary(request: TextRequest, dep=Depends(rate_limiter)):
         if not request.text.strip():
             raise HTTPException(status_code=400, detail="Text field cannot be empty")
         
-        result = enhance_profile_summary(request.text)
+        result = await llm_pool.run(enhance_profile_summary, request.text)
         logger.info("Summary enhancement completed successfully")
         return {"enhanced_summary": result}
-    except HTTPException:
+    except (HTTPException, PoolSaturated):
         raise
     except Exception as e:
         logger.error(f"Error enhancing summary: {str(e)}", exc_info=True)
@@ -629,10 +750,10 @@ async def enhance_project(request: TextRequest, dep=Depends(rate_limiter)):
         if not request.text.strip():
             raise HTTPException(status_code=400, detail="Text field cannot be empty")
         
-        result = enhance_project_description(request.text)
+        result = await llm_pool.run(enhance_project_description, request.text)
         logger.info("Project enhancement completed successfully")
         return {"enhanced_project_description": result}
-    except HTTPException:
+    except (HTTPException, PoolSaturated):
         raise
     except Exception as e:
         logger.error(f"Error enhancing project: {str(e)}", exc_info=True)
@@ -646,20 +767,58 @@ async def enhanced_paragraph(request: TextRequest, dep=Depends(rate_limiter)):
         if not request.text.strip():
             raise HTTPException(status_code=400, detail="Text field cannot be empty")
         
-        result = enhance_paragraph(request.text)
+        result = await llm_pool.run(enhance_paragraph, request.text)
         logger.info("paragraph enhancement completed successfully")
         return {"enhanced_paragraph": result}
-    except HTTPException:
+    except (HTTPException, PoolSaturated):
         raise
     except Exception as e:
         logger.error(f"Error enhancing paragrph: {str(e)}", exc_info=True)
         raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
 
+def batch_items_from_resume(resume: ResumeRequest) -> list:
+    """Flatten the enhanceable fields of a resume into batch items"""
+    items = []
+    if resume.professional_summary and resume.professional_summary.strip():
+        items.append({"id": "professional_summary", "type": "summary", "text": resume.professional_summary})
+    for i, job in enumerate(resume.work_experience or []):
+        if job.description and job.description.strip():
+            items.append({"id": f"work_experience.{i}", "type": "experience", "text": job.description})
+    for i, project in enumerate(resume.academic_projects or []):
+        if project.description and project.description.strip():
+            items.append({"id": f"academic_projects.{i}", "type": "project", "text": project.description})
+    return items
+
+@app.post("/enhance/batch")
+async def enhance_batch_api(request: BatchEnhanceRequest, dep=Depends(rate_limiter)):
+    """Enhance a whole resume (or a list of texts) in one request"""
+    try:
+        items = batch_items_from_resume(request.resume) if request.resume else []
+        items += [item.model_dump() for item in request.items or [] if item.text.strip()]
+        if not items:
+            raise HTTPException(status_code=400, detail="Nothing to enhance")
+        if len(items) > BATCH_MAX_ITEMS:
+            raise HTTPException(status_code=400, detail=f"Too many items. Max {BATCH_MAX_ITEMS} per batch")
+        if len({item["id"] for item in items}) != len(items):
+            raise HTTPException(status_code=400, detail="Item ids must be unique")
+        
+        logger.info(f"Batch enhancement requested for {len(items)} items")
+        result = await llm_pool.run(enhance_batch, items)
+        logger.info(f"Batch enhancement completed: {result['total_tokens']} tokens in {result['total_latency_ms']}ms")
+        return result
+    except (HTTPException, PoolSaturated):
+        raise
+    except Exception as e:
+        logger.error(f"Error in batch enhancement: {str(e)}", exc_info=True)
+        raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
 
 @app.post('/analyze-resume')
 async def analyze_resume_api(
     resume: UploadFile = File(..., description="Resume file to analyze"),
-    job_description: str = Form(..., description="Job description to compare against"), dep=Depends(rate_limiter)
+    job_description: str = Form(..., description="Job description to compare against"),
+    mode: Optional[Literal["local", "llm", "hybrid"]] = Form(None, description="Scoring mode; defaults to ANALYSIS_MODE"),
+    pdf_backend: Optional[Literal["auto", "pypdf2", "pdfplumber"]] = Form(None, description="PDF text extractor; defaults to PDF_BACKEND"),
+    dep=Depends(rate_limiter)
 ):
     # if resume.content_type != "application/pdf":
     #     raise HTTPException(status_code=400, detail="Only PDF files are allowed.")
@@ -671,35 +830,275 @@ async def analyze_resume_api(
         raise HTTPException(status_code=400, detail="Job description is empty")
     
     try:
-        # Read the uploaded file
-        resume_content = await resume.read()
-        logger.info(f"Resume file read, size: {len(resume_content)} bytes")
-        
-        # Analyze resume against job description
-        result = analyze_resume_against_jd(resume_content, job_description)
+        # Spool the upload to disk in chunks rather than reading it into memory
+        with tracing.span("spool_upload"):
+            upload = await spool_upload(resume)
+        with upload:
+            logger.info(f"Resume file spooled, size: {upload.size} bytes")
+            
+            # Analyze resume against job description
+            result = await llm_pool.run(analyze_resume_against_jd, upload, job_description, mode, pdf_backend)
         logger.info("Resume analysis completed successfully")
         return result
         
+    except UploadTooLarge as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    except PoolSaturated:
+        raise
     except Exception as e:
         logger.error(f"Error occurred during analyzing resume: {str(e)}", exc_info=True)
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.post('/analyze-resume/bulk')
+async def analyze_resume_bulk(
+    resumes: List[UploadFile] = File(..., description="One resume, or several to compare against one job description"),
+    job_descriptions: List[str] = Form(..., description="Several job descriptions, or one to compare several resumes against"),
+    mode: Optional[Literal["local", "llm", "hybrid"]] = Form(None, description="Scoring mode; defaults to ANALYSIS_MODE"),
+    pdf_backend: Optional[Literal["auto", "pypdf2", "pdfplumber"]] = Form(None, description="PDF text extractor; defaults to PDF_BACKEND"),
+    dep=Depends(rate_limiter)
+):
+    """
+    Analyze one resume against many job descriptions, or many resumes against one.
+
+    Streams newline-delimited JSON: a "result" line per pair as it completes,
+    then a "summary" line ranking the pairs by match.
+    """
+    job_descriptions = [jd for jd in job_descriptions if jd.strip()]
+    if not job_descriptions:
+        raise HTTPException(status_code=400, detail="Job description is empty")
+    if len(resumes) > 1 and len(job_descriptions) > 1:
+        raise HTTPException(status_code=400, detail="Send one resume with many job descriptions, or many resumes with one")
+    if max(len(resumes), len(job_descriptions)) > BULK_ANALYSIS_MAX_ITEMS:
+        raise HTTPException(status_code=400, detail=f"Too many items. Max {BULK_ANALYSIS_MAX_ITEMS} per request")
+    logger.info(f"Bulk analysis requested: {len(resumes)} resumes x {len(job_descriptions)} job descriptions")
+
+    try:
+        # Each resume is extracted once, however many job descriptions it is scored against
+        async def read_resume(upload_file):
+            with await spool_upload(upload_file) as upload:
+                return await extract_resume_text(upload, pdf_backend)
+        resume_texts = await asyncio.gather(*(read_resume(r) for r in resumes))
+    except UploadTooLarge as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    except Exception as e:
+        logger.error(f"Error reading resumes for bulk analysis: {str(e)}", exc_info=True)
+        raise HTTPException(status_code=400, detail=str(e))
+
+    if len(resumes) == 1:
+        pairs = [{"id": f"job_description.{i}", "resume_text": resume_texts[0], "job_description": jd}
+                 for i, jd in enumerate(job_descriptions)]
+    else:
+        pairs = [{"id": f"resume.{i}", "filename": r.filename, "resume_text": text,
+                  "job_description": job_descriptions[0]}
+                 for i, (r, text) in enumerate(zip(resumes, resume_texts))]
+
+    llm_pool.acquire_slot()
+
+    async def lines():
+        start_time = time.perf_counter()
+        failed = True
+        results = analyze_bulk(pairs, mode)
+        filenames = {pair["id"]: pair.get("filename") for pair in pairs}
+        try:
+            async for item in results:
+                if item["event"] == "result" and filenames[item["id"]]:
+                    item["filename"] = filenames[item["id"]]
+                yield json.dumps(item) + "\n"
+            failed = False
+        except Exception as e:
+            logger.error(f"Error in bulk analysis: {str(e)}", exc_info=True)
+            yield json.dumps({"event": "error", "detail": str(e)}) + "\n"
+        finally:
+            await results.aclose()
+            llm_pool.release_slot(time.perf_counter() - start_time, failed)
+
+    return StreamingResponse(lines(), media_type="application/x-ndjson", headers={"X-Accel-Buffering": "no"})
+
+# ========== STREAMING (SSE) ENDPOINTS ==========
+
+def sse_event(data: dict, event: str = None) -> str:
+    prefix = f"event: {event}\n" if event else ""
+    return f"{prefix}data: {json.dumps(data)}\n\n"
+
+def sse_response(tokens, label: str, finish: Callable = None) -> StreamingResponse:
+    """
+    Stream tokens as server-sent events under an llm_pool slot.
+
+    The slot is taken before the response starts so a saturated pool still
+    returns 503. If the client disconnects, Starlette cancels this generator,
+    which closes the token stream and with it the upstream Groq request.
+    """
+    llm_pool.acquire_slot()
+
+    async def events():
+        start_time = time.perf_counter()
+        failed = True
+        parts = []
+        try:
+            async for token in tokens:
+                parts.append(token)
+                yield sse_event({"token": token})
+            text = "".join(parts).strip()
+            yield sse_event(finish(text) if finish else {"text": text}, event="done")
+            failed = False
+        except Exception as e:
+            logger.error(f"Error streaming {label}: {str(e)}", exc_info=True)
+            yield sse_event({"detail": str(e)}, event="error")
+        finally:
+            await tokens.aclose()
+            llm_pool.release_slot(time.perf_counter() - start_time, failed)
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+def stream_enhance_endpoint(request: TextRequest, endpoint: str) -> StreamingResponse:
+    if not request.text.strip():
+        raise HTTPException(status_code=400, detail="Text field cannot be empty")
+    logger.info(f"Streaming {endpoint} requested")
+    return sse_response(stream_enhancement(endpoint, request.text), endpoint)
+
+@app.post("/enhance_summary/stream")
+async def enhance_summary_stream(request: TextRequest, dep=Depends(rate_limiter)):
+    """Enhance profile summary, streaming tokens as server-sent events"""
+    return stream_enhance_endpoint(request, "enhance_profile_summary")
+
+@app.post("/enhance_experience/stream")
+async def enhance_experience_stream(request: TextRequest, dep=Depends(rate_limiter)):
+    """Enhance professional experience, streaming tokens as server-sent events"""
+    return stream_enhance_endpoint(request, "enhance_professional_experience")
+
+@app.post("/enhance_project/stream")
+async def enhance_project_stream(request: TextRequest, dep=Depends(rate_limiter)):
+    """Enhance project description, streaming tokens as server-sent events"""
+    return stream_enhance_endpoint(request, "enhance_project_description")
+
+@app.post("/enhance_paragraph/stream")
+async def enhance_paragraph_stream(request: TextRequest, dep=Depends(rate_limiter)):
+    """Enhance a paragraph, streaming tokens as server-sent events"""
+    return stream_enhance_endpoint(request, "enhance_paragraph")
+
+@app.post('/analyze-resume/stream')
+async def analyze_resume_stream(
+    resume: UploadFile = File(..., description="Resume file to analyze"),
+    job_description: str = Form(..., description="Job description to compare against"),
+    pdf_backend: Optional[Literal["auto", "pypdf2", "pdfplumber"]] = Form(None, description="PDF text extractor; defaults to PDF_BACKEND"),
+    dep=Depends(rate_limiter)
+):
+    """Analyze a resume against a job description; the parsed result arrives in the done event"""
+    logger.info("Streaming resume analysis requested")
+    if not job_description.strip():
+        raise HTTPException(status_code=400, detail="Job description is empty")
+    try:
+        with await spool_upload(resume) as upload:
+            resume_text = await extract_resume_text(upload, pdf_backend)
+    except UploadTooLarge as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    except Exception as e:
+        logger.error(f"Error reading resume for streaming analysis: {str(e)}", exc_info=True)
+        raise HTTPException(status_code=400, detail=str(e))
+    return sse_response(stream_analysis(resume_text, job_description), "resume analysis", parse_analysis)
+
+@app.get("/stream-stats")
+def get_stream_stats():
+    """Time to first token and cancellations per streaming endpoint"""
+    return stream_stats.stats()
+
 @app.get("/compression-stats")
 def get_compression_stats():
     """Get information about PDF compression capabilities"""
     return {
         "compression_enabled": ENABLE_COMPRESSION,
+        "compression_level": COMPRESSION_LEVEL,
         "compression_quality": COMPRESSION_QUALITY,
-        "compression_methods": ["basic", "advanced"],
+        "compression_levels": COMPRESSION_LEVELS,
+        "max_image_dpi": {"balanced": BALANCED_IMAGE_DPI, "max": MAX_IMAGE_DPI},
         "supported_formats": ["PDF"],
-        "average_compression_ratio": "20-40%",
         "environment_variables": {
             "ENABLE_COMPRESSION": "Set to 'true' or 'false'",
-            "COMPRESSION_QUALITY": "Integer from 1-100"
+            "COMPRESSION_LEVEL": "off, lossless, balanced or max",
+            "COMPRESSION_QUALITY": "Integer from 1-100 (JPEG quality of downsampled images)"
         },
         "note": "Compression is automatically applied to all generated PDFs when enabled"
     }
 
+@app.get("/executor-stats")
+def get_executor_stats():
+    """Queue depth and latency for each job execution pool"""
+    return {"cpu": {"mode": CPU_POOL_MODE, **cpu_pool.stats()}, "llm": llm_pool.stats()}
+
+@app.get("/groq-stats")
+def get_groq_stats():
+    """Per-key health and load for the Groq client pool"""
+    return client_pool.stats()
+
+@app.get("/llm-cache-stats")
+def get_llm_cache_stats():
+    """Hit/miss counters per enhance endpoint for the LLM response cache"""
+    return response_cache.stats()
+
+@app.get("/pdf-cache-stats")
+def get_pdf_cache_stats():
+    """Hit ratio and bytes served by the rendered-PDF cache"""
+    return {"pdf_cache_enabled": PDF_CACHE_ENABLED, **pdf_cache.stats()}
+
+@app.get("/text-cache-stats")
+def get_text_cache_stats():
+    """Hit ratio and parse time saved by the extracted-text cache"""
+    return {"text_cache_enabled": TEXT_CACHE_ENABLED, **text_cache.stats()}
+
+@app.get("/janitor-stats")
+def get_janitor_stats():
+    """Files removed and bytes reclaimed by the periodic file janitor"""
+    return janitor.stats()
+
+@app.get("/job-stats")
+async def get_job_stats():
+    """Queue depth by status (shared across processes) and this process's job latency histograms"""
+    depth = await run_in_threadpool(job_queue.depth)
+    return {"queue": depth, "worker": job_worker.stats()}
+
+@app.get("/rate-limit-stats")
+def get_rate_limit_stats():
+    """Allowed and limited requests for this process, per limiter"""
+    return {"global": global_limiter.stats(), "endpoint": endpoint_limiter.stats()}
+
+@app.get("/metrics")
+async def get_metrics():
+    """Prometheus exposition of request, stage, Groq and cache metrics, summed over all worker processes"""
+    if not metrics.METRICS_ENABLED:
+        raise HTTPException(status_code=404, detail="Metrics are disabled")
+    depth = await run_in_threadpool(job_queue.depth)
+    for status in ("queued", "running", "done", "failed"):
+        metrics.JOB_QUEUE_DEPTH.labels(status).set(depth[status])
+    body = await run_in_threadpool(metrics.render_latest)
+    return Response(content=body, media_type=metrics.CONTENT_TYPE_LATEST)
+
+@app.get("/trace-stats")
+def get_trace_stats():
+    """Traces recorded and exported by this process"""
+    return tracer.stats() if tracer else {"tracing_enabled": False}
+
+@app.get("/render-stats")
+def get_render_stats():
+    """
+    Get renderer pool utilisation. With CPU_POOL_MODE=process the renderers live in
+    the CPU pool's worker processes, so this only covers this process; use the
+    wkhtmltopdf stage in /metrics instead
+    """
+    return {"cpu_pool_mode": CPU_POOL_MODE, **render_pool_stats()}
+
+@app.get("/template-stats")
+def get_template_stats():
+    """Template cache counters; compiles stays flat once every template is warm (this process only)"""
+    return {
+        "cpu_pool_mode": CPU_POOL_MODE,
+        "resume_templates": resume_templates.stats(),
+        "cover_letter_templates": cover_letter_templates.stats(),
+    }
+
 @app.get("/sample-data")
 def get_sample_data():
     """Returns sample data format for testing"""
@@ -810,582 +1209,3 @@ if __name__ == "__main__":
     import os
     port = int(os.environ.get("PORT", 8000))
     uvicorn.run(app, host="0.0.0.0", port=port, reload=DEBUG)
-
-
-
-
-
-
-
-
-
-
-
-# from fastapi import FastAPI, HTTPException, UploadFile, File, Form, Request, BackgroundTasks, Depends
-# from fastapi.responses import FileResponse, StreamingResponse
-# from BestResumeMaker.components.ai_helper import (enhance_profile_summary,
-#                                                       enhance_professional_experience,
-#                                                       enhance_project_description,
-#                                                       analyze_resume_against_jd
-#                                                     #   enhance_paragraph
-#                                                        )
-                                                    
-                                                     
-# from fastapi.middleware.cors import CORSMiddleware
-# from typing import List, Optional, Dict, Union
-# import os
-# import uvicorn
-# from generate_resume import generate_resume, generate_coverletter
-# import logging
-# from typing import Dict, Any, Callable
-# import tempfile
-# import time
-# from collections import defaultdict
-# import uuid
-# import threading
-# import asyncio
-# from concurrent.futures import ThreadPoolExecutor
-# import io
-# from contextlib import asynccontextmanager
-# import aiofiles
-# from functools import lru_cache
-
-# # PDF Compression imports
-# from PyPDF2 import PdfReader, PdfWriter
-
-# # Import the enhanced models
-# from pydantic import BaseModel, Field
-
-# class PersonalInfo_2(BaseModel):
-#     template_name : Optional[str] = Field(None, description="name of cover letter template")
-#     page_size : Optional[str] = Field(None, description="page size for cover letter" )
-#     name: str = Field(..., description="Full name")
-#     title: Optional[str] = Field(None, description="Job title or profession")
-#     phone: Optional[str] = Field(None, description="Phone number")
-#     email: Optional[str] = Field(None, description="Email address")
-#     location: Optional[str] = Field(None, description="Location/Address")
-#     company_name: Optional[str] = Field(None, description="company name")
-#     hiring_manager_name: Optional[str] = Field(None, description="Manager name")
-#     paragraph : Optional[list[str]] = Field(None, description="Why are you best fit for this job")
-
-# class PersonalInfo(BaseModel):
-#     name: str = Field(..., description="Full name")
-#     title: Optional[str] = Field(None, description="Job title or profession")
-#     phone: Optional[str] = Field(None, description="Phone number")
-#     email: Optional[str] = Field(None, description="Email address")
-#     github: Optional[str] = Field(None, description="GitHub profile URL")
-#     location: Optional[str] = Field(None, description="Location/Address")
-#     linkedin: Optional[str] = Field(None, description="LinkedIn profile URL")
-#     website: Optional[str] = Field(None, description="Personal website URL")
-
-# class Custom_link(BaseModel):
-#     name: Optional[str] = Field(None, description="Link name")
-#     url: Optional[str] = Field(None, description='url')
-
-# class WorkExperience(BaseModel):
-#     company: str = Field(..., description="Company name")
-#     position: str = Field(..., description="Job position/title")
-#     start_date: str = Field(..., description="Start date")
-#     end_date: Optional[str] = Field(None, description="End date (None if current)")
-#     description: Optional[str] = Field(None, description="Job description bullet points")
-
-# class Education(BaseModel):
-#     institution: str = Field(..., description="Educational institution")
-#     degree: str = Field(..., description="Degree obtained")
-#     start_date: Optional[str] = Field(None, description="Start date")
-#     end_date: Optional[str] = Field(None, description="End date")
-
-# class AcademicProject(BaseModel):
-#     title: str = Field(..., description="Project title")
-#     date: str = Field(..., description="Project date")
-#     technologies: Optional[str] = Field(None, description="Technologies used")
-#     description: Optional[str] = Field(None, description="Job description bullet points")
-#     links: Optional[Dict[str, str]] = Field(None, description="Project links")
-
-# class Certification(BaseModel):
-#     name: str = Field(..., description="Certification name")
-#     issuer: str = Field(..., description="Issuing organization")
-#     date: str = Field(..., description="Date obtained")
-#     credential_id: Optional[str] = Field(None, description="Credential ID")
-#     url: Optional[str] = Field(None, description="Certificate URL")
-#     description: Optional[str] = Field(None, description="Job description bullet points")
-
-# class Publication(BaseModel):
-#     title: str = Field(..., description="Publication title")
-#     authors: str = Field(..., description="Authors")
-#     journal: str = Field(..., description="Journal or publication venue")
-#     date: str = Field(..., description="Publication date")
-#     url: Optional[str] = Field(None, description="Publication URL")
-#     description: Optional[str] = Field(None, description="Job description bullet points")
-
-# class Referee(BaseModel):
-#     name: str = Field(..., description="Reference name")
-#     position: str = Field(..., description="Reference position")
-#     organization: Optional[str] = Field(None, description="Organization")
-#     email: Optional[str] = Field(None, description="Email address")
-#     phone: Optional[str] = Field(None, description="Phone number")
-#     relationship: Optional[str] = Field(None, description="Relationship to applicant")
-
-# class Link(BaseModel):
-#     name: Optional[str] = Field(..., description="Display name of the link (e.g., Facebook, LinkedIn)")
-#     url: Optional[str] = Field(None, description="URL of the link")
-
-# class CustomText(BaseModel):
-#     title: str = Field(..., description="Title of custom section")
-#     description: Optional[str] = Field(None, description="Description of the custom section")
-#     link: Optional[Link] = Field(None, description="Optional link with name and URL")
-
-# class ResumeRequest(BaseModel):
-#     template_name: Optional[str] = Field("modern7", description="Template name")
-#     personal_info: PersonalInfo = Field(..., description="Personal information")
-#     photo: Optional[str] = Field(None, description="Base64-encoded image string")
-#     custom_links: Optional[list[Custom_link]] = Field(None, description="custom_links")
-#     professional_summary: Optional[str] = Field(None, description="Professional summary")
-#     page_size: Optional[str] = Field("A4", description="Page size")
-#     work_experience: Optional[List[WorkExperience]] = Field(None, description="Work experience")
-#     education: Optional[List[Education]] = Field(None, description="Education")
-#     skills: Optional[List[str]] = Field(None, description="Skills list")
-#     academic_projects: Optional[List[AcademicProject]] = Field(None, description="Academic projects")
-#     certifications: Optional[List[Certification]] = Field(None, description="Certifications")
-#     publications: Optional[List[Publication]] = Field(None, description="Publications")
-#     hobbies: Optional[List[str]] = Field(None, description="Hobbies and interests")
-#     languages: Optional[List[str]] = Field(None, description="Languages")
-#     referees: Optional[List[Referee]] = Field(None, description="References")
-#     custom_text: Optional[list[CustomText]] = Field(None, description= "custom text")
-
-# class CoverLetterRequest(BaseModel):
-#     cover_letter_info : PersonalInfo_2 = Field(..., description="Information for cover letter")
-
-# class TextRequest(BaseModel):
-#     text: str
-
-# from dotenv import load_dotenv
-# from starlette.middleware.base import BaseHTTPMiddleware
-# from fastapi import FastAPI, Response
-# from fastapi.middleware.gzip import GZipMiddleware
-
-# # Load environment variables
-# load_dotenv()
-
-# # Configure logging with better performance
-# log_level = os.getenv("LOG_LEVEL", "WARNING").upper()  # Changed default to WARNING for better performance
-# logging.basicConfig(
-#     level=getattr(logging, log_level),
-#     format='%(asctime)s - %(levelname)s - %(message)s',  # Simplified format
-#     handlers=[logging.StreamHandler()] if os.getenv("LOG_TO_CONSOLE", "true").lower() == "true" else []
-# )
-# logger = logging.getLogger(__name__)
-
-# # Environment configuration
-# ENVIRONMENT = os.getenv("ENVIRONMENT", "production")
-# DEBUG = os.getenv("DEBUG", "false").lower() == "true"
-# PORT = int(os.getenv("PORT", 8000))
-# MAX_REQUEST_SIZE = int(os.getenv("MAX_REQUEST_SIZE", 52428800))  # 50MB default
-# RATE_LIMIT_CALLS = int(os.getenv("RATE_LIMIT_CALLS", 100))
-# RATE_LIMIT_PERIOD = int(os.getenv("RATE_LIMIT_PERIOD", 60))
-# SECRET_KEY = os.getenv("SECRET_KEY", "change-this-in-production")
-# TEMP_DIR = os.getenv("TEMP_DIR", tempfile.gettempdir())
-
-# # PDF Compression configuration
-# ENABLE_COMPRESSION = os.getenv("ENABLE_COMPRESSION", "false").lower() == "true"  # Disabled by default for speed
-# COMPRESSION_QUALITY = int(os.getenv("COMPRESSION_QUALITY", 50))
-# ASYNC_PROCESSING = os.getenv("ASYNC_PROCESSING", "true").lower() == "true"
-# MAX_WORKERS = int(os.getenv("MAX_WORKERS", min(32, (os.cpu_count() or 1) + 4)))
-
-# ALLOWED_HOSTS = os.getenv("ALLOWED_HOSTS", "").split(",") if os.getenv("ALLOWED_HOSTS") else []
-
-# if DEBUG:
-#     logger.info(f"Environment: {ENVIRONMENT}")
-#     logger.info(f"Debug mode: {DEBUG}")
-#     logger.info(f"PDF Compression enabled: {ENABLE_COMPRESSION}")
-#     logger.info(f"Async processing: {ASYNC_PROCESSING}")
-#     logger.info(f"Max workers: {MAX_WORKERS}")
-
-# # ========== OPTIMIZED PDF COMPRESSION FUNCTIONS ==========
-
-# # Thread pool for CPU-intensive tasks
-# executor = ThreadPoolExecutor(max_workers=MAX_WORKERS)
-
-# async def compress_pdf_async(input_path: str, output_path: str = None, compression_level: int = 9) -> str:
-#     """
-#     Asynchronously compress a PDF file to reduce its size.
-#     """
-#     if not ENABLE_COMPRESSION:
-#         return input_path
-        
-#     loop = asyncio.get_event_loop()
-#     return await loop.run_in_executor(executor, compress_pdf_sync, input_path, output_path, compression_level)
-
-# def compress_pdf_sync(input_path: str, output_path: str = None, compression_level: int = 9) -> str:
-#     """
-#     Synchronously compress a PDF file - optimized version.
-#     """
-#     try:
-#         if output_path is None:
-#             output_path = os.path.join(TEMP_DIR, f"compressed_{uuid.uuid4().hex[:8]}_{os.path.basename(input_path)}")
-        
-#         original_size = os.path.getsize(input_path)
-        
-#         # Quick compression for small files
-#         if original_size < 1024 * 1024:  # 1MB
-#             return input_path  # Skip compression for small files
-        
-#         reader = PdfReader(input_path)
-#         writer = PdfWriter()
-        
-#         # Basic compression only for speed
-#         for page in reader.pages:
-#             writer.add_page(page)
-        
-#         # Apply minimal compression
-#         try:
-#             writer.compress_identical_objects(remove_duplicate_streams=True)
-#         except:
-#             pass  # Ignore compression errors for speed
-        
-#         with open(output_path, 'wb') as output_file:
-#             writer.write(output_file)
-        
-#         compressed_size = os.path.getsize(output_path)
-        
-#         # Only use compressed version if it's significantly smaller
-#         if compressed_size < original_size * 0.8:
-#             return output_path
-#         else:
-#             os.remove(output_path)  # Remove if compression wasn't effective
-#             return input_path
-            
-#     except Exception as e:
-#         logger.warning(f"PDF compression failed: {str(e)}")
-#         return input_path
-
-# @lru_cache(maxsize=128)
-# def get_clean_filename(name: str) -> str:
-#     """Cached filename cleaning"""
-#     clean_name = "".join(c for c in name if c.isalnum() or c in (' ', '-', '_')).rstrip()
-#     return clean_name.replace(' ', '_') if clean_name else "Document"
-
-# # Optimized cleanup with async file operations
-# async def async_cleanup_temp_file(file_path: str, delay_seconds: int = 0):
-#     """Asynchronously clean up temporary files"""
-#     try:
-#         if delay_seconds > 0:
-#             await asyncio.sleep(delay_seconds)
-        
-#         if os.path.exists(file_path) and file_path.startswith(TEMP_DIR):
-#             await asyncio.to_thread(os.remove, file_path)
-#             if DEBUG:
-#                 logger.debug(f"Cleaned up temporary file: {file_path}")
-#     except Exception as e:
-#         logger.warning(f"Failed to cleanup temporary file {file_path}: {str(e)}")
-
-# # ========== OPTIMIZED MIDDLEWARE CLASSES ==========
-
-# class MinimalLoggingMiddleware(BaseHTTPMiddleware):
-#     """Minimal logging middleware for production performance"""
-    
-#     async def dispatch(self, request: Request, call_next: Callable) -> Response:
-#         if not DEBUG:
-#             # Skip detailed logging in production
-#             return await call_next(request)
-            
-#         start_time = time.time()
-#         response = await call_next(request)
-        
-#         if response.status_code >= 400:  # Only log errors
-#             duration = time.time() - start_time
-#             logger.warning(f"{request.method} {request.url.path} - Status: {response.status_code} - Duration: {duration:.3f}s")
-        
-#         return response
-
-# class OptimizedRateLimitMiddleware(BaseHTTPMiddleware):
-#     """Optimized rate limiting with sliding window"""
-    
-#     def __init__(self, app, calls: int = RATE_LIMIT_CALLS, period: int = RATE_LIMIT_PERIOD):
-#         super().__init__(app)
-#         self.calls = calls
-#         self.period = period
-#         self.clients = {}
-#         self.cleanup_counter = 0
-    
-#     async def dispatch(self, request: Request, call_next: Callable) -> Response:
-#         # Skip rate limiting for health checks
-#         if request.url.path in ["/", "/health"]:
-#             return await call_next(request)
-            
-#         client_ip = request.client.host
-#         current_time = time.time()
-        
-#         # Periodic cleanup (every 100 requests)
-#         self.cleanup_counter += 1
-#         if self.cleanup_counter % 100 == 0:
-#             cutoff_time = current_time - self.period
-#             self.clients = {
-#                 ip: [t for t in timestamps if t > cutoff_time]
-#                 for ip, timestamps in self.clients.items()
-#                 if any(t > cutoff_time for t in timestamps)
-#             }
-        
-#         # Get or create client record
-#         if client_ip not in self.clients:
-#             self.clients[client_ip] = []
-        
-#         # Clean old entries for this client only
-#         cutoff_time = current_time - self.period
-#         self.clients[client_ip] = [t for t in self.clients[client_ip] if t > cutoff_time]
-        
-#         # Check rate limit
-#         if len(self.clients[client_ip]) >= self.calls:
-#             raise HTTPException(status_code=429, detail="Rate limit exceeded")
-        
-#         # Add current request
-#         self.clients[client_ip].append(current_time)
-        
-#         return await call_next(request)
-
-# # ========== LIFESPAN MANAGEMENT ==========
-
-# @asynccontextmanager
-# async def lifespan(app: FastAPI):
-#     # Startup
-#     logger.info("Starting FastAPI application with optimizations")
-#     yield
-#     # Shutdown
-#     logger.info("Shutting down FastAPI application")
-#     executor.shutdown(wait=True)
-
-# # ========== FASTAPI APPLICATION SETUP ==========
-
-# app = FastAPI(
-#     title="Optimized Resume Generator API", 
-#     version="2.1.0",
-#     description="High-performance resume generator with async processing and optimizations",
-#     lifespan=lifespan
-# )
-
-# # Simplified middleware stack for better performance
-# if DEBUG:
-#     app.add_middleware(MinimalLoggingMiddleware)
-
-# app.add_middleware(OptimizedRateLimitMiddleware, calls=RATE_LIMIT_CALLS, period=RATE_LIMIT_PERIOD)
-# app.add_middleware(GZipMiddleware, minimum_size=1000)
-
-# # Simplified CORS for production
-# app.add_middleware(
-#     CORSMiddleware,
-#     allow_origins=ALLOWED_HOSTS if ALLOWED_HOSTS else ["*"],
-#     allow_credentials=True,
-#     allow_methods=["GET", "POST"],  # Only needed methods
-#     allow_headers=["*"],
-# )
-
-# # Optimized in-memory rate limiting
-# rate_limit_cache = {}
-
-# async def fast_rate_limiter(request: Request):
-#     """Optimized rate limiter using in-memory cache"""
-#     client_ip = request.client.host
-#     current_time = time.time()
-    
-#     # Clean cache periodically
-#     if len(rate_limit_cache) > 1000:
-#         cutoff = current_time - 60
-#         rate_limit_cache.clear()  # Simple cleanup
-    
-#     last_request = rate_limit_cache.get(client_ip, 0)
-#     if current_time - last_request < 1:  # 1 second cooldown
-#         raise HTTPException(status_code=429, detail="Rate limit exceeded")
-    
-#     rate_limit_cache[client_ip] = current_time
-
-# # ========== OPTIMIZED API ENDPOINTS ==========
-
-# @app.get("/")
-# async def health_check():
-#     """Optimized health check endpoint"""
-#     return {
-#         "status": "healthy",
-#         "version": "2.1.0",
-#         "optimizations": ["async_processing", "minimal_logging", "optimized_compression", "cached_operations"]
-#     }
-
-# @app.post("/generate-resume/")
-# async def create_resume(data: ResumeRequest, background_tasks: BackgroundTasks):
-#     """Optimized resume generation with async processing"""
-#     try:
-#         # Convert and clean data efficiently
-#         resume_data = data.model_dump(exclude_none=True, exclude_unset=True)
-        
-#         # Remove empty lists efficiently
-#         clean_data = {k: v for k, v in resume_data.items() if not (isinstance(v, list) and len(v) == 0)}
-        
-#         if ASYNC_PROCESSING:
-#             # Generate resume asynchronously
-#             loop = asyncio.get_event_loop()
-#             original_pdf_path = await loop.run_in_executor(executor, generate_resume, clean_data)
-#         else:
-#             # Synchronous generation for simple cases
-#             original_pdf_path = generate_resume(clean_data)
-        
-#         # Handle compression asynchronously if enabled
-#         if ENABLE_COMPRESSION:
-#             final_pdf_path = await compress_pdf_async(original_pdf_path)
-#             if final_pdf_path != original_pdf_path:
-#                 background_tasks.add_task(async_cleanup_temp_file, original_pdf_path, 30)
-#             background_tasks.add_task(async_cleanup_temp_file, final_pdf_path, 60)
-#         else:
-#             final_pdf_path = original_pdf_path
-#             background_tasks.add_task(async_cleanup_temp_file, original_pdf_path, 30)
-        
-#         # Optimized filename generation
-#         name = clean_data.get('personal_info', {}).get('name', 'Resume')
-#         filename = f"{get_clean_filename(name)}_resume.pdf"
-        
-#         # Return file with minimal headers
-#         return FileResponse(
-#             final_pdf_path,
-#             media_type="application/pdf",
-#             filename=filename,
-#             headers={"Content-Disposition": f"attachment; filename={filename}"}
-#         )
-        
-#     except Exception as e:
-#         logger.error(f"Resume generation failed: {str(e)}")
-#         raise HTTPException(status_code=500, detail="Resume generation failed")
-
-# @app.post("/generate-cover-letter/")
-# async def create_cover_letter(data: CoverLetterRequest, background_tasks: BackgroundTasks):
-#     """Optimized cover letter generation with async processing"""
-#     try:
-#         cover_letter_data = data.model_dump(exclude_none=True, exclude_unset=True)
-#         clean_data = {k: v for k, v in cover_letter_data.items() if not (isinstance(v, list) and len(v) == 0)}
-        
-#         if ASYNC_PROCESSING:
-#             loop = asyncio.get_event_loop()
-#             original_pdf_path = await loop.run_in_executor(executor, generate_coverletter, clean_data)
-#         else:
-#             original_pdf_path = generate_coverletter(clean_data)
-        
-#         if ENABLE_COMPRESSION:
-#             final_pdf_path = await compress_pdf_async(original_pdf_path)
-#             if final_pdf_path != original_pdf_path:
-#                 background_tasks.add_task(async_cleanup_temp_file, original_pdf_path, 30)
-#             background_tasks.add_task(async_cleanup_temp_file, final_pdf_path, 60)
-#         else:
-#             final_pdf_path = original_pdf_path
-#             background_tasks.add_task(async_cleanup_temp_file, original_pdf_path, 30)
-        
-#         name = clean_data.get('cover_letter_info', {}).get('name', 'Cover_Letter')
-#         filename = f"{get_clean_filename(name)}_cover_letter.pdf"
-        
-#         return FileResponse(
-#             final_pdf_path,
-#             media_type="application/pdf",
-#             filename=filename,
-#             headers={"Content-Disposition": f"attachment; filename={filename}"}
-#         )
-        
-#     except Exception as e:
-#         logger.error(f"Cover letter generation failed: {str(e)}")
-#         raise HTTPException(status_code=500, detail="Cover letter generation failed")
-
-# # Simplified enhancement endpoints with rate limiting
-# @app.post("/enhance_experience")
-# async def enhance_experience(request: TextRequest, _=Depends(fast_rate_limiter)):
-#     """Enhanced experience with optimized processing"""
-#     try:
-#         if not request.text.strip():
-#             raise HTTPException(status_code=400, detail="Text field cannot be empty")
-        
-#         # Assuming you have these functions imported
-#         if ASYNC_PROCESSING:
-#             loop = asyncio.get_event_loop()
-#             result = await loop.run_in_executor(executor, enhance_professional_experience, request.text)
-#         else:
-#             result = enhance_professional_experience(request.text)
-            
-#         return {"enhanced_experience": result}
-#     except HTTPException:
-#         raise
-#     except Exception as e:
-#         logger.error(f"Error enhancing experience: {str(e)}")
-#         raise HTTPException(status_code=500, detail="Enhancement failed")
-
-# @app.post("/enhance_summary")
-# async def enhance_summary(request: TextRequest, _=Depends(fast_rate_limiter)):
-#     """Enhanced summary with optimized processing"""
-#     try:
-#         if not request.text.strip():
-#             raise HTTPException(status_code=400, detail="Text field cannot be empty")
-        
-#         if ASYNC_PROCESSING:
-#             loop = asyncio.get_event_loop()
-#             result = await loop.run_in_executor(executor, enhance_profile_summary, request.text)
-#         else:
-#             result = enhance_profile_summary(request.text)
-            
-#         return {"enhanced_summary": result}
-#     except HTTPException:
-#         raise
-#     except Exception as e:
-#         logger.error(f"Error enhancing summary: {str(e)}")
-#         raise HTTPException(status_code=500, detail="Enhancement failed")
-
-# @app.post("/enhance_project")
-# async def enhance_project(request: TextRequest, _=Depends(fast_rate_limiter)):
-#     """Enhanced project with optimized processing"""
-#     try:
-#         if not request.text.strip():
-#             raise HTTPException(status_code=400, detail="Text field cannot be empty")
-        
-#         if ASYNC_PROCESSING:
-#             loop = asyncio.get_event_loop()
-#             result = await loop.run_in_executor(executor, enhance_project_description, request.text)
-#         else:
-#             result = enhance_project_description(request.text)
-            
-#         return {"enhanced_project_description": result}
-#     except HTTPException:
-#         raise
-#     except Exception as e:
-#         logger.error(f"Error enhancing project: {str(e)}")
-#         raise HTTPException(status_code=500, detail="Enhancement failed")
-    
-# @app.post('/analyze-resume')
-# async def analyze_resume_api(
-#     resume: UploadFile = File(...),
-#     job_description: str = Form(...),
-#     _=Depends(fast_rate_limiter)
-# ):
-#     """Optimized resume analysis"""
-#     if not job_description.strip():
-#         raise HTTPException(status_code=400, detail="Job description is empty")
-    
-#     try:
-#         # Read file asynchronously
-#         resume_content = await resume.read()
-        
-#         if ASYNC_PROCESSING:
-#             loop = asyncio.get_event_loop()
-#             result = await loop.run_in_executor(executor, analyze_resume_against_jd, resume_content, job_description)
-#         else:
-#             result = analyze_resume_against_jd(resume_content, job_description)
-            
-#         return result
-        
-#     except Exception as e:
-#         logger.error(f"Resume analysis failed: {str(e)}")
-#         raise HTTPException(status_code=500, detail="Analysis failed")
-
-
-
-# # For local development
-# if __name__ == "__main__":
-#     uvicorn.run(
-#         app, 
-#         host="0.0.0.0", 
-#         port=PORT, 
-#         reload=DEBUG,
-#         workers=1 if DEBUG else MAX_WORKERS,
-#         loop="uvloop" if not DEBUG else "asyncio"  # Use uvloop for better performance in production
-#     )
\ No newline at end of file
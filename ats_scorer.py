@@ -0,0 +1,200 @@
+import math
+import re
+from collections import Counter
+
+# ========== LOCAL ATS SCORING ==========
+#
+# Deterministic stand-in for the LLM's "JD Match" / "MissingKeywords" answer.
+# Terms are taken from the job description (known skills first, then frequent
+# content words and phrases), weighted by log term frequency with skills boosted,
+# and looked up in the resume. Generic JD vocabulary is dropped via STOPWORDS,
+# which stands in for an IDF table we have no corpus to compute.
+
+# Saturation parameters for how much repeated mentions in the resume count (BM25)
+BM25_K1 = 1.2
+BM25_B = 0.75
+AVERAGE_RESUME_TOKENS = 450
+
+MAX_MISSING_KEYWORDS = 15
+SKILL_WEIGHT = 3.0
+PHRASE_WEIGHT = 1.5
+
+SKILLS = [
+    # languages
+    "python", "java", "javascript", "typescript", "c", "c++", "c#", "golang", "rust", "ruby", "php",
+    "kotlin", "swift", "scala", "matlab", "sql", "bash", "perl", "dart", "html", "css",
+    # frameworks and libraries
+    "react", "angular", "vue", "next.js", "node.js", "express", "django", "flask", "fastapi", "spring",
+    "spring boot", ".net", "asp.net", "laravel", "rails", "ruby on rails", "flutter", "react native",
+    "jquery", "bootstrap", "tailwind", "redux", "graphql", "rest api", "grpc",
+    "pandas", "numpy", "scikit-learn", "tensorflow", "pytorch", "keras", "spark", "hadoop", "airflow",
+    "kafka", "rabbitmq", "celery", "selenium", "pytest", "junit", "jest", "cypress",
+    # data and infrastructure
+    "postgresql", "mysql", "sqlite", "mongodb", "redis", "elasticsearch", "cassandra", "dynamodb",
+    "snowflake", "bigquery", "oracle", "aws", "azure", "gcp", "google cloud", "docker", "kubernetes",
+    "terraform", "ansible", "jenkins", "github actions", "gitlab ci", "ci/cd", "linux", "git", "nginx",
+    "microservices", "serverless", "lambda", "ec2", "s3", "etl", "data pipelines", "data warehousing",
+    # disciplines
+    "machine learning", "deep learning", "natural language processing", "nlp", "computer vision",
+    "data analysis", "data science", "data engineering", "statistics", "a/b testing", "llm",
+    "devops", "sre", "agile", "scrum", "kanban", "tdd", "unit testing", "system design",
+    "distributed systems", "object-oriented programming", "oop", "design patterns", "security",
+    "networking", "cloud computing", "full-stack", "frontend", "backend", "mobile development",
+    "ui/ux", "figma", "product management", "project management", "jira", "excel", "tableau",
+    "power bi", "seo", "salesforce", "sap",
+    # soft skills
+    "leadership", "communication", "mentoring", "collaboration", "problem solving", "stakeholder management",
+]
+
+# Different spellings of the same skill
+SKILL_ALIASES = {
+    "js": "javascript",
+    "ts": "typescript",
+    "nodejs": "node.js",
+    "node": "node.js",
+    "reactjs": "react",
+    "react.js": "react",
+    "vuejs": "vue",
+    "vue.js": "vue",
+    "nextjs": "next.js",
+    "postgres": "postgresql",
+    "k8s": "kubernetes",
+    "amazon web services": "aws",
+    "google cloud platform": "gcp",
+    "google cloud": "gcp",
+    "sklearn": "scikit-learn",
+    "ml": "machine learning",
+    "natural language processing": "nlp",
+    "restful": "rest api",
+    "ci cd": "ci/cd",
+    "oop": "object-oriented programming",
+    "ruby on rails": "rails",
+}
+
+STOPWORDS = set("""
+a about above across after again against all also am an and any are as at be because been before being
+below between both but by can could did do does doing down during each either etc few for from further
+had has have having he her here hers him his how i if in into is it its itself just least less like
+may me might more most must my no nor not of off on once only or other our ours out over own per same
+she should so some such than that the their theirs them then there these they this those through to
+too under until up upon us very via was we were what when where which while who whom why will with
+within without would you your yours
+ability able apply applicant candidate candidates company experience experienced familiarity good
+great ideal including job join knowledge looking new plus preferred proficiency proficient required
+requirements responsibilities role seeking skills strong team work working year years understanding
+using use excellent opportunity position qualifications related relevant successful etc degree
+end own build building ensure help across various
+""".split())
+
+_TOKEN_RE = re.compile(r"[a-z0-9][a-z0-9+#./-]*[a-z0-9+#]|[a-z0-9]")
+
+
+def tokenize(text: str) -> list:
+    """Lowercase word tokens that keep skill punctuation (c++, c#, node.js, ci/cd)"""
+    return _TOKEN_RE.findall(text.lower())
+
+
+def _canonical(term: str) -> str:
+    return SKILL_ALIASES.get(term, term)
+
+
+def _build_skill_index(skills, aliases):
+    index = {}
+    for skill in list(skills) + list(aliases):
+        key = tuple(tokenize(skill))
+        if key:
+            index[key] = _canonical(skill)
+    return index, max(len(key) for key in index)
+
+
+# n-gram token tuple -> canonical skill name
+SKILL_INDEX, MAX_SKILL_NGRAM = _build_skill_index(SKILLS, SKILL_ALIASES)
+
+
+class TermProfile:
+    """Term statistics for one text: skills found, and content unigrams/bigrams"""
+
+    def __init__(self, text: str):
+        tokens = tokenize(text)
+        self.length = len(tokens)
+        self.skills = Counter()
+        self.terms = Counter()
+
+        i = 0
+        while i < len(tokens):
+            # Longest skill match wins ("spring boot" before "spring")
+            for n in range(min(MAX_SKILL_NGRAM, len(tokens) - i), 0, -1):
+                skill = SKILL_INDEX.get(tuple(tokens[i:i + n]))
+                if skill:
+                    self.skills[skill] += 1
+                    i += n
+                    break
+            else:
+                i += 1
+
+        content = [t for t in tokens if t not in STOPWORDS and len(t) > 2 and not t.isdigit()]
+        self.terms.update(content)
+        self.terms.update(f"{a} {b}" for a, b in zip(content, content[1:]))
+
+    def count(self, term: str) -> int:
+        return self.skills.get(term, 0) or self.terms.get(term, 0)
+
+
+def _bm25_tf(tf: int, doc_length: int) -> float:
+    """BM25 term-frequency component, normalised to 1.0 at its limit"""
+    norm = 1 - BM25_B + BM25_B * doc_length / AVERAGE_RESUME_TOKENS
+    return tf * (BM25_K1 + 1) / (tf + BM25_K1 * norm) / (BM25_K1 + 1)
+
+
+def jd_keywords(jd: TermProfile, max_terms: int = 40) -> dict:
+    """
+    The job description's key terms and their weights.
+
+    Every recognised skill is kept. Other words and two-word phrases must occur at
+    least twice, since one-off words in a JD are mostly noise.
+    """
+    weights = {}
+    for skill, tf in jd.skills.items():
+        weights[skill] = SKILL_WEIGHT * (1 + math.log(tf))
+    skill_words = {word for skill in weights for word in tokenize(skill)}
+    for term, tf in jd.terms.most_common():
+        if len(weights) >= max_terms:
+            break
+        if tf < 2 or term in weights or any(word in skill_words for word in term.split()):
+            continue
+        weight = 1 + math.log(tf)
+        weights[term] = weight * PHRASE_WEIGHT if " " in term else weight
+    return weights
+
+
+def score_resume(resume_text: str, job_description: str) -> dict:
+    """
+    Score a resume against a job description without calling the LLM.
+
+    Returns the same "JD Match" / "MissingKeywords" shape as the LLM analysis, plus
+    the matched keywords and a BM25 relevance score for ranking several resumes.
+    """
+    resume = TermProfile(resume_text)
+    jd = TermProfile(job_description)
+    weights = jd_keywords(jd)
+    if not weights:
+        return {"JD Match": "0%", "MissingKeywords": [], "MatchedKeywords": [], "score": 0.0}
+
+    matched, missing = [], []
+    covered = bm25 = 0.0
+    for term, weight in sorted(weights.items(), key=lambda item: -item[1]):
+        tf = resume.count(term)
+        if tf:
+            matched.append(term)
+            covered += weight
+            bm25 += weight * _bm25_tf(tf, resume.length)
+        else:
+            missing.append(term)
+
+    total = sum(weights.values())
+    return {
+        "JD Match": f"{round(100 * covered / total)}%",
+        "MissingKeywords": missing[:MAX_MISSING_KEYWORDS],
+        "MatchedKeywords": matched,
+        "score": round(bm25 / total, 4),
+    }
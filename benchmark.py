@@ -0,0 +1,811 @@
+"""
+Manual performance benchmarks.
+
+Run one benchmark at a time, e.g.:
+    python benchmark.py render --concurrency 4 --rounds 2
+"""
+import argparse
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+SAMPLE_RESUME = {
+    "template_name": "modern7",
+    "personal_info": {
+        "name": "John Doe",
+        "title": "Software Engineer",
+        "phone": "(555) 123-4567",
+        "email": "john.doe@example.com",
+        "github": "https://github.com/johndoe",
+        "location": "San Francisco, CA",
+        "linkedin": "https://linkedin.com/in/johndoe",
+        "website": "https://johndoe.dev"
+    },
+    "professional_summary": "Experienced software engineer with 5+ years of experience in full-stack development.",
+    "page_size": "A4",
+    "work_experience": [
+        {
+            "company": "Tech Corp",
+            "position": "Senior Software Engineer",
+            "start_date": "2020-01-01",
+            "end_date": "Present",
+            "description": "Led development of microservices architecture and mentored junior developers."
+        }
+    ],
+    "education": [
+        {
+            "institution": "University of Technology",
+            "degree": "Bachelor of Science in Computer Science",
+            "start_date": "2014-09-01",
+            "end_date": "2018-05-01"
+        }
+    ],
+    "skills": ["Python", "JavaScript", "React", "Node.js", "Docker", "AWS"],
+    "hobbies": ["Photography", "Hiking"],
+    "languages": ["English", "Spanish"],
+}
+
+
+def list_templates(directory="templates"):
+    return sorted(name[:-5] for name in os.listdir(directory) if name.endswith(".html"))
+
+
+def _report(label, count, elapsed):
+    print(f"{label:<28} {count:>5} jobs  {elapsed:>7.2f}s  {count / elapsed:>7.2f} req/s")
+
+
+# ========== RENDER POOL ==========
+
+def bench_render(args):
+    """Requests/sec for one-shot pdfkit vs. the warm renderer pool over templates/"""
+    import pdfkit
+    from generate_resume import get_pdfkit_config
+    from render_pool import RenderPool
+    from template_registry import resume_templates
+
+    config = get_pdfkit_config()
+    options = {
+        'page-size': 'A4',
+        'margin-top': '0.50in',
+        'margin-right': '0.50in',
+        'margin-bottom': '0.50in',
+        'margin-left': '0.50in',
+        'encoding': "UTF-8",
+        'no-outline': None,
+        'enable-local-file-access': None
+    }
+    jobs = []
+    for _ in range(args.rounds):
+        for name in list_templates():
+            jobs.append(resume_templates.render(name, {**SAMPLE_RESUME, "template_name": name}))
+
+    def one_shot(html):
+        return pdfkit.from_string(html, False, configuration=config, options=options)
+
+    start = time.time()
+    with ThreadPoolExecutor(args.concurrency) as executor:
+        list(executor.map(one_shot, jobs))
+    _report("pdfkit.from_string", len(jobs), time.time() - start)
+
+    binary = config.wkhtmltopdf
+    binary = binary.decode("utf-8") if isinstance(binary, bytes) else binary
+    pool = RenderPool(binary, size=args.concurrency)
+    try:
+        start = time.time()
+        with ThreadPoolExecutor(args.concurrency) as executor:
+            list(executor.map(lambda html: pool.render(html, options), jobs))
+        _report("RenderPool (warm)", len(jobs), time.time() - start)
+        print(pool.stats())
+    finally:
+        pool.close()
+
+
+# ========== GROQ CLIENT POOL ==========
+
+def start_groq_stub(latency=0.05, per_key_concurrency=2, rate_limited_keys=(), retry_after=1):
+    """
+    Local stand-in for the Groq chat completions API. Each API key may only have
+    per_key_concurrency requests in service at once, like a per-key quota, and
+    keys in rate_limited_keys always get a 429 asking for retry_after seconds.
+    """
+    import json
+    import threading
+    from collections import defaultdict
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    key_slots = defaultdict(lambda: threading.Semaphore(per_key_concurrency))
+    limited = {f"Bearer {key}" for key in rate_limited_keys}
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, *args):
+            pass
+
+        def do_POST(self):
+            body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+            if self.headers.get("Authorization") in limited:
+                payload = json.dumps({"error": {"message": "Rate limit reached", "type": "tokens"}}).encode()
+                self.send_response(429)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(payload)))
+                self.send_header("Retry-After", str(retry_after))
+                self.end_headers()
+                self.wfile.write(payload)
+                return
+            with key_slots[self.headers.get("Authorization")]:
+                time.sleep(latency)
+            payload = json.dumps({
+                "id": "chatcmpl-stub",
+                "object": "chat.completion",
+                "created": int(time.time()),
+                "model": body.get("model", "stub"),
+                "choices": [{
+                    "index": 0,
+                    "message": {"role": "assistant", "content": "Enhanced text from stub."},
+                    "finish_reason": "stop",
+                }],
+                "usage": {"prompt_tokens": 20, "completion_tokens": 5, "total_tokens": 25},
+            }).encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+
+    class Server(ThreadingHTTPServer):
+        # The default backlog of 5 drops bursts of new connections into SYN retries
+        request_queue_size = 128
+
+    server = Server(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}"
+
+
+def bench_groq(args):
+    """Completions/sec through GroqClientPool against the stub server as key count grows"""
+    import asyncio
+
+    server, base_url = start_groq_stub()
+    os.environ.setdefault("GROQ_API_KEY1", "stub-key")
+    os.environ["GROQ_BASE_URL"] = base_url
+    from ai_helper import GroqClientPool
+
+    async def run(key_count, total):
+        # Budgets high enough that only the stub's per-key concurrency limits throughput
+        pool = GroqClientPool([f"stub-key-{i}" for i in range(key_count)], base_url=base_url,
+                              rpm=100000, tpm=100000000)
+
+        async def one():
+            await pool.chat_completion(
+                model="stub", messages=[{"role": "user", "content": "hello"}], max_completion_tokens=16
+            )
+
+        start = time.time()
+        await asyncio.gather(*(one() for _ in range(total)))
+        return time.time() - start
+
+    try:
+        for key_count in (1, 2, 4, 8):
+            total = 40 * args.rounds
+            _report(f"GroqClientPool keys={key_count}", total, asyncio.run(run(key_count, total)))
+    finally:
+        server.shutdown()
+
+
+# ========== LOCAL ATS SCORER ==========
+
+def synthetic_pairs(count, seed=7):
+    """Resume/JD pairs built from the skills vocabulary, with the true overlap known"""
+    import random
+    from ats_scorer import SKILLS
+
+    rng = random.Random(seed)
+    skills = [skill for skill in SKILLS if len(skill) > 2]
+    pairs = []
+    for _ in range(count):
+        required = rng.sample(skills, 10)
+        overlap = rng.randint(0, 10)
+        held = required[:overlap] + rng.sample([s for s in skills if s not in required], 10 - overlap)
+        jd = (
+            "We are hiring an engineer to join our platform group. "
+            + " ".join(f"Hands-on experience with {skill} is required." for skill in required)
+            + " You will collaborate with product and design on customer-facing features."
+        )
+        resume = (
+            "Software engineer with six years of industry experience. "
+            + " ".join(f"Delivered production systems using {skill}." for skill in held)
+            + " Bachelor of Science in Computer Science."
+        )
+        pairs.append((resume, jd, overlap * 10))
+    return pairs
+
+
+def bench_ats(args):
+    """Latency and accuracy of local JD matching over synthetic resume/JD pairs"""
+    from ats_scorer import score_resume
+
+    pairs = synthetic_pairs(500 * args.rounds)
+    errors = []
+    start = time.time()
+    for resume, jd, expected in pairs:
+        result = score_resume(resume, jd)
+        errors.append(abs(int(result["JD Match"].rstrip("%")) - expected))
+    elapsed = time.time() - start
+    _report("score_resume (local)", len(pairs), elapsed)
+    print(f"mean latency {elapsed / len(pairs) * 1000:.3f}ms, "
+          f"mean |JD Match - true overlap| {sum(errors) / len(errors):.1f} points")
+
+
+
+# ========== TEXT EXTRACTION MEMORY ==========
+
+def write_text_pdf(path, pages, filler_bytes_per_page=0, lines_per_page=1):
+    """Write a minimal multi-page PDF with lines of text per page, padded with unused streams"""
+    objects = [b"<< /Type /Catalog /Pages 2 0 R >>", None, b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>"]
+    kids = []
+    for number in range(pages):
+        text = b"BT /F1 10 Tf 14 TL 72 740 Td " + b" ".join(
+            f"(Page {number + 1} line {line + 1}: Python Docker Kubernetes AWS PostgreSQL) '".encode()
+            for line in range(lines_per_page)
+        ) + b" ET"
+        objects.append(b"<< /Length %d >>\nstream\n%s\nendstream" % (len(text), text))
+        content_id = len(objects)
+        objects.append(
+            b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] /Contents %d 0 R"
+            b" /Resources << /Font << /F1 3 0 R >> >> >>" % content_id
+        )
+        kids.append(len(objects))
+        if filler_bytes_per_page:
+            objects.append(b"<< /Length %d >>\nstream\n%s\nendstream"
+                           % (filler_bytes_per_page, os.urandom(filler_bytes_per_page)))
+    objects[1] = b"<< /Type /Pages /Kids [%s] /Count %d >>" % (
+        b" ".join(b"%d 0 R" % kid for kid in kids), len(kids))
+
+    with open(path, "wb") as f:
+        f.write(b"%PDF-1.4\n")
+        offsets = []
+        for number, body in enumerate(objects, 1):
+            offsets.append(f.tell())
+            f.write(b"%d 0 obj\n%s\nendobj\n" % (number, body))
+        xref = f.tell()
+        f.write(b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1))
+        for offset in offsets:
+            f.write(b"%010d 00000 n \n" % offset)
+        f.write(b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref))
+
+
+def _peak_rss_child(mode, path, queue):
+    import asyncio
+    import resource
+    from text_extraction import extract_text, spool_upload
+
+    class FileUpload:
+        """Stands in for starlette's UploadFile"""
+        def __init__(self, f):
+            self.f = f
+            self.filename = os.path.basename(path)
+
+        async def read(self, size=-1):
+            return self.f.read(size)
+
+    baseline = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    start = time.time()
+    if mode == "read-all":
+        # The previous /analyze-resume path: whole upload in memory, every page extracted
+        from PyPDF2 import PdfReader
+        import io
+        with open(path, "rb") as f:
+            content = f.read()
+        text = ""
+        for page in PdfReader(io.BytesIO(content)).pages:
+            text += page.extract_text() or ""
+    else:
+        async def run():
+            with open(path, "rb") as f:
+                with await spool_upload(FileUpload(f)) as upload:
+                    return extract_text(upload.path, upload.file_type)
+        text = asyncio.run(run())
+    elapsed = time.time() - start
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    queue.put((elapsed, (peak - baseline) / 1024, len(text)))
+
+
+def bench_extract(args):
+    """Peak RSS growth and latency extracting text from a ~50 MB PDF upload"""
+    import multiprocessing
+    import tempfile
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "large.pdf")
+        write_text_pdf(path, pages=400, filler_bytes_per_page=128 * 1024)
+        print(f"upload size {os.path.getsize(path) / 1024 / 1024:.1f} MB, 400 pages")
+        for mode in ("read-all", "spooled"):
+            queue = multiprocessing.Queue()
+            # A fresh process per run so peak RSS is not inherited from the previous mode
+            process = multiprocessing.Process(target=_peak_rss_child, args=(mode, path, queue))
+            process.start()
+            elapsed, peak_mb, chars = queue.get()
+            process.join()
+            print(f"{mode:<10} {elapsed:>7.2f}s  peak RSS +{peak_mb:>7.1f} MB  {chars:>8} chars")
+
+
+
+def bench_extract_backends(args):
+    """Seconds per document for each PDF backend and worker count on a multi-page resume"""
+    import tempfile
+    from text_extraction import extract_pdf_text, shutdown_page_executor
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "multipage.pdf")
+        write_text_pdf(path, pages=40, lines_per_page=45)
+        try:
+            for backend in ("pypdf2", "pdfplumber"):
+                for workers in (1, 2, 4):
+                    # Unbounded caps so every page is extracted
+                    extract_pdf_text(path, backend, max_pages=10**6, max_chars=10**9, workers=workers)  # warm-up
+                    start = time.time()
+                    for _ in range(args.rounds):
+                        text = extract_pdf_text(path, backend, max_pages=10**6, max_chars=10**9, workers=workers)
+                    elapsed = (time.time() - start) / args.rounds
+                    print(f"{backend:<11} workers={workers}  {elapsed:>7.3f}s/doc  {len(text):>7} chars")
+        finally:
+            shutdown_page_executor()
+
+
+
+# ========== PDF OPTIMIZER ==========
+
+def bench_optimize(args):
+    """Size reduction and CPU time of each optimizer level, per resume template"""
+    import pdfkit
+    from generate_resume import get_pdfkit_config
+    from pdf_optimizer import COMPRESSION_LEVELS, optimize_pdf
+    from template_registry import resume_templates
+
+    config = get_pdfkit_config()
+    options = {'page-size': 'A4', 'encoding': "UTF-8", 'enable-local-file-access': None}
+    levels = [name for name in COMPRESSION_LEVELS if name != "off"]
+    print(f"{'template':<14} {'original':>9} " + " ".join(f"{name:>20}" for name in levels))
+    for name in list_templates():
+        html = resume_templates.render(name, {**SAMPLE_RESUME, "template_name": name})
+        original = pdfkit.from_string(html, False, configuration=config, options=options)
+        cells = []
+        for level_name in levels:
+            start = time.process_time()
+            for _ in range(args.rounds):
+                optimized = optimize_pdf(original, COMPRESSION_LEVELS[level_name])
+            cpu_ms = (time.process_time() - start) / args.rounds * 1000
+            reduction = (1 - len(optimized) / len(original)) * 100
+            cells.append(f"{reduction:>6.1f}% {cpu_ms:>8.1f}ms cpu")
+        print(f"{name:<14} {len(original):>9} " + " ".join(f"{cell:>20}" for cell in cells))
+
+
+
+# ========== PHOTO PREPROCESSING ==========
+
+def bench_photo(args):
+    """Render time and PDF size with the raw 5.jpg photo vs. the preprocessed one"""
+    import base64
+    import pdfkit
+    from generate_resume import get_pdfkit_config
+    from photo_processing import prepare_photo, template_photo_box
+    from template_registry import resume_templates
+
+    config = get_pdfkit_config()
+    options = {'page-size': 'A4', 'encoding': "UTF-8", 'enable-local-file-access': None}
+    with open("5.jpg", "rb") as f:
+        raw_photo = base64.b64encode(f.read()).decode("ascii")
+
+    def render(name, photo):
+        html = resume_templates.render(name, {**SAMPLE_RESUME, "template_name": name, "photo": photo})
+        start = time.time()
+        for _ in range(args.rounds):
+            pdf = pdfkit.from_string(html, False, configuration=config, options=options)
+        return (time.time() - start) / args.rounds, len(pdf)
+
+    print(f"{'template':<14} {'box':>9} {'raw s':>7} {'raw KB':>8} {'prep ms':>8} {'s':>7} {'KB':>8}")
+    for name in list_templates():
+        box = template_photo_box(resume_templates, name)
+        start = time.time()
+        prepared = prepare_photo(raw_photo, box)
+        prepare_ms = (time.time() - start) * 1000
+        raw_seconds, raw_size = render(name, raw_photo)
+        seconds, size = render(name, prepared)
+        print(f"{name:<14} {box[0]:>4g}x{box[1]:<4g} {raw_seconds:>7.2f} {raw_size / 1024:>8.0f} "
+              f"{prepare_ms:>8.1f} {seconds:>7.2f} {size / 1024:>8.0f}")
+
+
+
+# ========== PDF RESPONSE PATH ==========
+
+def bench_pdf_io(args):
+    """
+    Thread count and disk writes for the old file-based PDF path (render to
+    generated_resumes/, read back, sleeping cleanup thread) vs. the in-memory path
+    """
+    import threading
+    import psutil
+    from generate_resume import generate_resume, render_resume_pdf, shutdown_render_pool
+
+    cleanup_delay = 5.0  # the old endpoints slept 30-60s; shortened so the run ends
+
+    def legacy(data):
+        path = generate_resume(data)
+        with open(path, "rb") as f:
+            f.read()
+        # What BackgroundTasks(cleanup_temp_file, path, delay) amounted to
+        def cleanup():
+            time.sleep(cleanup_delay)
+            os.remove(path)
+        threading.Thread(target=cleanup).start()
+
+    def in_memory(data):
+        render_resume_pdf(data)
+
+    jobs = [dict(SAMPLE_RESUME) for _ in range(20 * args.rounds)]
+    try:
+        for label, job in (("file + sleeping cleanup", legacy), ("in-memory", in_memory)):
+            peak_threads = threading.active_count()
+            stop = threading.Event()
+
+            def sample():
+                nonlocal peak_threads
+                while not stop.wait(0.05):
+                    peak_threads = max(peak_threads, threading.active_count())
+
+            sampler = threading.Thread(target=sample)
+            sampler.start()
+            disk_before = psutil.disk_io_counters()
+            start = time.time()
+            with ThreadPoolExecutor(args.concurrency) as executor:
+                list(executor.map(job, jobs))
+            elapsed = time.time() - start
+            disk_after = psutil.disk_io_counters()
+            stop.set()
+            sampler.join()
+
+            writes = disk_after.write_count - disk_before.write_count
+            written = disk_after.write_bytes - disk_before.write_bytes
+            _report(label, len(jobs), elapsed)
+            print(f"{'':<28} peak threads {peak_threads}, disk writes {writes} "
+                  f"({writes / elapsed:.1f} IOPS, {written / 1024:.0f} KB)")
+            time.sleep(cleanup_delay + 1)  # let legacy cleanup threads finish before the next run
+    finally:
+        shutdown_render_pool()
+
+
+# ========== BULK RESUME ZIP ==========
+
+def bench_bulk_zip(args):
+    """Resumes/sec and time to first byte for /generate-resume/bulk, one render at a time vs. in parallel"""
+    import io
+    import zipfile
+    from fastapi.testclient import TestClient
+    import app as app_module
+
+    count = 25 * args.rounds
+    with TestClient(app_module.app) as client:
+        for window in (1, args.concurrency):
+            # Distinct names so every resume misses the PDF cache
+            resumes = [{**SAMPLE_RESUME, "personal_info": {**SAMPLE_RESUME["personal_info"],
+                                                           "name": f"Bench {window} {i} {time.time()}"}}
+                       for i in range(count)]
+            app_module.BULK_RESUME_CONCURRENCY = window
+            app_module.endpoint_limiter.reset("testclient")
+            start = time.time()
+            first_byte = None
+            body = io.BytesIO()
+            with client.stream("POST", "/generate-resume/bulk", json=resumes) as response:
+                response.raise_for_status()
+                for chunk in response.iter_bytes():
+                    if first_byte is None:
+                        first_byte = time.time() - start
+                    body.write(chunk)
+            elapsed = time.time() - start
+            archive = zipfile.ZipFile(body)
+            pdfs = sum(1 for name in archive.namelist() if name.endswith(".pdf"))
+            _report(f"bulk zip, {window} at a time", pdfs, elapsed)
+            print(f"{'':<28} {pdfs / elapsed:.2f} resumes/s, first byte after {first_byte:.2f}s, "
+                  f"{body.tell() / 1024:.0f} KB archive")
+
+
+# ========== RATE LIMITER ==========
+
+def _rate_limit_child(variant, path, count, queue):
+    import resource
+    from rate_limit import MemoryBackend, SQLiteBackend, RateLimiter
+
+    if variant == "lists":
+        # RateLimitMiddleware before: a list of timestamps per IP, rebuilt on every request
+        clients = {}
+
+        def check(ip):
+            now = time.time()
+            if ip in clients:
+                clients[ip] = [t for t in clients[ip] if now - t < 60]
+            else:
+                clients[ip] = []
+            if len(clients[ip]) >= 100:
+                return 1.0
+            clients[ip].append(now)
+            return 0.0
+        size = clients.__len__
+    else:
+        backend = MemoryBackend() if variant == "memory" else SQLiteBackend(path)
+        check = RateLimiter("bench", backend, 100, 60).check
+        size = backend.__len__
+
+    ips = [f"10.{i >> 16 & 255}.{i >> 8 & 255}.{i & 255}" for i in range(count)]
+    baseline = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    start = time.time()
+    for ip in ips:
+        check(ip)
+    elapsed = time.time() - start
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    queue.put((elapsed, (peak - baseline) / 1024, size()))
+
+
+def bench_rate_limit(args):
+    """Per-request overhead and memory with 1M distinct client IPs: old per-IP timestamp lists vs. GCRA backends"""
+    import multiprocessing
+    import tempfile
+
+    count = 1_000_000 * args.rounds
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "rate_limit.sqlite3")
+        for label, variant in (("timestamp lists (old)", "lists"), ("GCRA memory", "memory"),
+                               ("GCRA sqlite", "sqlite")):
+            queue = multiprocessing.Queue()
+            # A fresh process per variant so peak RSS is not inherited from the previous one
+            process = multiprocessing.Process(target=_rate_limit_child, args=(variant, path, count, queue))
+            process.start()
+            elapsed, peak_mb, tracked = queue.get()
+            process.join()
+            _report(label, count, elapsed)
+            print(f"{'':<28} {elapsed / count * 1e6:.2f} us/request, peak RSS +{peak_mb:.1f} MB, "
+                  f"{tracked} clients still tracked")
+        print(f"{'':<28} sqlite file {os.path.getsize(path) / 1024 / 1024:.1f} MB (shared by all workers)")
+
+# ========== MIDDLEWARE OVERHEAD ==========
+
+def _legacy_middleware_stack(app, limiter, max_size):
+    """The six BaseHTTPMiddleware layers app.py stacked before the ASGI pipeline, reduced to their work"""
+    import logging
+    import uuid
+    from starlette.middleware.base import BaseHTTPMiddleware
+    from starlette.responses import JSONResponse
+
+    class ErrorHandling(BaseHTTPMiddleware):
+        async def dispatch(self, request, call_next):
+            return await call_next(request)
+
+    class SecurityHeaders(BaseHTTPMiddleware):
+        async def dispatch(self, request, call_next):
+            response = await call_next(request)
+            response.headers['X-Content-Type-Options'] = "nosniff"
+            response.headers['X-Frame-Options'] = "Deny"
+            response.headers['X-XSS-Protection'] = "1; mode=block"
+            response.headers['Strict-Transport-Security'] = "max-age=31536000; includeSubDomains"
+            response.headers['Referrer-Policy'] = "strict-origin-when-cross-origin"
+            response.headers['Content-Security-Policy'] = "default-src 'self'"
+            return response
+
+    class RequestLogging(BaseHTTPMiddleware):
+        async def dispatch(self, request, call_next):
+            request_id = str(uuid.uuid4())[:8]
+            start_time = time.time()
+            url = str(request.url)
+            response = await call_next(request)
+            duration = time.time() - start_time
+            logging.getLogger("bench").debug(f"[{request_id}] {request.method} {url} - "
+                                             f"Status: {response.status_code} - Duration: {duration:.3f}s")
+            response.headers["X-Request-ID"] = request_id
+            return response
+
+    class APIMonitoring(BaseHTTPMiddleware):
+        async def dispatch(self, request, call_next):
+            start_time = time.time()
+            response = await call_next(request)
+            if time.time() - start_time > 5.0:
+                logging.getLogger("bench").warning("SLOW_REQUEST")
+            return response
+
+    class RequestSizeLimit(BaseHTTPMiddleware):
+        async def dispatch(self, request, call_next):
+            content_length = request.headers.get("content-length")
+            if content_length and int(content_length) > max_size:
+                return JSONResponse({"detail": "Request too large"}, status_code=413)
+            return await call_next(request)
+
+    class RateLimit(BaseHTTPMiddleware):
+        async def dispatch(self, request, call_next):
+            if limiter.check(request.client.host):
+                return JSONResponse({"detail": "Rate limit exceeded"}, status_code=429)
+            return await call_next(request)
+
+    # Same nesting as the old add_middleware order (last added is outermost)
+    for layer in (ErrorHandling, SecurityHeaders, RequestLogging, APIMonitoring, RequestSizeLimit, RateLimit):
+        app = layer(app)
+    return app
+
+
+def bench_middleware(args):
+    """Per-request overhead of the middleware stack on GET /, driven directly over ASGI (no server, no sockets)"""
+    import asyncio
+    from fastapi import FastAPI
+    from middleware import RequestPipelineMiddleware, security_headers
+    from rate_limit import MemoryBackend, RateLimiter
+
+    def make_app():
+        app = FastAPI()
+
+        @app.get("/")
+        def health_check():
+            return {"status": "healthy"}
+        return app
+
+    def limiter():
+        return RateLimiter("bench", MemoryBackend(), 10 ** 9, 60)
+
+    variants = (
+        ("no middleware", lambda: make_app()),
+        ("6 x BaseHTTPMiddleware (old)", lambda: _legacy_middleware_stack(make_app(), limiter(), 50 * 1024 * 1024)),
+        ("RequestPipelineMiddleware", lambda: RequestPipelineMiddleware(
+            make_app(), limiter(), 50 * 1024 * 1024, headers=security_headers(hsts=True))),
+    )
+    count = 5000 * args.rounds
+
+    async def drive(app):
+        scope = {
+            "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "GET",
+            "scheme": "http", "path": "/", "raw_path": b"/", "query_string": b"", "root_path": "",
+            "headers": [(b"host", b"bench")], "client": ("127.0.0.1", 50000), "server": ("bench", 80),
+        }
+
+        async def receive():
+            return {"type": "http.request", "body": b"", "more_body": False}
+
+        async def send(message):
+            pass
+
+        for _ in range(200):  # warm up
+            await app(dict(scope), receive, send)
+        start = time.perf_counter()
+        for _ in range(count):
+            await app(dict(scope), receive, send)
+        return time.perf_counter() - start
+
+    baseline = None
+    for label, make in variants:
+        elapsed = asyncio.run(drive(make()))
+        _report(label, count, elapsed)
+        per_request = elapsed / count * 1e6
+        if baseline is None:
+            baseline = per_request
+            print(f"{'':<28} {per_request:.1f} us/request")
+        else:
+            print(f"{'':<28} {per_request:.1f} us/request, +{per_request - baseline:.1f} us over no middleware")
+
+
+# ========== REQUEST BODY LIMITS ==========
+
+def bench_body_limit(args):
+    """
+    Chunked (no Content-Length) oversize bodies against a JSON and an upload route:
+    bytes read, status and peak memory with only the Content-Length check (old)
+    vs. limits enforced while the body streams in
+    """
+    import asyncio
+    import tracemalloc
+    from fastapi import FastAPI, File, UploadFile
+    from pydantic import BaseModel
+    from middleware import RequestPipelineMiddleware
+    from rate_limit import MemoryBackend, RateLimiter
+
+    class TextRequest(BaseModel):
+        text: str
+
+    def make_app():
+        app = FastAPI()
+
+        @app.post("/enhance_summary")
+        async def enhance_summary(request: TextRequest):
+            return {"chars": len(request.text)}
+
+        @app.post("/analyze-resume")
+        async def analyze_resume(resume: UploadFile = File(...)):
+            return {"bytes": len(await resume.read())}
+        return app
+
+    body_size = 50 * 1024 * 1024 * args.rounds
+    chunk_size = 64 * 1024
+    boundary = b"benchboundary"
+
+    def json_chunks():
+        yield b'{"text": "'
+        for _ in range(body_size // chunk_size):
+            yield b"x" * chunk_size
+        yield b'"}'
+
+    def upload_chunks():
+        yield (b"--" + boundary + b'\r\nContent-Disposition: form-data; name="resume"; filename="cv.pdf"\r\n'
+               b"Content-Type: application/pdf\r\n\r\n")
+        for _ in range(body_size // chunk_size):
+            yield b"x" * chunk_size
+        yield b"\r\n--" + boundary + b"--\r\n"
+
+    async def chunked_post(app, path, content_type, chunks):
+        """Plays a client sending Transfer-Encoding: chunked: no Content-Length header"""
+        scope = {
+            "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "POST",
+            "scheme": "http", "path": path, "raw_path": path.encode(), "query_string": b"", "root_path": "",
+            "headers": [(b"host", b"bench"), (b"content-type", content_type),
+                        (b"transfer-encoding", b"chunked")],
+            "client": ("127.0.0.1", 50000), "server": ("bench", 80),
+        }
+        pending = iter(chunks())
+        sent = 0
+        status = None
+
+        async def receive():
+            nonlocal sent
+            chunk = next(pending, None)
+            if chunk is None:
+                return {"type": "http.request", "body": b"", "more_body": False}
+            sent += len(chunk)
+            return {"type": "http.request", "body": chunk, "more_body": True}
+
+        async def send(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+
+        await app(scope, receive, send)
+        return status, sent
+
+    limiter = RateLimiter("bench", MemoryBackend(), 10 ** 9, 60)
+    variants = (
+        ("Content-Length only (old)", {}, 10 ** 12),
+        ("streamed limits", {"/enhance": 1024 * 1024, "/analyze-resume": 10 * 1024 * 1024}, 50 * 1024 * 1024),
+    )
+    routes = (
+        ("/enhance_summary", b"application/json", json_chunks),
+        ("/analyze-resume", b"multipart/form-data; boundary=" + boundary, upload_chunks),
+    )
+    print(f"{body_size / 1024 / 1024:.0f} MB chunked body per request")
+    for label, body_limits, max_body_size in variants:
+        app = RequestPipelineMiddleware(make_app(), limiter, max_body_size, body_limits=body_limits)
+        for path, content_type, chunks in routes:
+            tracemalloc.start()
+            start = time.perf_counter()
+            status, sent = asyncio.run(chunked_post(app, path, content_type, chunks))
+            elapsed = time.perf_counter() - start
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            print(f"{label:<26} {path:<18} status {status}  read {sent / 1024 / 1024:>6.1f} MB  "
+                  f"{elapsed * 1000:>8.1f} ms  peak Python heap {peak / 1024 / 1024:>6.1f} MB")
+
+
+BENCHMARKS = {
+    "render": bench_render,
+    "groq": bench_groq,
+    "ats": bench_ats,
+    "extract": bench_extract,
+    "extract-backends": bench_extract_backends,
+    "optimize": bench_optimize,
+    "photo": bench_photo,
+    "pdf-io": bench_pdf_io,
+    "bulk-zip": bench_bulk_zip,
+    "rate-limit": bench_rate_limit,
+    "middleware": bench_middleware,
+    "body-limit": bench_body_limit,
+}
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Resume generator benchmarks")
+    parser.add_argument("benchmark", choices=sorted(BENCHMARKS))
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--rounds", type=int, default=1)
+    args = parser.parse_args()
+    BENCHMARKS[args.benchmark](args)
@@ -1,39 +1,116 @@
-from jinja2 import Environment, FileSystemLoader
 import pdfkit
 import os
 import uuid
 import platform
+import threading
+import multiprocessing.util
+from template_registry import resume_templates, cover_letter_templates
+from render_pool import RenderPool, RenderPoolBusy, RENDER_POOL_SIZE
+from photo_processing import PHOTO_PREPROCESS, prepare_photo, template_photo_box
+from metrics import time_stage
 
-def generate_resume(data):
-    """
-    Generate a PDF resume from the provided data
-    Returns the path to the generated PDF file
-    """
-    
-    # Configure wkhtmltopdf based on environment
+_render_pool = None
+_render_pool_lock = threading.Lock()
+_render_pool_size = RENDER_POOL_SIZE
+
+
+def get_pdfkit_config():
+    """Configure wkhtmltopdf based on environment"""
     if platform.system() == "Windows":
         # Local development on Windows - fix the path
         path_to_wkhtmltopdf = r"C:\Program Files\wkhtmltopdf\bin\wkhtmltopdf.exe"
-        config = pdfkit.configuration(wkhtmltopdf=path_to_wkhtmltopdf)
-    else:
-        # Production environment (Linux/Render)
-        # wkhtmltopdf will be installed via apt-get in render.yaml
-        config = pdfkit.configuration()
-    # Load template and render
-    env = Environment(loader=FileSystemLoader('templates'))
-    templatename = data['template_name']
-    template = env.get_template(f'{templatename}.html')
-    rendered_html = template.render(data)
+        return pdfkit.configuration(wkhtmltopdf=path_to_wkhtmltopdf)
+    # Production environment (Linux/Render)
+    # wkhtmltopdf will be installed via apt-get in render.yaml
+    return pdfkit.configuration()
 
-    # Generate unique filename
-    filename = f"resume_{uuid.uuid4().hex}.pdf"
-    
+
+def get_render_pool():
+    """
+    Return the process-wide renderer pool, starting it on first use.
+    Returns None when RENDER_POOL_SIZE is 0 (one wkhtmltopdf process per request).
+    """
+    global _render_pool
+    if RENDER_POOL_SIZE <= 0:
+        return None
+    if _render_pool is None:
+        with _render_pool_lock:
+            if _render_pool is None:
+                binary = get_pdfkit_config().wkhtmltopdf
+                if isinstance(binary, bytes):
+                    binary = binary.decode("utf-8")
+                _render_pool = RenderPool(binary, size=_render_pool_size)
+    return _render_pool
+
+
+def render_pool_stats():
+    """Stats for the renderer pool, without starting it"""
+    if RENDER_POOL_SIZE <= 0:
+        return {"render_pool_enabled": False}
+    if _render_pool is None:
+        return {"render_pool_enabled": True, "started": False}
+    return {"render_pool_enabled": True, "started": True, **_render_pool.stats()}
+
+
+def shutdown_render_pool():
+    global _render_pool
+    with _render_pool_lock:
+        if _render_pool is not None:
+            _render_pool.close()
+            _render_pool = None
+
+
+def init_render_worker():
+    """
+    Initializer for CPU pool worker processes: give this worker a single renderer
+    (it runs one job at a time, so a second one would only sit idle), warm the
+    template caches, and stop the renderer when the process exits.
+    """
+    global _render_pool, _render_pool_lock, _render_pool_size
+    _render_pool = None
+    _render_pool_lock = threading.Lock()
+    _render_pool_size = min(RENDER_POOL_SIZE, 1)
+    resume_templates.preload()
+    cover_letter_templates.preload()
+    multiprocessing.util.Finalize(None, shutdown_render_pool, exitpriority=10)
+
+
+def render_pdf(rendered_html, options):
+    """Render HTML to PDF bytes, using the warm pool when enabled"""
+    pool = get_render_pool()
+    with time_stage("wkhtmltopdf"):
+        if pool is None:
+            # output_path=False makes pdfkit pipe the HTML in and the PDF out
+            return pdfkit.from_string(rendered_html, False, configuration=get_pdfkit_config(), options=options)
+        return pool.render(rendered_html, options)
+
+
+def save_pdf(pdf_bytes, prefix="resume"):
+    """Write PDF bytes into generated_resumes/ and return the path"""
     # Create output directory if it doesn't exist
     output_dir = "generated_resumes"
     os.makedirs(output_dir, exist_ok=True)
+    output_file = os.path.join(output_dir, f"{prefix}_{uuid.uuid4().hex}.pdf")
+    with open(output_file, "wb") as f:
+        f.write(pdf_bytes)
+    return output_file
+
+
+def render_resume_pdf(data):
+    """
+    Generate a PDF resume from the provided data
+    Returns the PDF bytes; nothing is written to disk
+    """
     
-    # Full path for the PDF
-    output_file = os.path.join(output_dir, filename)
+    # Render from the shared compiled-template cache
+    templatename = data['template_name']
+    if PHOTO_PREPROCESS and data.get('photo'):
+        # Shrink the photo to what the template actually shows, so wkhtmltopdf
+        # neither decodes nor embeds a full-resolution original
+        box = template_photo_box(resume_templates, templatename)
+        data = {**data, 'photo': prepare_photo(data['photo'], box)}
+    rendered_html = resume_templates.render(templatename, data)
+
     pagesize = data['page_size']
     # PDF generation options
     options = {
@@ -47,47 +124,34 @@ def generate_resume(data):
         'enable-local-file-access': None
     }
 
-    # Generate PDF with config
+    # Generate PDF on the warm renderer pool
     try:
-        pdfkit.from_string(rendered_html, output_file, configuration=config, options=options)
-        print(f"Resume saved to {output_file}")
-        return output_file
+        return render_pdf(rendered_html, options)
+    except RenderPoolBusy:
+        raise
     except Exception as e:
         raise Exception(f"PDF generation failed: {str(e)}")
 
 
-
-def generate_coverletter(data):
+def generate_resume(data):
     """
-    Generate a coverleytter from the provided data
+    Generate a PDF resume from the provided data
     Returns the path to the generated PDF file
     """
-    
-    # Configure wkhtmltopdf based on environment
-    if platform.system() == "Windows":
-        # Local development on Windows - fix the path
-        path_to_wkhtmltopdf = r"C:\Program Files\wkhtmltopdf\bin\wkhtmltopdf.exe"
-        config = pdfkit.configuration(wkhtmltopdf=path_to_wkhtmltopdf)
-    else:
-        # Production environment (Linux/Render)
-        # wkhtmltopdf will be installed via apt-get in render.yaml
-        config = pdfkit.configuration()
-    # Load template and render
-    env = Environment(loader=FileSystemLoader('cover_letters'))
-    templatename = data["cover_letter_info"]["template_name"]
+    output_file = save_pdf(render_resume_pdf(data))
+    print(f"Resume saved to {output_file}")
+    return output_file
 
-    template = env.get_template(f'{templatename}.html')
-    rendered_html = template.render(data)
 
-    # Generate unique filename
-    filename = f"resume_{uuid.uuid4().hex}.pdf"
-    
-    # Create output directory if it doesn't exist
-    output_dir = "generated_resumes"
-    os.makedirs(output_dir, exist_ok=True)
+def render_coverletter_pdf(data):
+    """
+    Generate a cover letter from the provided data
+    Returns the PDF bytes; nothing is written to disk
+    """
     
-    # Full path for the PDF
-    output_file = os.path.join(output_dir, filename)
+    # Render from the shared compiled-template cache
+    templatename = data["cover_letter_info"]["template_name"]
+    rendered_html = cover_letter_templates.render(templatename, data)
 
     pagesize = data['cover_letter_info']['page_size']
     # PDF generation options
@@ -109,11 +173,20 @@ def generate_coverletter(data):
         'zoom': 1.0
     }
 
-    # Generate PDF with config
+    # Generate PDF on the warm renderer pool
     try:
-        pdfkit.from_string(rendered_html, output_file, configuration=config, options=options)
-        print(f"Resume saved to {output_file}")
-        return output_file
+        return render_pdf(rendered_html, options)
+    except RenderPoolBusy:
+        raise
     except Exception as e:
         raise Exception(f"PDF generation failed: {str(e)}")
 
+
+def generate_coverletter(data):
+    """
+    Generate a coverleytter from the provided data
+    Returns the path to the generated PDF file
+    """
+    output_file = save_pdf(render_coverletter_pdf(data))
+    print(f"Resume saved to {output_file}")
+    return output_file
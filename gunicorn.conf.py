@@ -0,0 +1,25 @@
+import os
+import shutil
+import tempfile
+
+# Run with: gunicorn -c gunicorn.conf.py app:app
+worker_class = "uvicorn.workers.UvicornWorker"
+bind = f"0.0.0.0:{os.getenv('PORT', 8000)}"
+workers = int(os.getenv("WEB_CONCURRENCY", 2))
+
+# Every worker (and its CPU pool children) writes metrics here; /metrics on any
+# worker sums them. Set before workers fork so they all inherit it.
+multiproc_dir = os.environ.setdefault(
+    "PROMETHEUS_MULTIPROC_DIR", os.path.join(tempfile.gettempdir(), "prometheus_multiproc")
+)
+
+
+def on_starting(server):
+    # Files left by a previous run would be counted again
+    shutil.rmtree(multiproc_dir, ignore_errors=True)
+    os.makedirs(multiproc_dir, exist_ok=True)
+
+
+def child_exit(server, worker):
+    from metrics import mark_process_dead
+    mark_process_dead(worker.pid)
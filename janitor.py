@@ -0,0 +1,143 @@
+import asyncio
+import fnmatch
+import os
+import threading
+import time
+import logging
+from collections import defaultdict
+
+logger = logging.getLogger(__name__)
+
+# ========== JANITOR CONFIGURATION ==========
+
+JANITOR_ENABLED = os.getenv("JANITOR_ENABLED", "true").lower() == "true"
+JANITOR_INTERVAL = float(os.getenv("JANITOR_INTERVAL", 300))
+JANITOR_MAX_AGE = float(os.getenv("JANITOR_MAX_AGE", 3600))
+JANITOR_MAX_BYTES = int(os.getenv("JANITOR_MAX_BYTES", 512 * 1024 * 1024))
+
+
+class Janitor:
+    """
+    Periodically deletes generated and temporary files.
+
+    Each sweep removes files older than max_age, then the oldest remaining files
+    until everything the janitor watches fits in max_bytes.
+
+    Args:
+        targets (list): (directory, pattern) pairs; pattern is an fnmatch glob
+            matched against the path relative to the directory (e.g. "*.pdf",
+            "render_pool_*/*")
+        max_age (float): Seconds a file may live
+        max_bytes (int): Byte quota across all targets
+        interval (float): Seconds between sweeps
+    """
+
+    def __init__(self, targets, max_age: float = JANITOR_MAX_AGE, max_bytes: int = JANITOR_MAX_BYTES,
+                 interval: float = JANITOR_INTERVAL):
+        self.targets = targets
+        self.max_age = max_age
+        self.max_bytes = max_bytes
+        self.interval = interval
+        self._task = None
+        self._lock = threading.Lock()
+        self._stats = defaultdict(float)
+        self._tracked = (0, 0)
+
+    def _scan(self):
+        entries = []
+        for directory, pattern in self.targets:
+            if not os.path.isdir(directory):
+                continue
+            for root, _, files in os.walk(directory):
+                for filename in files:
+                    path = os.path.join(root, filename)
+                    if not fnmatch.fnmatch(os.path.relpath(path, directory), pattern):
+                        continue
+                    try:
+                        stat = os.stat(path)
+                    except OSError:
+                        continue  # removed while we were scanning
+                    entries.append((stat.st_mtime, stat.st_size, path))
+        return entries
+
+    def sweep(self) -> dict:
+        """Run one sweep synchronously and return what it removed"""
+        start_time = time.perf_counter()
+        entries = sorted(self._scan())
+        total = sum(size for _, size, _ in entries)
+        cutoff = time.time() - self.max_age
+        removed = {"expired": 0, "over_quota": 0}
+        reclaimed = 0
+
+        for mtime, size, path in entries:
+            if mtime < cutoff:
+                reason = "expired"
+            elif total > self.max_bytes:
+                reason = "over_quota"
+            else:
+                break  # oldest first, so everything after is newer and within quota
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            removed[reason] += 1
+            reclaimed += size
+            total -= size
+
+        duration = time.perf_counter() - start_time
+        files_left = len(entries) - removed["expired"] - removed["over_quota"]
+        with self._lock:
+            self._stats["sweeps"] += 1
+            self._stats["files_expired"] += removed["expired"]
+            self._stats["files_over_quota"] += removed["over_quota"]
+            self._stats["bytes_reclaimed"] += reclaimed
+            self._stats["last_sweep_at"] = time.time()
+            self._stats["last_sweep_seconds"] = duration
+            self._tracked = (files_left, total)
+        if reclaimed:
+            logger.info(f"Janitor removed {removed['expired']} expired and {removed['over_quota']} "
+                        f"over-quota files, reclaimed {reclaimed} bytes")
+        return {**removed, "bytes_reclaimed": reclaimed, "files": files_left, "bytes": total}
+
+    async def _run(self):
+        while True:
+            try:
+                await asyncio.to_thread(self.sweep)
+            except Exception as e:
+                logger.error(f"Janitor sweep failed: {str(e)}", exc_info=True)
+            await asyncio.sleep(self.interval)
+
+    def start(self):
+        """Start sweeping on the running event loop (first sweep runs immediately)"""
+        if self._task is None:
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self):
+        task, self._task = self._task, None
+        if task is not None:
+            task.cancel()
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+
+    def stats(self) -> dict:
+        with self._lock:
+            stats = dict(self._stats)
+            files, total = self._tracked
+        return {
+            "running": self._task is not None,
+            "interval_seconds": self.interval,
+            "max_age_seconds": self.max_age,
+            "max_bytes": self.max_bytes,
+            "targets": [f"{os.path.join(directory, pattern)}" for directory, pattern in self.targets],
+            "sweeps": int(stats.get("sweeps", 0)),
+            "files_removed": int(stats.get("files_expired", 0) + stats.get("files_over_quota", 0)),
+            "files_expired": int(stats.get("files_expired", 0)),
+            "files_over_quota": int(stats.get("files_over_quota", 0)),
+            "bytes_reclaimed": int(stats.get("bytes_reclaimed", 0)),
+            "files": files,
+            "bytes": total,
+            "last_sweep_at": stats.get("last_sweep_at"),
+            "last_sweep_seconds": round(stats.get("last_sweep_seconds", 0.0), 4),
+        }
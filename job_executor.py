@@ -0,0 +1,169 @@
+import asyncio
+import functools
+import multiprocessing
+import os
+import threading
+import time
+import logging
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+import tracing
+
+logger = logging.getLogger(__name__)
+
+# ========== EXECUTOR CONFIGURATION ==========
+
+# "thread" (default) keeps render/compress work in-process, so every render goes
+# through the one RenderPool and its RENDER_MAX_WAITING / RENDER_QUEUE_TIMEOUT
+# backpressure. "process" isolates it in worker processes, each with a single
+# renderer of its own; the pool's max_pending is then the only global bound.
+CPU_POOL_MODE = os.getenv("CPU_POOL_MODE", "thread").lower()
+CPU_POOL_WORKERS = int(os.getenv("CPU_POOL_WORKERS", os.cpu_count() or 1))
+CPU_POOL_MAX_PENDING = int(os.getenv("CPU_POOL_MAX_PENDING", CPU_POOL_WORKERS * 4))
+LLM_POOL_WORKERS = int(os.getenv("LLM_POOL_WORKERS", 16))
+LLM_POOL_MAX_PENDING = int(os.getenv("LLM_POOL_MAX_PENDING", 64))
+POOL_RETRY_AFTER = int(os.getenv("POOL_RETRY_AFTER", 5))
+
+
+class PoolSaturated(Exception):
+    """Raised when a pool already has max_pending jobs queued or running"""
+
+    def __init__(self, pool_name: str, retry_after: int = POOL_RETRY_AFTER):
+        super().__init__(f"{pool_name} pool is saturated")
+        self.pool_name = pool_name
+        self.retry_after = retry_after
+
+
+class BoundedPool:
+    """
+    An executor with a hard limit on queued + running jobs, awaited from the event loop.
+
+    Args:
+        name (str): Pool name used in errors and metrics
+        executor_factory (Callable): Creates the underlying concurrent.futures executor
+        workers (int): Worker count (reported in stats)
+        max_pending (int): Jobs allowed in the pool at once before PoolSaturated is raised
+        retry_after (int): Seconds suggested to clients when the pool is saturated
+    """
+
+    def __init__(self, name: str, executor_factory, workers: int, max_pending: int,
+                 retry_after: int = POOL_RETRY_AFTER):
+        self.name = name
+        self.workers = workers
+        self.max_pending = max_pending
+        self.retry_after = retry_after
+        self._executor_factory = executor_factory
+        self._executor = None
+        self._lock = threading.Lock()
+        self._pending = 0
+        self._stats = defaultdict(float)
+
+    def _get_executor(self):
+        # Created lazily so importing the app never forks worker processes
+        with self._lock:
+            if self._executor is None:
+                self._executor = self._executor_factory()
+            return self._executor
+
+    def _reset_executor(self):
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    def acquire_slot(self):
+        """Reserve a pending slot without running a job, raising PoolSaturated if none is free"""
+        with self._lock:
+            if self._pending >= self.max_pending:
+                self._stats["rejected"] += 1
+                raise PoolSaturated(self.name, self.retry_after)
+            self._pending += 1
+            self._stats["submitted"] += 1
+            self._stats["peak_pending"] = max(self._stats["peak_pending"], self._pending)
+
+    def release_slot(self, duration: float, failed: bool = False):
+        with self._lock:
+            self._pending -= 1
+            self._stats["failed" if failed else "completed"] += 1
+            self._stats["busy_seconds"] += duration
+            self._stats["max_seconds"] = max(self._stats["max_seconds"], duration)
+
+    async def run(self, fn, *args, **kwargs):
+        """Run fn(*args, **kwargs) on the pool, raising PoolSaturated instead of queueing unboundedly"""
+        self.acquire_slot()
+        start_time = time.perf_counter()
+        failed = True
+        try:
+            with tracing.span(f"{self.name}_pool"):
+                if asyncio.iscoroutinefunction(fn):
+                    # Native async jobs only need the admission limit, not a worker thread
+                    result = await fn(*args, **kwargs)
+                elif tracing.active():
+                    # Bring the worker's stage spans back into this request's trace
+                    loop = asyncio.get_running_loop()
+                    result, spans = await loop.run_in_executor(
+                        self._get_executor(), functools.partial(tracing.run_traced, fn, *args, **kwargs)
+                    )
+                    tracing.adopt(spans)
+                else:
+                    loop = asyncio.get_running_loop()
+                    result = await loop.run_in_executor(self._get_executor(), functools.partial(fn, *args, **kwargs))
+            failed = False
+            return result
+        except BrokenProcessPool:
+            logger.error(f"{self.name} pool worker died; restarting pool")
+            self._reset_executor()
+            raise
+        finally:
+            self.release_slot(time.perf_counter() - start_time, failed)
+
+    def stats(self) -> dict:
+        with self._lock:
+            stats = dict(self._stats)
+            pending = self._pending
+        completed = int(stats.get("completed", 0))
+        return {
+            "workers": self.workers,
+            "max_pending": self.max_pending,
+            "pending": pending,
+            "peak_pending": int(stats.get("peak_pending", 0)),
+            "submitted": int(stats.get("submitted", 0)),
+            "completed": completed,
+            "failed": int(stats.get("failed", 0)),
+            "rejected": int(stats.get("rejected", 0)),
+            "avg_seconds": round(stats.get("busy_seconds", 0.0) / completed, 4) if completed else 0.0,
+            "max_seconds": round(stats.get("max_seconds", 0.0), 4),
+        }
+
+    def shutdown(self):
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=True, cancel_futures=True)
+
+
+def _process_executor(initializer=None):
+    # forkserver, as for text extraction: the pool starts from a running event loop
+    # with executor threads, and forking that process can copy held locks into the child
+    method = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else None
+    context = multiprocessing.get_context(method) if method else None
+    return ProcessPoolExecutor(max_workers=CPU_POOL_WORKERS, mp_context=context, initializer=initializer)
+
+
+def make_cpu_pool(initializer=None) -> BoundedPool:
+    """Pool for CPU-bound PDF render/compress jobs"""
+    if CPU_POOL_MODE == "process":
+        factory = functools.partial(_process_executor, initializer)
+    else:
+        factory = functools.partial(ThreadPoolExecutor, max_workers=CPU_POOL_WORKERS, thread_name_prefix="cpu")
+    return BoundedPool("cpu", factory, CPU_POOL_WORKERS, CPU_POOL_MAX_PENDING)
+
+
+def make_llm_pool() -> BoundedPool:
+    """
+    Pool for LLM calls, kept apart from render work. Async jobs run on the event
+    loop under the pool's admission limit; sync jobs fall back to its threads.
+    """
+    factory = functools.partial(ThreadPoolExecutor, max_workers=LLM_POOL_WORKERS, thread_name_prefix="llm")
+    return BoundedPool("llm", factory, LLM_POOL_WORKERS, LLM_POOL_MAX_PENDING)
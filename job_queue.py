@@ -0,0 +1,395 @@
+import asyncio
+import bisect
+import ipaddress
+import json
+import os
+import socket
+import sqlite3
+import tempfile
+import threading
+import time
+import uuid
+import logging
+from collections import defaultdict
+from urllib.parse import urlsplit
+
+logger = logging.getLogger(__name__)
+
+# ========== JOB QUEUE CONFIGURATION ==========
+
+# Shared by every gunicorn worker on the host; any of them may run any job
+JOB_QUEUE_PATH = os.getenv("JOB_QUEUE_PATH", os.path.join(tempfile.gettempdir(), "resume_jobs.sqlite3"))
+# Jobs each process runs at once; 0 makes a process enqueue-only
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", 2))
+JOB_MAX_QUEUED = int(os.getenv("JOB_MAX_QUEUED", 1000))
+# A running job whose lease lapses (its worker died) is picked up again
+JOB_LEASE_SECONDS = float(os.getenv("JOB_LEASE_SECONDS", 120))
+JOB_MAX_ATTEMPTS = int(os.getenv("JOB_MAX_ATTEMPTS", 3))
+JOB_RESULT_TTL = float(os.getenv("JOB_RESULT_TTL", 3600))
+JOB_POLL_INTERVAL = float(os.getenv("JOB_POLL_INTERVAL", 0.5))
+JOB_WEBHOOK_TIMEOUT = float(os.getenv("JOB_WEBHOOK_TIMEOUT", 5))
+# Comma-separated hosts webhooks may be sent to. When unset any host is allowed
+# whose addresses are all public; listed hosts skip that check (e.g. an internal service).
+JOB_WEBHOOK_ALLOWED_HOSTS = frozenset(
+    host.strip().lower() for host in os.getenv("JOB_WEBHOOK_ALLOWED_HOSTS", "").split(",") if host.strip()
+)
+
+LATENCY_BUCKETS = (0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+
+
+class JobQueueFull(Exception):
+    """Raised by enqueue when JOB_MAX_QUEUED jobs are already waiting"""
+
+    def __init__(self, retry_after: int = 5):
+        super().__init__("Job queue is full")
+        self.retry_after = retry_after
+
+
+class RetryLater(Exception):
+    """Raised by a job handler to put its job back on the queue without using an attempt"""
+
+
+class JobRejected(Exception):
+    """Raised by a job handler when retrying cannot help (e.g. invalid input)"""
+
+
+def check_webhook_url(url: str, allowed_hosts=JOB_WEBHOOK_ALLOWED_HOSTS):
+    """
+    Raise ValueError unless url is an http(s) URL the server may POST to. Hosts
+    are resolved and refused if any address is private, loopback, link-local or
+    otherwise not globally routable, so callers cannot aim webhooks at internal
+    services or cloud metadata endpoints. Blocking (DNS); call it off the event loop.
+    """
+    parts = urlsplit(url)
+    if parts.scheme not in ("http", "https") or not parts.hostname:
+        raise ValueError("webhook_url must be an http(s) URL")
+    host = parts.hostname.lower()
+    if allowed_hosts:
+        if host not in allowed_hosts:
+            raise ValueError("webhook_url host is not in JOB_WEBHOOK_ALLOWED_HOSTS")
+        return
+    try:
+        addresses = {info[4][0] for info in socket.getaddrinfo(host, parts.port or 80, proto=socket.IPPROTO_TCP)}
+    except (socket.gaierror, UnicodeError):
+        raise ValueError("webhook_url host does not resolve")
+    for address in addresses:
+        if not ipaddress.ip_address(address.split("%", 1)[0]).is_global:
+            raise ValueError("webhook_url must not point at a private or local address")
+
+
+class LatencyHistogram:
+    """Cumulative-bucket latency histogram (Prometheus style: each bucket counts values <= its bound)"""
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = tuple(buckets)
+        self._counts = [0] * (len(self.buckets) + 1)
+        self._sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, seconds: float):
+        with self._lock:
+            self._counts[bisect.bisect_left(self.buckets, seconds)] += 1
+            self._sum += seconds
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            counts = list(self._counts)
+            total = self._sum
+        cumulative, running = {}, 0
+        for bound, count in zip(self.buckets + ("+Inf",), counts):
+            running += count
+            cumulative[str(bound)] = running
+        return {"count": running, "sum_seconds": round(total, 4), "buckets": cumulative}
+
+
+class JobQueue:
+    """
+    Persistent FIFO of jobs in SQLite, safe to share between processes.
+
+    Jobs move queued -> running -> done | failed. A worker claims a job by taking
+    a lease; if the worker dies the lease expires and another worker retries the
+    job, up to max_attempts. Results are kept for result_ttl seconds.
+    """
+
+    def __init__(self, path: str = JOB_QUEUE_PATH, lease_seconds: float = JOB_LEASE_SECONDS,
+                 max_attempts: int = JOB_MAX_ATTEMPTS, result_ttl: float = JOB_RESULT_TTL,
+                 max_queued: int = JOB_MAX_QUEUED):
+        self.path = path
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self.result_ttl = result_ttl
+        self.max_queued = max_queued
+        self._local = threading.local()
+        with self._connect() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS jobs ("
+                " id TEXT PRIMARY KEY, kind TEXT NOT NULL, status TEXT NOT NULL, payload TEXT NOT NULL,"
+                " meta TEXT NOT NULL DEFAULT '{}', webhook_url TEXT, result BLOB, error TEXT,"
+                " attempts INTEGER NOT NULL DEFAULT 0, worker TEXT, lease_until REAL,"
+                " created_at REAL NOT NULL, started_at REAL, finished_at REAL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS jobs_status_created ON jobs(status, created_at)")
+
+    def _connect(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=10, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.row_factory = sqlite3.Row
+            self._local.conn = conn
+        return conn
+
+    def enqueue(self, kind: str, payload: dict, meta: dict = None, webhook_url: str = None) -> str:
+        conn = self._connect()
+        job_id = uuid.uuid4().hex
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            queued = conn.execute("SELECT COUNT(*) FROM jobs WHERE status = 'queued'").fetchone()[0]
+            if queued >= self.max_queued:
+                raise JobQueueFull()
+            conn.execute(
+                "INSERT INTO jobs (id, kind, status, payload, meta, webhook_url, created_at)"
+                " VALUES (?, ?, 'queued', ?, ?, ?, ?)",
+                (job_id, kind, json.dumps(payload), json.dumps(meta or {}), webhook_url, time.time())
+            )
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        return job_id
+
+    def claim(self, worker: str):
+        """Lease the oldest runnable job to worker, or return None"""
+        now = time.time()
+        conn = self._connect()
+        row = conn.execute(
+            "UPDATE jobs SET status = 'running', worker = ?, lease_until = ?, attempts = attempts + 1,"
+            " started_at = ? WHERE id = ("
+            "  SELECT id FROM jobs WHERE (status = 'queued' OR (status = 'running' AND lease_until < ?))"
+            "  AND attempts < ? ORDER BY created_at LIMIT 1"
+            ") RETURNING id, kind, payload, meta, webhook_url, attempts, created_at",
+            (worker, now + self.lease_seconds, now, now, self.max_attempts)
+        ).fetchone()
+        if row is None:
+            return None
+        job = dict(row)
+        job["payload"] = json.loads(job["payload"])
+        job["meta"] = json.loads(job["meta"])
+        job["started_at"] = now
+        return job
+
+    def complete(self, job_id: str, worker: str, result: bytes) -> bool:
+        """Store a job's result; False if the job's lease was lost to another worker"""
+        cursor = self._connect().execute(
+            "UPDATE jobs SET status = 'done', result = ?, error = NULL, finished_at = ?, lease_until = NULL"
+            " WHERE id = ? AND worker = ? AND status = 'running'",
+            (result, time.time(), job_id, worker)
+        )
+        return cursor.rowcount == 1
+
+    def fail(self, job_id: str, worker: str, error: str, final: bool = False) -> bool:
+        """Record an error; unless final, the job is retried until it has used max_attempts"""
+        limit = 0 if final else self.max_attempts
+        cursor = self._connect().execute(
+            "UPDATE jobs SET error = ?, lease_until = NULL, worker = NULL,"
+            " status = CASE WHEN attempts >= ? THEN 'failed' ELSE 'queued' END,"
+            " finished_at = CASE WHEN attempts >= ? THEN ? ELSE NULL END"
+            " WHERE id = ? AND worker = ? AND status = 'running'",
+            (error, limit, limit, time.time(), job_id, worker)
+        )
+        return cursor.rowcount == 1
+
+    def renew(self, job_id: str, worker: str) -> bool:
+        """Extend a running job's lease; False if the lease was already lost to another worker"""
+        cursor = self._connect().execute(
+            "UPDATE jobs SET lease_until = ? WHERE id = ? AND worker = ? AND status = 'running'",
+            (time.time() + self.lease_seconds, job_id, worker)
+        )
+        return cursor.rowcount == 1
+
+    def release(self, job_id: str, worker: str):
+        """Put a claimed job back on the queue without counting the attempt"""
+        self._connect().execute(
+            "UPDATE jobs SET status = 'queued', attempts = attempts - 1, worker = NULL, lease_until = NULL"
+            " WHERE id = ? AND worker = ? AND status = 'running'",
+            (job_id, worker)
+        )
+
+    def get(self, job_id: str):
+        row = self._connect().execute(
+            "SELECT id, kind, status, meta, error, attempts, created_at, started_at, finished_at,"
+            " result IS NOT NULL AS has_result FROM jobs WHERE id = ?", (job_id,)
+        ).fetchone()
+        if row is None:
+            return None
+        job = dict(row)
+        job["meta"] = json.loads(job["meta"])
+        job["has_result"] = bool(job["has_result"])
+        return job
+
+    def result(self, job_id: str):
+        row = self._connect().execute(
+            "SELECT result FROM jobs WHERE id = ? AND status = 'done'", (job_id,)
+        ).fetchone()
+        return row[0] if row else None
+
+    def sweep(self) -> int:
+        """Fail jobs that ran out of attempts and drop finished jobs past result_ttl"""
+        now = time.time()
+        conn = self._connect()
+        conn.execute(
+            "UPDATE jobs SET status = 'failed', finished_at = ?, error = COALESCE(error, 'Lease expired')"
+            " WHERE status = 'running' AND lease_until < ? AND attempts >= ?",
+            (now, now, self.max_attempts)
+        )
+        return conn.execute(
+            "DELETE FROM jobs WHERE status IN ('done', 'failed') AND finished_at < ?", (now - self.result_ttl,)
+        ).rowcount
+
+    def depth(self) -> dict:
+        rows = self._connect().execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall()
+        counts = {"queued": 0, "running": 0, "done": 0, "failed": 0}
+        counts.update({status: count for status, count in rows})
+        oldest = self._connect().execute(
+            "SELECT MIN(created_at) FROM jobs WHERE status = 'queued'"
+        ).fetchone()[0]
+        counts["oldest_queued_age_seconds"] = round(time.time() - oldest, 3) if oldest else 0.0
+        return counts
+
+
+class JobWorker:
+    """
+    Runs queued jobs inside this process on the event loop.
+
+    Args:
+        queue (JobQueue): Queue to pull from
+        handlers (dict): kind -> async fn(payload) returning the result bytes
+        concurrency (int): Jobs this process runs at once
+        poll_interval (float): Seconds to wait when the queue is empty
+    """
+
+    def __init__(self, queue: JobQueue, handlers: dict, concurrency: int = JOB_WORKERS,
+                 poll_interval: float = JOB_POLL_INTERVAL):
+        self.queue = queue
+        self.handlers = handlers
+        self.concurrency = concurrency
+        self.poll_interval = poll_interval
+        self.worker_id = f"{os.getpid()}-{uuid.uuid4().hex[:8]}"
+        self.wait_seconds = LatencyHistogram()
+        self.run_seconds = LatencyHistogram()
+        self.total_seconds = LatencyHistogram()
+        self._stats = defaultdict(int)
+        self._tasks = []
+
+    async def _heartbeat(self, job_id):
+        """Keep renewing the lease while a job runs, so long jobs are not claimed twice"""
+        while True:
+            await asyncio.sleep(self.queue.lease_seconds / 3)
+            try:
+                renewed = await asyncio.to_thread(self.queue.renew, job_id, self.worker_id)
+            except sqlite3.Error as e:
+                logger.error(f"Lease renewal for job {job_id} failed: {str(e)}")
+                continue
+            if not renewed:
+                logger.warning(f"Job {job_id} lost its lease while running")
+                return
+
+    async def _run_job(self, job):
+        heartbeat = asyncio.get_running_loop().create_task(self._heartbeat(job["id"]))
+        try:
+            result = await self.handlers[job["kind"]](job["payload"])
+        except RetryLater:
+            await asyncio.to_thread(self.queue.release, job["id"], self.worker_id)
+            self._stats["released"] += 1
+            await asyncio.sleep(self.poll_interval)
+            return
+        except Exception as e:
+            final = isinstance(e, JobRejected) or job["attempts"] >= self.queue.max_attempts
+            logger.error(f"Job {job['id']} failed on attempt {job['attempts']}: {str(e)}")
+            await asyncio.to_thread(self.queue.fail, job["id"], self.worker_id, str(e), final)
+            self._stats["failed" if final else "retried"] += 1
+            if final:
+                await self._notify(job, "failed")
+            return
+        finally:
+            heartbeat.cancel()
+
+        finished = time.time()
+        if await asyncio.to_thread(self.queue.complete, job["id"], self.worker_id, result):
+            self._stats["completed"] += 1
+            self.wait_seconds.observe(job["started_at"] - job["created_at"])
+            self.run_seconds.observe(finished - job["started_at"])
+            self.total_seconds.observe(finished - job["created_at"])
+            await self._notify(job, "done")
+        else:
+            self._stats["lease_lost"] += 1
+
+    async def _notify(self, job, status):
+        if not status or not job["webhook_url"]:
+            return
+        body = {"job_id": job["id"], "kind": job["kind"], "status": status}
+        try:
+            import requests  # only needed when a client asked for a webhook
+            # Checked again at send time: the host may resolve differently than at enqueue
+            await asyncio.to_thread(check_webhook_url, job["webhook_url"])
+            response = await asyncio.to_thread(
+                requests.post, job["webhook_url"], json=body, timeout=JOB_WEBHOOK_TIMEOUT,
+                allow_redirects=False  # a redirect could point anywhere
+            )
+            self._stats["webhooks_sent" if response.ok else "webhooks_failed"] += 1
+        except Exception as e:
+            logger.warning(f"Webhook for job {job['id']} failed: {str(e)}")
+            self._stats["webhooks_failed"] += 1
+
+    async def _loop(self):
+        while True:
+            try:
+                job = await asyncio.to_thread(self.queue.claim, self.worker_id)
+            except sqlite3.Error as e:
+                logger.error(f"Job queue claim failed: {str(e)}")
+                job = None
+            if job is None:
+                await asyncio.sleep(self.poll_interval)
+                continue
+            await self._run_job(job)
+
+    async def _sweep_loop(self):
+        while True:
+            try:
+                removed = await asyncio.to_thread(self.queue.sweep)
+                if removed:
+                    logger.info(f"Removed {removed} expired jobs")
+            except sqlite3.Error as e:
+                logger.error(f"Job queue sweep failed: {str(e)}")
+            await asyncio.sleep(max(self.queue.lease_seconds / 2, 1))
+
+    def start(self):
+        """Start the worker tasks and the sweeper on the running event loop"""
+        loop = asyncio.get_running_loop()
+        if not self._tasks and self.concurrency > 0:
+            self._tasks = [loop.create_task(self._loop()) for _ in range(self.concurrency)]
+            self._tasks.append(loop.create_task(self._sweep_loop()))
+
+    async def stop(self):
+        tasks, self._tasks = self._tasks, []
+        for task in tasks:
+            task.cancel()
+        # A job cancelled mid-run keeps its lease and is retried once the lease expires
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    def stats(self) -> dict:
+        return {
+            "worker_id": self.worker_id,
+            "concurrency": self.concurrency,
+            "running": bool(self._tasks),
+            "completed": self._stats["completed"],
+            "failed": self._stats["failed"],
+            "retried": self._stats["retried"],
+            "released": self._stats["released"],
+            "lease_lost": self._stats["lease_lost"],
+            "webhooks_sent": self._stats["webhooks_sent"],
+            "webhooks_failed": self._stats["webhooks_failed"],
+            "wait_seconds": self.wait_seconds.snapshot(),
+            "run_seconds": self.run_seconds.snapshot(),
+            "total_seconds": self.total_seconds.snapshot(),
+        }
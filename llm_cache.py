@@ -0,0 +1,265 @@
+import asyncio
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import tempfile
+import threading
+import time
+import logging
+from collections import OrderedDict, defaultdict
+from metrics import count_cache
+
+logger = logging.getLogger(__name__)
+
+# ========== LLM RESPONSE CACHE CONFIGURATION ==========
+
+LLM_CACHE_BACKEND = os.getenv("LLM_CACHE_BACKEND", "memory").lower()  # memory | sqlite | none
+LLM_CACHE_TTL = int(os.getenv("LLM_CACHE_TTL", 86400))
+LLM_CACHE_MAX_ENTRIES = int(os.getenv("LLM_CACHE_MAX_ENTRIES", 10000))
+# Distinct completions kept per prompt; repeat requests rotate through them
+LLM_CACHE_VARIANTS = int(os.getenv("LLM_CACHE_VARIANTS", 1))
+LLM_CACHE_PATH = os.getenv("LLM_CACHE_PATH", os.path.join(tempfile.gettempdir(), "llm_cache.sqlite3"))
+
+
+def normalize_prompt(text: str) -> str:
+    """Collapse whitespace so trivially different submissions share a cache entry"""
+    return re.sub(r"\s+", " ", text).strip()
+
+
+class MemoryBackend:
+    """In-process LRU of key -> (expires_at, variants, cursor)"""
+
+    blocking = False
+
+    def __init__(self, max_entries: int = LLM_CACHE_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, now):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry["expires_at"] <= now:
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return entry
+
+    def add_variant(self, key, value, max_variants, ttl, now):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry["expires_at"] <= now:
+                entry = {"variants": [], "cursor": 0, "expires_at": now + ttl}
+                self._entries[key] = entry
+            if len(entry["variants"]) < max_variants:
+                entry["variants"].append(value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def advance(self, key):
+        """Return the next round-robin index for key"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return 0
+            index = entry["cursor"]
+            entry["cursor"] += 1
+            return index
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class SQLiteBackend:
+    """On-disk cache shared by every worker process on the host"""
+
+    blocking = True
+
+    def __init__(self, path: str = LLM_CACHE_PATH, max_entries: int = LLM_CACHE_MAX_ENTRIES):
+        self.path = path
+        self.max_entries = max_entries
+        self._local = threading.local()
+        with self._connect() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS llm_cache ("
+                " key TEXT PRIMARY KEY, variants TEXT NOT NULL, cursor INTEGER NOT NULL DEFAULT 0,"
+                " expires_at REAL NOT NULL, last_access REAL NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS llm_cache_last_access ON llm_cache(last_access)")
+
+    def _connect(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+        return conn
+
+    def get(self, key, now):
+        conn = self._connect()
+        row = conn.execute(
+            "SELECT variants, cursor, expires_at FROM llm_cache WHERE key = ?", (key,)
+        ).fetchone()
+        if row is None:
+            return None
+        if row[2] <= now:
+            with conn:
+                conn.execute("DELETE FROM llm_cache WHERE key = ?", (key,))
+            return None
+        with conn:
+            conn.execute("UPDATE llm_cache SET last_access = ? WHERE key = ?", (now, key))
+        return {"variants": json.loads(row[0]), "cursor": row[1], "expires_at": row[2]}
+
+    def add_variant(self, key, value, max_variants, ttl, now):
+        conn = self._connect()
+        with conn:
+            row = conn.execute(
+                "SELECT variants, expires_at FROM llm_cache WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None or row[1] <= now:
+                variants, expires_at = [], now + ttl
+            else:
+                variants, expires_at = json.loads(row[0]), row[1]
+            if len(variants) < max_variants:
+                variants.append(value)
+            conn.execute(
+                "INSERT INTO llm_cache (key, variants, cursor, expires_at, last_access) VALUES (?, ?, 0, ?, ?)"
+                " ON CONFLICT(key) DO UPDATE SET variants = excluded.variants,"
+                " expires_at = excluded.expires_at, last_access = excluded.last_access",
+                (key, json.dumps(variants), expires_at, now)
+            )
+            # LRU eviction down to max_entries
+            conn.execute(
+                "DELETE FROM llm_cache WHERE key IN (SELECT key FROM llm_cache ORDER BY last_access DESC"
+                " LIMIT -1 OFFSET ?)", (self.max_entries,)
+            )
+
+    def advance(self, key):
+        conn = self._connect()
+        with conn:
+            row = conn.execute(
+                "UPDATE llm_cache SET cursor = cursor + 1 WHERE key = ? RETURNING cursor - 1", (key,)
+            ).fetchone()
+        return row[0] if row else 0
+
+    def __len__(self):
+        return self._connect().execute("SELECT COUNT(*) FROM llm_cache").fetchone()[0]
+
+
+class ResponseCache:
+    """
+    Cache of LLM completions keyed by (endpoint, model, normalized prompt, temperature).
+
+    With variants > 1 the first `variants` requests for a prompt each call the
+    model and store a new completion; later requests rotate through the stored
+    completions round-robin without spending API quota.
+    """
+
+    def __init__(self, backend, ttl: int = LLM_CACHE_TTL, variants: int = LLM_CACHE_VARIANTS):
+        self.backend = backend
+        self.ttl = ttl
+        self.variants = max(1, variants)
+        self._stats = defaultdict(lambda: defaultdict(int))
+        self._inflight = {}
+
+    @staticmethod
+    def make_key(endpoint: str, model: str, prompt: str, temperature: float) -> str:
+        material = json.dumps([endpoint, model, normalize_prompt(prompt), temperature])
+        return hashlib.sha256(material.encode("utf-8")).hexdigest()
+
+    async def _call(self, fn, *args):
+        if self.backend is None:
+            return None
+        if self.backend.blocking:
+            return await asyncio.to_thread(fn, *args)
+        return fn(*args)
+
+    async def _lookup(self, key, endpoint):
+        entry = await self._call(self.backend.get, key, time.time())
+        if entry and len(entry["variants"]) >= self.variants:
+            index = await self._call(self.backend.advance, key)
+            self._stats[endpoint]["hits"] += 1
+            count_cache("llm", "hit")
+            return entry["variants"][index % len(entry["variants"])]
+        return None
+
+    async def lookup(self, endpoint: str, model: str, prompt: str, temperature: float):
+        """Return a cached completion, or None (counted as a miss) if the caller must generate one"""
+        if self.backend is None:
+            return None
+        value = await self._lookup(self.make_key(endpoint, model, prompt, temperature), endpoint)
+        if value is None:
+            self._stats[endpoint]["misses"] += 1
+            count_cache("llm", "miss")
+        return value
+
+    async def store(self, endpoint: str, model: str, prompt: str, temperature: float, value: str):
+        """Store a completion generated outside get_or_compute (e.g. a finished stream)"""
+        if self.backend is None or not value:
+            return
+        key = self.make_key(endpoint, model, prompt, temperature)
+        await self._call(self.backend.add_variant, key, value, self.variants, self.ttl, time.time())
+
+    async def get_or_compute(self, endpoint: str, model: str, prompt: str, temperature: float, compute):
+        """Return a cached completion, or await compute() and store its result"""
+        if self.backend is None:
+            return await compute()
+
+        key = self.make_key(endpoint, model, prompt, temperature)
+        stats = self._stats[endpoint]
+        cached = await self._lookup(key, endpoint)
+        if cached is not None:
+            return cached
+
+        # Identical prompts arriving together share one API call
+        pending = self._inflight.get(key)
+        if pending is not None:
+            stats["coalesced"] += 1
+            count_cache("llm", "coalesced")
+            return await asyncio.shield(pending)
+
+        stats["misses"] += 1
+        count_cache("llm", "miss")
+        task = asyncio.ensure_future(compute())
+        self._inflight[key] = task
+        try:
+            # Shielded so a client hanging up does not cancel the call for coalesced waiters
+            value = await asyncio.shield(task)
+        finally:
+            self._inflight.pop(key, None)
+        await self._call(self.backend.add_variant, key, value, self.variants, self.ttl, time.time())
+        return value
+
+    def stats(self) -> dict:
+        per_endpoint = {}
+        for endpoint, counters in self._stats.items():
+            lookups = counters["hits"] + counters["misses"] + counters["coalesced"]
+            per_endpoint[endpoint] = {
+                "hits": counters["hits"],
+                "misses": counters["misses"],
+                "coalesced": counters["coalesced"],
+                "hit_ratio": round((counters["hits"] + counters["coalesced"]) / lookups, 4) if lookups else 0.0,
+            }
+        return {
+            "backend": type(self.backend).__name__ if self.backend else None,
+            "ttl_seconds": self.ttl,
+            "variants": self.variants,
+            "entries": len(self.backend) if self.backend is not None else 0,
+            "endpoints": per_endpoint,
+        }
+
+
+def make_response_cache() -> ResponseCache:
+    if LLM_CACHE_BACKEND == "sqlite":
+        backend = SQLiteBackend()
+    elif LLM_CACHE_BACKEND == "memory":
+        backend = MemoryBackend()
+    else:
+        backend = None
+    logger.info(f"LLM response cache backend: {LLM_CACHE_BACKEND}")
+    return ResponseCache(backend)
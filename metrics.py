@@ -0,0 +1,116 @@
+import os
+import time
+import logging
+from contextlib import contextmanager
+import tracing
+from prometheus_client import REGISTRY, CollectorRegistry, Counter, Gauge, Histogram, generate_latest, multiprocess
+from prometheus_client import CONTENT_TYPE_LATEST
+
+logger = logging.getLogger(__name__)
+
+# ========== METRICS CONFIGURATION ==========
+
+# prometheus_client picks where samples live when it is imported, from
+# PROMETHEUS_MULTIPROC_DIR; this module only reads it. gunicorn.conf.py (the Docker
+# CMD) sets it in the master so every worker, and its CPU pool children when
+# CPU_POOL_MODE=process, writes there and /metrics sums them all. Without it (e.g.
+# plain `uvicorn app:app`) metrics stay in this process's memory, and stages run in
+# CPU pool child processes are not collected. The directory must already exist.
+MULTIPROCESS = bool(os.getenv("PROMETHEUS_MULTIPROC_DIR"))
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "true").lower() == "true"
+
+REQUEST_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+STAGE_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+
+# ========== METRIC DEFINITIONS ==========
+
+REQUEST_LATENCY = Histogram(
+    "http_request_duration_seconds", "Request latency to the last body byte, by route template",
+    ["method", "route", "status"], buckets=REQUEST_BUCKETS,
+)
+# template_render, wkhtmltopdf, pdf_optimize, photo_prepare, text_extract
+STAGE_LATENCY = Histogram(
+    "pipeline_stage_duration_seconds", "Time spent in each stage of PDF generation and analysis",
+    ["stage"], buckets=STAGE_BUCKETS,
+)
+GROQ_LATENCY = Histogram(
+    "groq_request_duration_seconds", "Latency of each Groq API attempt, by key index and outcome",
+    ["key", "outcome"], buckets=REQUEST_BUCKETS,
+)
+GROQ_RETRIES = Counter(
+    "groq_retries_total", "Failed Groq attempts; the pool retries them while keys and queue deadline remain",
+    ["key", "reason"],
+)
+GROQ_FAILOVERS = Counter(
+    "groq_key_failovers_total", "Times a key errored and was excluded for the rest of a call",
+    ["key"],
+)
+CACHE_REQUESTS = Counter(
+    "cache_requests_total", "Cache lookups by cache and result",
+    ["cache", "result"],
+)
+JOB_QUEUE_DEPTH = Gauge(
+    "job_queue_jobs", "Jobs in the shared PDF job queue by status",
+    ["status"], multiprocess_mode="mostrecent",
+)
+
+
+@contextmanager
+def time_stage(stage: str):
+    """
+    Record the duration of the with-block under pipeline_stage_duration_seconds{stage=...}
+    and as a span of the current request's trace
+    """
+    start_time = time.perf_counter()
+    try:
+        with tracing.span(stage):
+            yield
+    finally:
+        if METRICS_ENABLED:
+            STAGE_LATENCY.labels(stage).observe(time.perf_counter() - start_time)
+
+
+def observe_stage(stage: str, seconds: float):
+    """For stages that already time themselves"""
+    tracing.record_span(stage, seconds)
+    if METRICS_ENABLED:
+        STAGE_LATENCY.labels(stage).observe(seconds)
+
+
+def count_cache(cache: str, result: str):
+    if METRICS_ENABLED:
+        CACHE_REQUESTS.labels(cache, result).inc()
+
+
+def observe_groq_attempt(key_index: int, outcome: str, seconds: float):
+    """One Groq API attempt; anything but "ok" is followed by a retry and "error" also by a failover"""
+    tracing.record_span("groq", seconds, key=key_index, outcome=outcome)
+    if METRICS_ENABLED:
+        key = str(key_index)
+        GROQ_LATENCY.labels(key, outcome).observe(seconds)
+        if outcome != "ok":
+            GROQ_RETRIES.labels(key, outcome).inc()
+        if outcome == "error":
+            GROQ_FAILOVERS.labels(key).inc()
+
+
+def observe_request(scope: dict, status_code: int, duration: float):
+    """RequestPipelineMiddleware hook; labels by route template so ids in paths do not explode cardinality"""
+    if METRICS_ENABLED:
+        route = getattr(scope.get("route"), "path", None) or "unmatched"
+        REQUEST_LATENCY.labels(scope["method"], route, str(status_code)).observe(duration)
+
+
+def render_latest() -> bytes:
+    """Exposition text, aggregated over every process writing to PROMETHEUS_MULTIPROC_DIR when it is set"""
+    if not MULTIPROCESS:
+        return generate_latest(REGISTRY)
+    registry = CollectorRegistry()
+    multiprocess.MultiProcessCollector(registry)
+    return generate_latest(registry)
+
+
+def mark_process_dead(pid: int):
+    """Drop a dead worker's live gauges (called from gunicorn's child_exit hook)"""
+    if MULTIPROCESS:
+        multiprocess.mark_process_dead(pid)
@@ -0,0 +1,183 @@
+import json
+import math
+import re
+import time
+import uuid
+import logging
+from starlette.exceptions import HTTPException
+
+logger = logging.getLogger(__name__)
+
+# Incoming X-Request-ID values are kept (so a proxy's id carries through) only if they look like ids
+_REQUEST_ID_RE = re.compile(r"^[A-Za-z0-9._-]{1,64}$")
+
+
+def security_headers(hsts: bool) -> list:
+    """Raw ASGI header pairs added to every response"""
+    headers = [
+        (b"x-content-type-options", b"nosniff"),
+        (b"x-frame-options", b"Deny"),
+        (b"x-xss-protection", b"1; mode=block"),
+        (b"referrer-policy", b"strict-origin-when-cross-origin"),
+        (b"content-security-policy", b"default-src 'self'"),
+    ]
+    if hsts:
+        headers.append((b"strict-transport-security", b"max-age=31536000; includeSubDomains"))
+    return headers
+
+
+def body_too_large(limit: int) -> HTTPException:
+    return HTTPException(status_code=413, detail=f"Request too large. Max size: {limit} bytes")
+
+
+async def send_json(send, status: int, content: dict, headers: list = ()):
+    body = json.dumps(content).encode("utf-8")
+    await send({
+        "type": "http.response.start",
+        "status": status,
+        "headers": [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode())]
+                   + list(headers),
+    })
+    await send({"type": "http.response.body", "body": body})
+
+
+class RequestPipelineMiddleware:
+    """
+    Request id, size limit, rate limit, security headers, timing and logging in a
+    single pure-ASGI layer.
+
+    Unlike BaseHTTPMiddleware this never wraps the response in a task or a
+    memory stream: it only edits the http.response.start message on its way out,
+    so streamed bodies pass straight through. The request id is stored in
+    scope["state"] (request.state.request_id) and returned as X-Request-ID.
+
+    Args:
+        app: The wrapped ASGI app
+        limiter (RateLimiter): Per-client limiter checked before the app runs
+        max_body_size (int): Largest request body accepted where body_limits has no entry
+        body_limits (dict): Path prefix -> byte limit; the longest matching prefix wins
+        headers (list): Raw header pairs added to every response (see security_headers)
+        rate_limit_exempt (tuple): Paths the limiter skips
+        slow_request_seconds (float): Requests slower than this are logged as warnings
+        debug (bool): Log every request start and metric at DEBUG level
+        observe (callable): observe(scope, status_code, seconds) after each request, e.g. for metrics
+        tracer (tracing.Tracer): Traces each request under its request id and, if the
+            tracer asks for it, adds a Server-Timing header with the span breakdown
+    """
+
+    def __init__(self, app, limiter, max_body_size: int, body_limits: dict = None, headers: list = (),
+                 rate_limit_exempt=(), slow_request_seconds: float = 5.0, debug: bool = False, observe=None,
+                 tracer=None):
+        self.app = app
+        self.limiter = limiter
+        self.max_body_size = max_body_size
+        self.body_limits = sorted((body_limits or {}).items(), key=lambda item: len(item[0]), reverse=True)
+        self.headers = list(headers)
+        self.rate_limit_exempt = frozenset(rate_limit_exempt)
+        self.slow_request_seconds = slow_request_seconds
+        self.debug = debug
+        self.observe = observe
+        self.tracer = tracer
+
+    def body_limit(self, path: str) -> int:
+        for prefix, limit in self.body_limits:
+            if path.startswith(prefix):
+                return limit
+        return self.max_body_size
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        start_time = time.perf_counter()
+        request_headers = dict(scope["headers"])
+        incoming_id = request_headers.get(b"x-request-id", b"").decode("latin-1")
+        request_id = incoming_id if _REQUEST_ID_RE.match(incoming_id) else uuid.uuid4().hex[:8]
+        scope.setdefault("state", {})["request_id"] = request_id
+
+        method = scope["method"]
+        path = scope["path"]
+        query = scope.get("query_string", b"")
+        target = f"{path}?{query.decode('latin-1')}" if query else path
+        client_ip = scope["client"][0] if scope.get("client") else "unknown"
+        extra_headers = self.headers + [(b"x-request-id", request_id.encode("latin-1"))]
+        status_code = 500
+        trace = self.tracer.start(f"{method} {path}", request_id, **{"http.method": method, "http.target": target}) \
+            if self.tracer is not None else None
+
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                present = {name.lower() for name, _ in message.get("headers", ())}
+                message["headers"] = list(message.get("headers", ())) + [
+                    header for header in extra_headers if header[0] not in present
+                ]
+                if trace is not None and self.tracer.server_timing:
+                    # Spans still running (e.g. a streamed body) are not in the header
+                    message["headers"].append((b"server-timing", trace[0].server_timing().encode("latin-1")))
+            await send(message)
+
+        body_limit = self.body_limit(path)
+        received = 0
+
+        async def receive_wrapper():
+            # Content-Length can be absent (chunked) or wrong, so count what actually arrives
+            # and stop the app reading as soon as the limit is crossed
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > body_limit:
+                    logger.warning(f"Request body over {body_limit} bytes from {client_ip} on {path}, aborted")
+                    raise body_too_large(body_limit)
+            return message
+
+        if self.debug:
+            logger.debug(f"[{request_id}] {method} {target} - IP: {client_ip} - Started")
+
+        try:
+            content_length = request_headers.get(b"content-length")
+            if content_length and content_length.isdigit() and int(content_length) > body_limit:
+                logger.warning(f"Request too large: {int(content_length)} bytes from {client_ip}")
+                await send_json(send_wrapper, 413, {"detail": body_too_large(body_limit).detail})
+                return
+
+            if path not in self.rate_limit_exempt:
+                retry_after = self.limiter.check(client_ip)
+                if retry_after:
+                    logger.warning(f"Rate limit exceeded for {client_ip}")
+                    await send_json(
+                        send_wrapper, 429,
+                        {"detail": f"Rate limit exceeded. Max {self.limiter.calls} calls per {self.limiter.period:g} seconds"},
+                        [(b"retry-after", str(math.ceil(retry_after)).encode())]
+                    )
+                    return
+
+            await self.app(scope, receive_wrapper, send_wrapper)
+        except Exception as e:
+            # Starlette's ServerErrorMiddleware (outermost) turns this into the 500,
+            # which is what gets recorded even if the app had already started a response
+            status_code = 500
+            duration = time.perf_counter() - start_time
+            logger.error(f"[{request_id}] {method} {target} - ERROR: {str(e)} - "
+                         f"Duration: {duration:.3f}s - IP: {client_ip}", exc_info=True)
+            raise
+        finally:
+            # Measured to the last body byte, not just to the response headers
+            duration = time.perf_counter() - start_time
+            if trace is not None:
+                route = getattr(scope.get("route"), "path", None)
+                if route:
+                    trace[0].root.name = f"{method} {route}"
+                self.tracer.finish(trace, **{"http.status_code": status_code})
+            if self.observe is not None:
+                self.observe(scope, status_code, duration)
+
+        if duration > self.slow_request_seconds:
+            logger.warning(f"SLOW_REQUEST: [{request_id}] {method} {path} {status_code} {duration:.3f}s")
+        level = logging.DEBUG if status_code < 400 else logging.INFO
+        if logger.isEnabledFor(level):
+            logger.log(level, f"[{request_id}] {method} {target} - Status: {status_code} - "
+                              f"Duration: {duration:.3f}s - IP: {client_ip}")
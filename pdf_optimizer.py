@@ -0,0 +1,306 @@
+import io
+import os
+import time
+import logging
+from PIL import Image
+from PyPDF2 import PdfReader, PdfWriter
+from PyPDF2.generic import (
+    ArrayObject, ContentStream, DictionaryObject, IndirectObject, NameObject, NumberObject, StreamObject,
+)
+
+logger = logging.getLogger(__name__)
+
+# ========== PDF OPTIMIZER CONFIGURATION ==========
+
+# Levels:
+#   0 "off"       - return the renderer's bytes untouched
+#   1 "lossless"  - deflate content streams, merge identical objects, drop orphans
+#   2 "balanced"  - lossless + downsample images above BALANCED_IMAGE_DPI
+#   3 "max"       - lossless + downsample images above MAX_IMAGE_DPI
+COMPRESSION_LEVELS = {"off": 0, "lossless": 1, "balanced": 2, "max": 3}
+COMPRESSION_LEVEL = COMPRESSION_LEVELS.get(os.getenv("COMPRESSION_LEVEL", "balanced").lower(), 2)
+COMPRESSION_QUALITY = int(os.getenv("COMPRESSION_QUALITY", 50))
+BALANCED_IMAGE_DPI = int(os.getenv("BALANCED_IMAGE_DPI", 200))
+MAX_IMAGE_DPI = int(os.getenv("MAX_IMAGE_DPI", 120))
+
+# Images smaller than this are not worth re-encoding
+MIN_IMAGE_BYTES = 16 * 1024
+
+
+def jpeg_quality(quality: int = COMPRESSION_QUALITY) -> int:
+    """Map COMPRESSION_QUALITY (1-100) onto a JPEG quality that stays presentable"""
+    return max(30, min(95, quality + 25))
+
+
+def _multiply(m1, m2):
+    a1, b1, c1, d1, e1, f1 = m1
+    a2, b2, c2, d2, e2, f2 = m2
+    return (
+        a1 * a2 + b1 * c2, a1 * b2 + b1 * d2,
+        c1 * a2 + d1 * c2, c1 * b2 + d1 * d2,
+        e1 * a2 + f1 * c2 + e2, e1 * b2 + f1 * d2 + f2,
+    )
+
+
+def image_display_sizes(page, reader) -> dict:
+    """
+    Largest size (width, height in points) at which each image XObject on a page is
+    drawn, found by tracking the current transformation matrix through q/Q/cm/Do.
+    """
+    sizes = {}
+    contents = page.get_contents()
+    if contents is None:
+        return sizes
+    ctm = (1, 0, 0, 1, 0, 0)
+    stack = []
+    for operands, operator in ContentStream(contents, reader).operations:
+        if operator == b"q":
+            stack.append(ctm)
+        elif operator == b"Q":
+            ctm = stack.pop() if stack else (1, 0, 0, 1, 0, 0)
+        elif operator == b"cm":
+            ctm = _multiply(tuple(float(x) for x in operands), ctm)
+        elif operator == b"Do":
+            a, b, c, d, _, _ = ctm
+            width, height = (a * a + b * b) ** 0.5, (c * c + d * d) ** 0.5
+            name = operands[0]
+            old = sizes.get(name, (0, 0))
+            sizes[name] = (max(old[0], width), max(old[1], height))
+    return sizes
+
+
+def _downsample_image(xobject, display_size, max_dpi: int, quality: int) -> int:
+    """Re-encode one image XObject in place if it exceeds max_dpi; returns bytes saved"""
+    filters = xobject.get("/Filter")
+    if isinstance(filters, list):
+        filters = filters[0] if len(filters) == 1 else None
+    if filters not in ("/DCTDecode", "/FlateDecode") or "/SMask" in xobject or "/Mask" in xobject:
+        return 0  # transparency and exotic encodings are left alone
+    if xobject.get("/BitsPerComponent", 8) != 8 or xobject.get("/ColorSpace") not in ("/DeviceRGB", "/DeviceGray"):
+        return 0
+
+    raw = xobject._data
+    if len(raw) < MIN_IMAGE_BYTES:
+        return 0
+    width, height = int(xobject["/Width"]), int(xobject["/Height"])
+    display_width, display_height = display_size
+    if display_width <= 0 or display_height <= 0:
+        return 0
+    target = (
+        min(width, max(1, round(display_width / 72 * max_dpi))),
+        min(height, max(1, round(display_height / 72 * max_dpi))),
+    )
+    if target == (width, height):
+        return 0  # already at or below the target resolution
+
+    mode = "RGB" if xobject["/ColorSpace"] == "/DeviceRGB" else "L"
+    if filters == "/DCTDecode":
+        image = Image.open(io.BytesIO(raw))
+        image.draft(mode, target)  # let libjpeg decode at reduced scale
+    else:
+        image = Image.frombytes(mode, (width, height), xobject.get_data())
+    image = image.convert(mode).resize(target, Image.LANCZOS)
+
+    output = io.BytesIO()
+    image.save(output, "JPEG", quality=quality, optimize=True, progressive=True)
+    encoded = output.getvalue()
+    if len(encoded) >= len(raw):
+        return 0
+
+    xobject._data = encoded
+    xobject[NameObject("/Filter")] = NameObject("/DCTDecode")
+    xobject[NameObject("/Width")] = NumberObject(image.width)
+    xobject[NameObject("/Height")] = NumberObject(image.height)
+    xobject.pop("/DecodeParms", None)
+    return len(raw) - len(encoded)
+
+
+def _downsample_page_images(page, reader, max_dpi: int, quality: int) -> int:
+    resources = page.get("/Resources")
+    xobjects = resources.get_object().get("/XObject") if resources else None
+    if not xobjects:
+        return 0
+    xobjects = xobjects.get_object()
+    saved = 0
+    for name, size in image_display_sizes(page, reader).items():
+        xobject = xobjects.get(name)
+        if xobject is None:
+            continue
+        xobject = xobject.get_object()
+        if xobject.get("/Subtype") != "/Image":
+            continue
+        try:
+            saved += _downsample_image(xobject, size, max_dpi, quality)
+        except Exception as e:
+            logger.warning(f"Skipping image {name}: {str(e)}")
+    return saved
+
+
+def unsubset_fonts(reader) -> list:
+    """
+    Names of embedded fonts that are not subsets (no "ABCDEF+" prefix). Font programs
+    are never rewritten here; a full font in the output means the template pulled in
+    a font the renderer could not subset, which is worth fixing at the source.
+    """
+    names = set()
+    for page in reader.pages:
+        resources = page.get("/Resources")
+        fonts = resources.get_object().get("/Font") if resources else None
+        for font in (fonts.get_object().values() if fonts else []):
+            base_font = str(font.get_object().get("/BaseFont", ""))
+            if base_font and "+" not in base_font[:8]:
+                names.add(base_font.lstrip("/"))
+    return sorted(names)
+
+
+def _rewrite_references(obj, mapping: dict, writer):
+    """Point every indirect reference inside obj (recursing into direct dicts/arrays) through mapping"""
+    items = obj.items() if isinstance(obj, DictionaryObject) else enumerate(obj)
+    for key, value in list(items):
+        if isinstance(value, IndirectObject):
+            if value.idnum in mapping:
+                obj[key] = IndirectObject(mapping[value.idnum], 0, writer)
+        elif isinstance(value, (DictionaryObject, ArrayObject)):
+            _rewrite_references(value, mapping, writer)
+
+
+def _make_streams_indirect(obj, writer):
+    """Move streams stored directly inside obj into their own objects, as the PDF spec requires"""
+    items = obj.items() if isinstance(obj, DictionaryObject) else enumerate(obj)
+    for key, value in list(items):
+        if isinstance(value, StreamObject):
+            obj[key] = writer._add_object(value)
+        elif isinstance(value, (DictionaryObject, ArrayObject)):
+            _make_streams_indirect(value, writer)
+
+
+def _references(obj):
+    """idnums of the indirect references inside obj"""
+    values = obj.values() if isinstance(obj, DictionaryObject) else obj
+    for value in values:
+        if isinstance(value, IndirectObject):
+            yield value.idnum
+        elif isinstance(value, (DictionaryObject, ArrayObject)):
+            yield from _references(value)
+
+
+def merge_identical_objects(writer: PdfWriter) -> int:
+    """
+    Merge byte-identical indirect objects and drop the ones nothing refers to, then
+    renumber what is left. PyPDF2 3.0.1 has no compress_identical_objects, and its
+    compress_content_streams stores the new content stream directly in the page
+    (invalid PDF) while leaving the old one behind as an orphan.
+
+    Works on the writer's private object table; call it just before write().
+    Returns the number of objects removed.
+    """
+    objects = writer._objects
+    index = 0
+    while index < len(objects):  # grows as streams are moved out
+        obj = objects[index]
+        if isinstance(obj, (DictionaryObject, ArrayObject)):
+            _make_streams_indirect(obj, writer)
+        index += 1
+    # Pages must stay distinct objects even when they happen to be identical
+    protected = {ref.idnum for ref in (writer._root, writer._info, writer._pages)}
+    for idnum, obj in enumerate(objects, 1):
+        if isinstance(obj, DictionaryObject) and obj.get("/Type") in ("/Page", "/Pages"):
+            protected.add(idnum)
+
+    # Merging can make parents identical in turn, so repeat until nothing changes
+    merged = {}
+    while True:
+        seen, duplicates = {}, {}
+        for idnum, obj in enumerate(objects, 1):
+            if obj is None or idnum in merged or idnum in protected:
+                continue
+            serialized = io.BytesIO()
+            obj.write_to_stream(serialized, None)
+            first = seen.setdefault((type(obj), serialized.getvalue()), idnum)
+            if first != idnum:
+                duplicates[idnum] = first
+        if not duplicates:
+            break
+        merged.update(duplicates)
+        for obj in objects:
+            if isinstance(obj, (DictionaryObject, ArrayObject)):
+                _rewrite_references(obj, duplicates, writer)
+
+    # Keep only what is reachable from the catalog and the info dictionary
+    reachable = set()
+    pending = [writer._root.idnum, writer._info.idnum]
+    while pending:
+        idnum = pending.pop()
+        if idnum in reachable or not 0 < idnum <= len(objects):
+            continue
+        reachable.add(idnum)
+        obj = objects[idnum - 1]
+        if isinstance(obj, (DictionaryObject, ArrayObject)):
+            pending.extend(_references(obj))
+
+    kept = sorted(reachable)
+    renumber = {old: new for new, old in enumerate(kept, 1)}
+    for old in kept:
+        obj = objects[old - 1]
+        if isinstance(obj, (DictionaryObject, ArrayObject)):
+            _rewrite_references(obj, renumber, writer)
+        obj.indirect_reference = IndirectObject(renumber[old], 0, writer)
+    writer._objects = [objects[old - 1] for old in kept]
+    writer._root = IndirectObject(renumber[writer._root.idnum], 0, writer)
+    writer._info = IndirectObject(renumber[writer._info.idnum], 0, writer)
+    writer._pages = IndirectObject(renumber[writer._pages.idnum], 0, writer)
+    # Maps into the old numbering; only used while pages are still being added
+    writer._idnum_hash = {}
+    writer._id_translated = {}
+    return len(objects) - len(kept)
+
+
+def optimize_pdf(pdf_bytes: bytes, level: int = COMPRESSION_LEVEL, quality: int = COMPRESSION_QUALITY) -> bytes:
+    """
+    Optimize a PDF in memory in a single parse/write pass.
+
+    Args:
+        pdf_bytes (bytes): PDF produced by the renderer
+        level (int): One of COMPRESSION_LEVELS' values
+        quality (int): COMPRESSION_QUALITY-style 1-100 quality for re-encoded images
+
+    Returns:
+        bytes: The optimized PDF, or the input unchanged if optimizing fails or
+        would not make it smaller
+    """
+    if level <= 0:
+        return pdf_bytes
+    start_time = time.perf_counter()
+    try:
+        reader = PdfReader(io.BytesIO(pdf_bytes))
+        image_bytes_saved = 0
+        if level >= 2:
+            max_dpi = MAX_IMAGE_DPI if level >= 3 else BALANCED_IMAGE_DPI
+            for page in reader.pages:
+                image_bytes_saved += _downsample_page_images(page, reader, max_dpi, jpeg_quality(quality))
+
+        writer = PdfWriter()
+        for page in reader.pages:
+            writer.add_page(page)
+        for page in writer.pages:
+            # Must run on the writer's copy of the page
+            page.compress_content_streams()
+        objects_removed = merge_identical_objects(writer)
+
+        output = io.BytesIO()
+        writer.write(output)
+        optimized = output.getvalue()
+        full_fonts = unsubset_fonts(reader)
+    except Exception as e:
+        logger.error(f"PDF optimization failed, keeping renderer output: {str(e)}")
+        return pdf_bytes
+
+    if full_fonts:
+        logger.info(f"PDF embeds fonts without subsetting: {', '.join(full_fonts)}")
+    if len(optimized) >= len(pdf_bytes):
+        return pdf_bytes
+    logger.info(f"PDF optimized in {(time.perf_counter() - start_time) * 1000:.1f}ms: "
+                f"{len(pdf_bytes)} -> {len(optimized)} bytes "
+                f"({(1 - len(optimized) / len(pdf_bytes)) * 100:.1f}% smaller, "
+                f"{image_bytes_saved} bytes from images, {objects_removed} objects merged or dropped)")
+    return optimized
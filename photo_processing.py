@@ -0,0 +1,164 @@
+import base64
+import binascii
+import hashlib
+import io
+import json
+import os
+import re
+import tempfile
+import threading
+import time
+import logging
+from PIL import Image, ImageOps
+from tiered_cache import TieredCache
+from metrics import observe_stage
+
+logger = logging.getLogger(__name__)
+
+# ========== PHOTO PREPROCESSING CONFIGURATION ==========
+
+PHOTO_PREPROCESS = os.getenv("PHOTO_PREPROCESS", "true").lower() == "true"
+# Resolution the photo is prepared for, at its CSS display size
+PHOTO_PRINT_DPI = int(os.getenv("PHOTO_PRINT_DPI", 300))
+PHOTO_JPEG_QUALITY = int(os.getenv("PHOTO_JPEG_QUALITY", 85))
+PHOTO_MAX_BYTES = int(os.getenv("PHOTO_MAX_BYTES", 10 * 1024 * 1024))
+PHOTO_MAX_PIXELS = int(os.getenv("PHOTO_MAX_PIXELS", 50_000_000))
+PHOTO_CACHE_MEMORY_BYTES = int(os.getenv("PHOTO_CACHE_MEMORY_BYTES", 16 * 1024 * 1024))
+PHOTO_CACHE_DIR = os.getenv("PHOTO_CACHE_DIR", os.path.join(tempfile.gettempdir(), "resume_photo_cache"))
+PHOTO_CACHE_DISK_BYTES = int(os.getenv("PHOTO_CACHE_DISK_BYTES", 128 * 1024 * 1024))
+
+# CSS pixels per inch, as wkhtmltopdf lays out pages
+CSS_PX_PER_INCH = 96
+# Used when a template's CSS gives no photo size
+DEFAULT_PHOTO_BOX = (250, 250)
+ACCEPTED_FORMATS = {"JPEG", "PNG", "WEBP", "GIF", "BMP", "TIFF", "MPO"}
+
+# Decompression-bomb guard for every Image.open in this process
+Image.MAX_IMAGE_PIXELS = PHOTO_MAX_PIXELS
+
+
+class PhotoError(ValueError):
+    """Raised for photos that are not valid base64 images or are too large"""
+
+
+# Processed photos, shared between CPU pool workers through the disk tier
+photo_cache = TieredCache(
+    "photo",
+    memory_max_bytes=PHOTO_CACHE_MEMORY_BYTES,
+    disk_dir=PHOTO_CACHE_DIR if PHOTO_PREPROCESS else None,
+    disk_max_bytes=PHOTO_CACHE_DISK_BYTES,
+    suffix=".jpg",
+)
+
+# ---------- template display size ----------
+
+_CSS_RULE_RE = re.compile(r"([^{}]+)\{([^{}]*)\}")
+_CSS_SIZE_RE = re.compile(r"(?<![-\w])(width|height)\s*:\s*(\d+(?:\.\d+)?)px")
+
+_photo_boxes = {}
+_photo_boxes_lock = threading.Lock()
+
+
+def parse_photo_box(html: str):
+    """
+    The (width, height) in CSS px that a template draws the photo at, read from
+    the fixed px sizes of rules whose selector mentions "photo". Rules giving both
+    sides win over rules giving one (e.g. a container's layout width). None if unset.
+    """
+    boxes = []
+    for selector, body in _CSS_RULE_RE.findall(html):
+        if "photo" not in selector or "no-photo" in selector:
+            continue
+        sizes = dict((prop, float(value)) for prop, value in _CSS_SIZE_RE.findall(body))
+        if sizes:
+            # A single given side means a square box (every template crops with object-fit: cover)
+            width = sizes.get("width", sizes.get("height"))
+            height = sizes.get("height", width)
+            boxes.append((len(sizes), width * height, (width, height)))
+    return max(boxes)[2] if boxes else None
+
+
+def template_photo_box(registry, template_name: str):
+    """Photo box for a template, re-parsed only when the template source changes"""
+    source_hash = registry.source_hash(template_name)
+    key = (registry.directory, template_name)
+    with _photo_boxes_lock:
+        cached = _photo_boxes.get(key)
+    if cached and cached[0] == source_hash:
+        return cached[1]
+    with open(registry.template_path(template_name), encoding="utf-8") as f:
+        box = parse_photo_box(f.read()) or DEFAULT_PHOTO_BOX
+    with _photo_boxes_lock:
+        _photo_boxes[key] = (source_hash, box)
+    return box
+
+
+# ---------- processing ----------
+
+def decode_photo(photo_b64: str) -> bytes:
+    # Tolerate data: URLs pasted in by clients
+    if photo_b64.startswith("data:"):
+        photo_b64 = photo_b64.partition(",")[2]
+    if len(photo_b64) * 3 // 4 > PHOTO_MAX_BYTES:
+        raise PhotoError(f"Photo exceeds {PHOTO_MAX_BYTES} bytes")
+    try:
+        return base64.b64decode(re.sub(r"\s+", "", photo_b64), validate=True)
+    except (binascii.Error, ValueError):
+        raise PhotoError("Photo is not valid base64")
+
+
+def process_photo_bytes(raw: bytes, box, dpi: int = PHOTO_PRINT_DPI, quality: int = PHOTO_JPEG_QUALITY) -> bytes:
+    """Validate, orient, center-crop to the box's aspect ratio, resize for print and encode as JPEG"""
+    try:
+        image = Image.open(io.BytesIO(raw))
+        if image.format not in ACCEPTED_FORMATS:
+            raise PhotoError(f"Unsupported photo format: {image.format}")
+        box_width, box_height = box
+        target = (max(1, round(box_width / CSS_PX_PER_INCH * dpi)),
+                  max(1, round(box_height / CSS_PX_PER_INCH * dpi)))
+        if image.format in ("JPEG", "MPO"):
+            # Decode at a reduced scale straight from the JPEG (much faster for phone photos)
+            image.draft("RGB", (target[0] * 2, target[1] * 2))
+        image = ImageOps.exif_transpose(image)
+
+        if image.mode in ("RGBA", "LA", "P"):
+            image = image.convert("RGBA")
+            background = Image.new("RGB", image.size, "white")
+            background.paste(image, mask=image.getchannel("A"))
+            image = background
+        else:
+            image = image.convert("RGB")
+
+        # Never upscale: keep the crop's aspect ratio but cap it at the source size
+        scale = min(1.0, image.width / target[0], image.height / target[1])
+        size = (max(1, round(target[0] * scale)), max(1, round(target[1] * scale)))
+        image = ImageOps.fit(image, size, Image.LANCZOS)
+
+        output = io.BytesIO()
+        image.save(output, "JPEG", quality=quality, optimize=True)
+        return output.getvalue()
+    except PhotoError:
+        raise
+    except (Image.DecompressionBombError, Image.DecompressionBombWarning):
+        raise PhotoError("Photo dimensions are too large")
+    except Exception as e:
+        raise PhotoError(f"Photo could not be decoded: {str(e)}")
+
+
+def prepare_photo(photo_b64: str, box) -> str:
+    """
+    Base64 JPEG of the photo prepared for a box of the given CSS size, served from
+    photo_cache when the same photo was prepared for the same box before.
+    """
+    material = json.dumps([photo_b64, list(box), PHOTO_PRINT_DPI, PHOTO_JPEG_QUALITY])
+    key = hashlib.sha256(material.encode("utf-8")).hexdigest()
+    processed = photo_cache.get(key)
+    if processed is None:
+        start_time = time.perf_counter()
+        raw = decode_photo(photo_b64)
+        processed = process_photo_bytes(raw, box)
+        photo_cache.put(key, processed)
+        observe_stage("photo_prepare", time.perf_counter() - start_time)
+        logger.info(f"Photo prepared for {box[0]:g}x{box[1]:g}px in "
+                    f"{(time.perf_counter() - start_time) * 1000:.1f}ms: {len(raw)} -> {len(processed)} bytes")
+    return base64.b64encode(processed).decode("ascii")
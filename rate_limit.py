@@ -0,0 +1,211 @@
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+import logging
+from collections import OrderedDict, defaultdict
+
+logger = logging.getLogger(__name__)
+
+# ========== RATE LIMIT CONFIGURATION ==========
+
+RATE_LIMIT_BACKEND = os.getenv("RATE_LIMIT_BACKEND", "sqlite").lower()  # memory | sqlite | redis
+RATE_LIMIT_PATH = os.getenv("RATE_LIMIT_PATH", os.path.join(
+    "/dev/shm" if os.access("/dev/shm", os.W_OK) else tempfile.gettempdir(), "rate_limit.sqlite3"
+))
+RATE_LIMIT_REDIS_URL = os.getenv("RATE_LIMIT_REDIS_URL", "redis://localhost:6379/0")
+# Memory backend: clients tracked at once before the least recently seen are dropped
+RATE_LIMIT_MAX_KEYS = int(os.getenv("RATE_LIMIT_MAX_KEYS", 1_000_000))
+# Idle clients evicted per request (memory) / every this many requests (sqlite)
+EVICT_BATCH = 8
+SQLITE_SWEEP_EVERY = 1000
+
+
+# GCRA (generic cell rate algorithm): a client's whole state is one number, its
+# "theoretical arrival time" (TAT). Each allowed request pushes the TAT forward
+# by period / calls; a request is refused while the TAT is more than one period
+# ahead of now. That is a token bucket holding `calls` tokens refilled evenly
+# over `period`, with no per-request timestamps. A TAT in the past means the
+# client is idle and indistinguishable from a new one, so it can be dropped.
+
+
+class MemoryBackend:
+    """Per-process key -> TAT, oldest-updated first so idle keys are evicted a few at a time"""
+
+    def __init__(self, max_keys: int = RATE_LIMIT_MAX_KEYS):
+        self.max_keys = max_keys
+        self._tats = OrderedDict()
+        self._lock = threading.Lock()
+
+    def acquire(self, key, now, interval, period):
+        with self._lock:
+            tats = self._tats
+            tat = max(tats.get(key, now), now)
+            new_tat = tat + interval
+            allowed = new_tat - now <= period
+            if allowed:
+                tats[key] = new_tat
+                tats.move_to_end(key)
+            self._evict(now)
+        return 0.0 if allowed else new_tat - now - period
+
+    def _evict(self, now):
+        tats = self._tats
+        for _ in range(EVICT_BATCH):
+            if not tats:
+                break
+            key, tat = next(iter(tats.items()))
+            if tat > now and len(tats) <= self.max_keys:
+                break
+            del tats[key]
+
+    def reset(self, key):
+        with self._lock:
+            self._tats.pop(key, None)
+
+    def __len__(self):
+        return len(self._tats)
+
+
+class SQLiteBackend:
+    """
+    Key -> TAT table shared by every worker process on the host.
+
+    Each check is a single UPSERT, so concurrent workers cannot both spend the
+    last token. The file defaults to /dev/shm and is written without fsync: the
+    state is worth at most one period and may be lost on reboot.
+    """
+
+    def __init__(self, path: str = RATE_LIMIT_PATH):
+        self.path = path
+        self._local = threading.local()
+        self._calls = 0
+        conn = self._connect()
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS rate_limits (key TEXT PRIMARY KEY, tat REAL NOT NULL) WITHOUT ROWID"
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS rate_limits_tat ON rate_limits(tat)")
+
+    def _connect(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            # Short busy timeout: checks run on the event loop and fail open if the file is locked
+            conn = sqlite3.connect(self.path, timeout=0.05, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=OFF")
+            self._local.conn = conn
+        return conn
+
+    def acquire(self, key, now, interval, period):
+        conn = self._connect()
+        row = conn.execute(
+            "INSERT INTO rate_limits (key, tat) VALUES (?1, ?2 + ?3)"
+            " ON CONFLICT(key) DO UPDATE SET tat = max(tat, ?2) + ?3 WHERE max(tat, ?2) + ?3 - ?2 <= ?4"
+            " RETURNING tat",
+            (key, now, interval, period)
+        ).fetchone()
+        self._calls += 1
+        if self._calls % SQLITE_SWEEP_EVERY == 0:
+            conn.execute("DELETE FROM rate_limits WHERE tat <= ?", (now,))
+        if row is not None:
+            return 0.0
+        tat = conn.execute("SELECT tat FROM rate_limits WHERE key = ?", (key,)).fetchone()[0]
+        return max(tat, now) + interval - now - period
+
+    def reset(self, key):
+        self._connect().execute("DELETE FROM rate_limits WHERE key = ?", (key,))
+
+    def __len__(self):
+        return self._connect().execute("SELECT COUNT(*) FROM rate_limits").fetchone()[0]
+
+
+class RedisBackend:
+    """TATs in Redis (or any server speaking its protocol), shared across hosts; keys expire on their own"""
+
+    SCRIPT = """
+    local now = tonumber(ARGV[1])
+    local interval = tonumber(ARGV[2])
+    local period = tonumber(ARGV[3])
+    local tat = math.max(tonumber(redis.call('GET', KEYS[1]) or now), now)
+    local new_tat = tat + interval
+    if new_tat - now > period then
+        return tostring(new_tat - now - period)
+    end
+    redis.call('SET', KEYS[1], tostring(new_tat), 'PX', math.ceil((new_tat - now) * 1000))
+    return '0'
+    """
+
+    def __init__(self, url: str = RATE_LIMIT_REDIS_URL):
+        import redis  # optional dependency, only needed for this backend
+        self._client = redis.Redis.from_url(url, socket_timeout=0.05)
+        self._script = self._client.register_script(self.SCRIPT)
+
+    def acquire(self, key, now, interval, period):
+        return float(self._script(keys=[f"rate_limit:{key}"], args=[now, interval, period]))
+
+    def reset(self, key):
+        self._client.delete(f"rate_limit:{key}")
+
+    def __len__(self):
+        return sum(1 for _ in self._client.scan_iter("rate_limit:*"))
+
+
+class RateLimiter:
+    """
+    Allow `calls` requests per `period` seconds per key.
+
+    Args:
+        name (str): Namespace for keys, so limiters can share a backend
+        backend: MemoryBackend, SQLiteBackend or RedisBackend
+        calls (int): Requests allowed per period (also the burst size)
+        period (float): Window in seconds
+    """
+
+    def __init__(self, name: str, backend, calls: int, period: float):
+        self.name = name
+        self.backend = backend
+        self.calls = calls
+        self.period = period
+        self.interval = period / calls
+        self._stats = defaultdict(int)
+
+    def check(self, key: str) -> float:
+        """0 if the request is allowed, else seconds until it would be"""
+        try:
+            retry_after = self.backend.acquire(f"{self.name}:{key}", time.time(), self.interval, self.period)
+        except Exception as e:
+            # A broken or locked store must not take the API down with it
+            self._stats["errors"] += 1
+            logger.warning(f"Rate limiter {self.name} failed open: {str(e)}")
+            return 0.0
+        self._stats["limited" if retry_after > 0 else "allowed"] += 1
+        return retry_after
+
+    def reset(self, key: str):
+        self.backend.reset(f"{self.name}:{key}")
+
+    def stats(self) -> dict:
+        return {
+            "backend": type(self.backend).__name__,
+            "calls": self.calls,
+            "period_seconds": self.period,
+            "allowed": self._stats["allowed"],
+            "limited": self._stats["limited"],
+            "errors": self._stats["errors"],
+        }
+
+
+def make_rate_limit_backend():
+    if RATE_LIMIT_BACKEND == "redis":
+        try:
+            backend = RedisBackend()
+        except ImportError:
+            logger.warning("RATE_LIMIT_BACKEND=redis but the redis package is not installed; using sqlite")
+            backend = SQLiteBackend()
+    elif RATE_LIMIT_BACKEND == "sqlite":
+        backend = SQLiteBackend()
+    else:
+        backend = MemoryBackend()
+    logger.info(f"Rate limit backend: {type(backend).__name__}")
+    return backend
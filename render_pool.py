@@ -0,0 +1,304 @@
+import os
+import queue
+import shutil
+import subprocess
+import tempfile
+import threading
+import time
+import uuid
+import logging
+from collections import defaultdict
+
+logger = logging.getLogger(__name__)
+
+# ========== RENDER POOL CONFIGURATION ==========
+
+RENDER_POOL_SIZE = int(os.getenv("RENDER_POOL_SIZE", 2))
+RENDER_JOB_TIMEOUT = float(os.getenv("RENDER_JOB_TIMEOUT", 30))
+RENDER_MAX_JOBS_PER_WORKER = int(os.getenv("RENDER_MAX_JOBS_PER_WORKER", 200))
+RENDER_QUEUE_TIMEOUT = float(os.getenv("RENDER_QUEUE_TIMEOUT", 10))
+RENDER_MAX_WAITING = int(os.getenv("RENDER_MAX_WAITING", 16))
+RENDER_PREWARM = os.getenv("RENDER_PREWARM", "true").lower() == "true"
+# wkhtmltopdf only reads and writes files, so its per-job scratch files go to a
+# RAM-backed directory when there is one; nothing then reaches the disk
+RENDER_SCRATCH_DIR = os.getenv("RENDER_SCRATCH_DIR") or (
+    "/dev/shm" if os.path.isdir("/dev/shm") and os.access("/dev/shm", os.W_OK) else None
+)
+
+# Line wkhtmltopdf prints on stderr once a conversion has finished
+_DONE_MARKERS = ("Done", "Exit with code")
+_WARMUP_HTML = "<html><body><p>warmup</p></body></html>"
+
+
+class RenderError(Exception):
+    """Raised when a renderer worker fails to produce a PDF"""
+
+
+class RenderPoolBusy(RenderError):
+    """Raised when no renderer worker became free within the queue timeout"""
+
+    def __init__(self, message, retry_after: int = 1):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+def build_args(options: dict) -> list:
+    """Convert pdfkit-style options ({'page-size': 'A4', 'no-outline': None}) to CLI args"""
+    args = []
+    for key, value in (options or {}).items():
+        flag = key if key.startswith("--") else f"--{key}"
+        args.append(flag)
+        if value is not None:
+            args.append(str(value))
+    return args
+
+
+def _quote(arg: str) -> str:
+    # wkhtmltopdf splits stdin lines on whitespace and honours double quotes / backslashes
+    return '"' + arg.replace("\\", "\\\\").replace('"', '\\"') + '"'
+
+
+class RendererWorker:
+    """
+    A single long-lived wkhtmltopdf process running in --read-args-from-stdin mode.
+
+    Each job is one line of arguments on stdin; the process keeps Qt/WebKit loaded
+    between jobs, so only the first conversion pays the startup cost.
+    """
+
+    def __init__(self, binary: str, scratch_dir: str):
+        self.binary = binary
+        self.scratch_dir = scratch_dir
+        self.jobs_done = 0
+        self.started_at = time.time()
+        self._lines = queue.Queue()
+        self.proc = subprocess.Popen(
+            [binary, "--read-args-from-stdin"],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.PIPE,
+        )
+        self._reader = threading.Thread(target=self._pump_stderr, daemon=True)
+        self._reader.start()
+
+    def _pump_stderr(self):
+        """Forward stderr to a queue line by line (progress bars use carriage returns)"""
+        buffer = b""
+        stream = self.proc.stderr
+        while True:
+            chunk = stream.read1(4096) if hasattr(stream, "read1") else stream.read(1)
+            if not chunk:
+                break
+            buffer += chunk.replace(b"\r", b"\n")
+            *lines, buffer = buffer.split(b"\n")
+            for line in lines:
+                if line.strip():
+                    self._lines.put(line.decode("utf-8", "replace").strip())
+        self._lines.put(None)  # EOF: process exited
+
+    def is_alive(self) -> bool:
+        return self.proc.poll() is None
+
+    def render(self, html: str, args: list, timeout: float) -> bytes:
+        """Render HTML to PDF bytes, raising RenderError on failure or timeout"""
+        job_id = uuid.uuid4().hex
+        input_path = os.path.join(self.scratch_dir, f"{job_id}.html")
+        output_path = os.path.join(self.scratch_dir, f"{job_id}.pdf")
+
+        with open(input_path, "w", encoding="utf-8") as f:
+            f.write(html)
+
+        try:
+            # Drop anything left over from a previous job
+            while not self._lines.empty():
+                self._lines.get_nowait()
+
+            line = " ".join(_quote(a) for a in args + [input_path, output_path]) + "\n"
+            try:
+                self.proc.stdin.write(line.encode("utf-8"))
+                self.proc.stdin.flush()
+            except (BrokenPipeError, OSError) as e:
+                raise RenderError(f"Renderer process is not accepting jobs: {e}")
+
+            messages = []
+            deadline = time.monotonic() + timeout
+            while True:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise RenderError(f"Render timed out after {timeout:.0f}s")
+                try:
+                    message = self._lines.get(timeout=remaining)
+                except queue.Empty:
+                    raise RenderError(f"Render timed out after {timeout:.0f}s")
+                if message is None:
+                    raise RenderError(f"Renderer process exited: {' | '.join(messages[-3:])}")
+                messages.append(message)
+                if message.startswith(_DONE_MARKERS):
+                    break
+
+            self.jobs_done += 1
+
+            # Network errors (e.g. a missing remote font) still produce a usable PDF,
+            # which matches pdfkit's behaviour of only failing on a missing output
+            if not os.path.exists(output_path) or os.path.getsize(output_path) == 0:
+                raise RenderError(f"wkhtmltopdf produced no output: {' | '.join(messages[-3:])}")
+            if not messages[-1].startswith("Done"):
+                logger.warning(f"wkhtmltopdf finished with warnings: {messages[-1]}")
+
+            with open(output_path, "rb") as f:
+                return f.read()
+        finally:
+            for path in (input_path, output_path):
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+
+    def close(self):
+        try:
+            self.proc.stdin.close()
+        except OSError:
+            pass
+        try:
+            self.proc.wait(timeout=5)
+        except subprocess.TimeoutExpired:
+            self.proc.kill()
+            self.proc.wait()
+
+
+class RenderPool:
+    """
+    Bounded pool of pre-warmed wkhtmltopdf workers.
+
+    Args:
+        binary (str): Path to the wkhtmltopdf executable
+        size (int): Maximum number of worker processes
+        job_timeout (float): Seconds a single render may take before its worker is killed
+        max_jobs_per_worker (int): Recycle a worker after this many jobs (0 disables recycling)
+        queue_timeout (float): Seconds to wait for a free worker before raising RenderPoolBusy
+        max_waiting (int): Callers allowed to queue for a worker before failing fast
+    """
+
+    def __init__(self, binary: str, size: int = RENDER_POOL_SIZE,
+                 job_timeout: float = RENDER_JOB_TIMEOUT,
+                 max_jobs_per_worker: int = RENDER_MAX_JOBS_PER_WORKER,
+                 queue_timeout: float = RENDER_QUEUE_TIMEOUT,
+                 max_waiting: int = RENDER_MAX_WAITING,
+                 prewarm: bool = RENDER_PREWARM):
+        if size < 1:
+            raise ValueError("Render pool size must be at least 1")
+        self.binary = binary
+        self.size = size
+        self.job_timeout = job_timeout
+        self.max_jobs_per_worker = max_jobs_per_worker
+        self.queue_timeout = queue_timeout
+        self.max_waiting = max_waiting
+        self.scratch_dir = tempfile.mkdtemp(prefix="render_pool_", dir=RENDER_SCRATCH_DIR)
+
+        self._idle = queue.LifoQueue()  # LIFO keeps the warmest workers busy
+        self._slots = threading.BoundedSemaphore(size)
+        self._lock = threading.Lock()
+        self._closed = False
+        self._stats = defaultdict(int)
+
+        if prewarm:
+            for _ in range(size):
+                self._idle.put(self._spawn(warm=True))
+
+    def _spawn(self, warm: bool = False) -> RendererWorker:
+        worker = RendererWorker(self.binary, self.scratch_dir)
+        with self._lock:
+            self._stats["workers_started"] += 1
+        if warm:
+            try:
+                worker.render(_WARMUP_HTML, [], self.job_timeout)
+                worker.jobs_done = 0
+            except RenderError as e:
+                logger.warning(f"Renderer warm-up failed: {str(e)}")
+        return worker
+
+    def _retire(self, worker: RendererWorker, reason: str):
+        logger.debug(f"Retiring renderer worker pid={worker.proc.pid}: {reason}")
+        with self._lock:
+            self._stats[f"workers_retired_{reason}"] += 1
+        if reason == "error":
+            worker.proc.kill()
+        worker.close()
+
+    def _acquire(self) -> RendererWorker:
+        with self._lock:
+            if self._stats["waiting"] >= self.max_waiting:
+                self._stats["rejected"] += 1
+                raise RenderPoolBusy("Render pool saturated", retry_after=int(self.queue_timeout) or 1)
+            self._stats["waiting"] += 1
+        try:
+            if not self._slots.acquire(timeout=self.queue_timeout):
+                with self._lock:
+                    self._stats["rejected"] += 1
+                raise RenderPoolBusy(
+                    f"No renderer available within {self.queue_timeout:.0f}s",
+                    retry_after=int(self.queue_timeout) or 1
+                )
+        finally:
+            with self._lock:
+                self._stats["waiting"] -= 1
+
+        try:
+            worker = self._idle.get_nowait()
+            if not worker.is_alive():
+                self._retire(worker, "dead")
+                worker = self._spawn()
+        except queue.Empty:
+            worker = self._spawn()
+        return worker
+
+    def _release(self, worker: RendererWorker, healthy: bool):
+        if not healthy:
+            self._retire(worker, "error")
+        elif self.max_jobs_per_worker and worker.jobs_done >= self.max_jobs_per_worker:
+            self._retire(worker, "recycled")
+        elif self._closed:
+            worker.close()
+        else:
+            self._idle.put(worker)
+        self._slots.release()
+
+    def render(self, html: str, options: dict = None) -> bytes:
+        """Render HTML to PDF bytes on a pooled worker"""
+        if self._closed:
+            raise RenderError("Render pool is closed")
+        worker = self._acquire()
+        start_time = time.time()
+        healthy = False
+        try:
+            pdf_bytes = worker.render(html, build_args(options), self.job_timeout)
+            healthy = True
+            return pdf_bytes
+        finally:
+            duration = time.time() - start_time
+            with self._lock:
+                self._stats["jobs"] += 1
+                self._stats["busy_seconds"] += duration
+                if not healthy:
+                    self._stats["failures"] += 1
+            self._release(worker, healthy)
+
+    def stats(self) -> dict:
+        with self._lock:
+            stats = dict(self._stats)
+        stats.update({
+            "size": self.size,
+            "idle_workers": self._idle.qsize(),
+            "job_timeout": self.job_timeout,
+            "max_jobs_per_worker": self.max_jobs_per_worker,
+        })
+        return stats
+
+    def close(self):
+        self._closed = True
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                break
+        shutil.rmtree(self.scratch_dir, ignore_errors=True)
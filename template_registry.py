@@ -0,0 +1,132 @@
+import os
+import hashlib
+import threading
+import time
+import logging
+from collections import defaultdict
+from jinja2 import Environment, FileSystemLoader, FileSystemBytecodeCache
+from metrics import observe_stage
+
+logger = logging.getLogger(__name__)
+
+# ========== TEMPLATE CACHE CONFIGURATION ==========
+
+# Compiled templates are shared between gunicorn workers through this directory.
+# Leave JINJA_BYTECODE_CACHE_DIR unset to use Jinja's per-user temp directory.
+ENABLE_BYTECODE_CACHE = os.getenv("ENABLE_BYTECODE_CACHE", "true").lower() == "true"
+JINJA_BYTECODE_CACHE_DIR = os.getenv("JINJA_BYTECODE_CACHE_DIR") or None
+
+
+class _CountingLoader(FileSystemLoader):
+    """FileSystemLoader that counts how often template source is read from disk"""
+
+    def __init__(self, searchpath, stats):
+        super().__init__(searchpath)
+        self._stats = stats
+
+    def get_source(self, environment, template):
+        self._stats["source_loads"] += 1
+        return super().get_source(environment, template)
+
+
+class _CountingEnvironment(Environment):
+    """Environment that counts template compilations (bytecode cache misses)"""
+
+    def __init__(self, stats, **kwargs):
+        super().__init__(**kwargs)
+        self._stats = stats
+
+    def compile(self, source, name=None, filename=None, raw=False, defer_init=False):
+        self._stats["compiles"] += 1
+        return super().compile(source, name, filename, raw, defer_init)
+
+
+class TemplateRegistry:
+    """
+    Process-wide cache of compiled Jinja2 templates for one template directory.
+
+    Templates are compiled once and kept in memory; with auto_reload Jinja checks
+    each template's mtime on lookup, so only templates edited on disk are reloaded.
+    """
+
+    def __init__(self, directory: str, bytecode_cache: bool = ENABLE_BYTECODE_CACHE,
+                 bytecode_cache_dir: str = JINJA_BYTECODE_CACHE_DIR):
+        self.directory = directory
+        self._stats = defaultdict(float)
+        self._lock = threading.Lock()
+        self._source_hashes = {}
+
+        if bytecode_cache and bytecode_cache_dir:
+            os.makedirs(bytecode_cache_dir, exist_ok=True)
+        self.env = _CountingEnvironment(
+            self._stats,
+            loader=_CountingLoader(directory, self._stats),
+            auto_reload=True,
+            cache_size=-1,  # never evict: the template set is small and fixed
+            bytecode_cache=FileSystemBytecodeCache(bytecode_cache_dir) if bytecode_cache else None,
+        )
+
+    def template_names(self) -> list:
+        return sorted(name[:-5] for name in os.listdir(self.directory) if name.endswith(".html"))
+
+    def template_path(self, name: str) -> str:
+        return os.path.join(self.directory, f"{name}.html")
+
+    def source_hash(self, name: str) -> str:
+        """SHA-256 of a template file, recomputed only when its mtime or size changes"""
+        if os.path.basename(name) != name:
+            raise ValueError(f"Invalid template name: {name}")
+        path = self.template_path(name)
+        stat = os.stat(path)
+        signature = (stat.st_mtime_ns, stat.st_size)
+        cached = self._source_hashes.get(name)
+        if cached and cached[0] == signature:
+            return cached[1]
+        with open(path, "rb") as f:
+            digest = hashlib.sha256(f.read()).hexdigest()
+        self._source_hashes[name] = (signature, digest)
+        return digest
+
+    def preload(self) -> int:
+        """Compile every template in the directory ahead of the first request"""
+        loaded = 0
+        for name in self.template_names():
+            try:
+                self.env.get_template(f"{name}.html")
+                loaded += 1
+            except Exception as e:
+                logger.warning(f"Failed to preload template {name}: {str(e)}")
+        logger.info(f"Preloaded {loaded} templates from {self.directory}")
+        return loaded
+
+    def render(self, name: str, data: dict) -> str:
+        start_time = time.perf_counter()
+        template = self.env.get_template(f"{name}.html")
+        lookup_done = time.perf_counter()
+        rendered = template.render(data)
+        end_time = time.perf_counter()
+
+        with self._lock:
+            self._stats["renders"] += 1
+            self._stats["lookup_seconds"] += lookup_done - start_time
+            self._stats["render_seconds"] += end_time - lookup_done
+        observe_stage("template_render", end_time - start_time)
+        return rendered
+
+    def stats(self) -> dict:
+        with self._lock:
+            stats = dict(self._stats)
+        return {
+            "directory": self.directory,
+            "renders": int(stats.get("renders", 0)),
+            "source_loads": int(stats.get("source_loads", 0)),
+            "compiles": int(stats.get("compiles", 0)),
+            "lookup_seconds": round(stats.get("lookup_seconds", 0.0), 6),
+            "render_seconds": round(stats.get("render_seconds", 0.0), 6),
+            "bytecode_cache": self.env.bytecode_cache is not None,
+        }
+
+
+# Shared registries used by generate_resume / generate_coverletter
+resume_templates = TemplateRegistry("templates")
+cover_letter_templates = TemplateRegistry("cover_letters")
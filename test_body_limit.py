@@ -0,0 +1,125 @@
+"""
+RequestPipelineMiddleware body limits against chunked uploads (no Content-Length).
+
+Run with:
+    python -m pytest -q test_body_limit.py
+"""
+import asyncio
+import os
+
+import httpx
+from fastapi import FastAPI, File, UploadFile
+from pydantic import BaseModel
+
+from middleware import RequestPipelineMiddleware
+from rate_limit import MemoryBackend, RateLimiter
+
+JSON_LIMIT = 1024 * 1024
+UPLOAD_LIMIT = 4 * 1024 * 1024
+CHUNK_SIZE = 64 * 1024
+BODY_SIZE = 32 * 1024 * 1024
+BOUNDARY = b"testboundary"
+
+
+class TextRequest(BaseModel):
+    text: str
+
+
+def make_app():
+    app = FastAPI()
+
+    @app.post("/enhance_summary")
+    async def enhance_summary(request: TextRequest):
+        return {"chars": len(request.text)}
+
+    @app.post("/analyze-resume")
+    async def analyze_resume(resume: UploadFile = File(...)):
+        return {"bytes": len(await resume.read())}
+
+    limiter = RateLimiter("test", MemoryBackend(), 10 ** 9, 60)
+    return RequestPipelineMiddleware(
+        app, limiter, max_body_size=BODY_SIZE * 2,
+        body_limits={"/enhance": JSON_LIMIT, "/analyze-resume": UPLOAD_LIMIT},
+    )
+
+
+class ChunkedBody:
+    """Async body for httpx, which then sends Transfer-Encoding: chunked; counts what was pulled"""
+
+    def __init__(self, head: bytes, tail: bytes, size: int = BODY_SIZE):
+        self.head = head
+        self.tail = tail
+        self.size = size
+        self.sent = 0
+
+    async def __aiter__(self):
+        for chunk in [self.head] + [b"x" * CHUNK_SIZE] * (self.size // CHUNK_SIZE) + [self.tail]:
+            self.sent += len(chunk)
+            yield chunk
+
+
+def post_chunked(path: str, content_type: bytes, body: ChunkedBody, app=None):
+    seen_headers = {}
+
+    async def run():
+        nonlocal app
+        app = app or make_app()
+
+        async def recording_app(scope, receive, send):
+            seen_headers.update(dict(scope["headers"]))
+            await app(scope, receive, send)
+
+        transport = httpx.ASGITransport(app=recording_app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            return await client.post(path, content=body, headers={"content-type": content_type.decode()})
+
+    response = asyncio.run(run())
+    return response, seen_headers
+
+
+def test_chunked_json_body_over_limit_is_rejected_early():
+    body = ChunkedBody(b'{"text": "', b'"}')
+    response, headers = post_chunked("/enhance_summary", b"application/json", body)
+
+    assert b"content-length" not in headers
+    assert headers.get(b"transfer-encoding") == b"chunked"
+    assert response.status_code == 413
+    # Reading stopped within one chunk of the route's limit, not at the end of the 32MB body
+    assert body.sent <= JSON_LIMIT + 2 * CHUNK_SIZE
+
+
+def test_chunked_upload_over_limit_is_rejected_early():
+    body = ChunkedBody(
+        b"--" + BOUNDARY + b'\r\nContent-Disposition: form-data; name="resume"; filename="cv.pdf"\r\n'
+        b"Content-Type: application/pdf\r\n\r\n",
+        b"\r\n--" + BOUNDARY + b"--\r\n",
+    )
+    response, headers = post_chunked("/analyze-resume", b"multipart/form-data; boundary=" + BOUNDARY, body)
+
+    assert b"content-length" not in headers
+    assert response.status_code == 413
+    assert body.sent <= UPLOAD_LIMIT + 2 * CHUNK_SIZE
+
+
+def test_chunked_body_under_limit_is_accepted():
+    body = ChunkedBody(b'{"text": "', b'"}', size=JSON_LIMIT // 2)
+    response, _ = post_chunked("/enhance_summary", b"application/json", body)
+
+    assert response.status_code == 200
+    assert response.json()["chars"] == JSON_LIMIT // 2
+
+
+def test_enhance_batch_takes_a_resume_sized_body():
+    # /enhance/batch carries a whole ResumeRequest (photo included), so the app must not
+    # let the 1MB "/enhance" prefix cover it
+    os.environ.setdefault("GROQ_API_KEY1", "stub-key")
+    import app as app_module
+
+    photo_size = 3 * 1024 * 1024
+    body = ChunkedBody(b'{"resume": {"photo": "', b'"}}', size=photo_size)
+    response, headers = post_chunked("/enhance/batch", b"application/json", body, app=app_module.app)
+
+    assert b"content-length" not in headers
+    assert body.sent > photo_size
+    # Read to the end and rejected by validation (no personal_info etc.), not by the size limit
+    assert response.status_code == 422
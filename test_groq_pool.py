@@ -0,0 +1,115 @@
+"""
+GroqClientPool against the local stub server from benchmark.py.
+
+Run with:
+    python -m pytest -q test_groq_pool.py
+"""
+import asyncio
+import os
+import time
+
+import pytest
+
+from benchmark import start_groq_stub
+
+os.environ.setdefault("GROQ_API_KEY1", "stub-key")
+from ai_helper import GroqClientPool  # noqa: E402 (the module builds a pool from GROQ_API_KEY# on import)
+
+STUB_LATENCY = 0.05
+STUB_CONCURRENCY_PER_KEY = 2
+
+
+@pytest.fixture
+def stub():
+    servers = []
+
+    def start(**kwargs):
+        server, base_url = start_groq_stub(
+            latency=STUB_LATENCY, per_key_concurrency=STUB_CONCURRENCY_PER_KEY, **kwargs
+        )
+        servers.append(server)
+        return base_url
+
+    yield start
+    for server in servers:
+        server.shutdown()
+
+
+def make_pool(base_url, keys, **kwargs):
+    # Budgets high enough that only the stub's per-key concurrency limits throughput
+    return GroqClientPool(keys, max_concurrency_per_key=STUB_CONCURRENCY_PER_KEY, base_url=base_url,
+                          rpm=100000, tpm=100000000, **kwargs)
+
+
+async def complete(pool, total):
+    async def one():
+        return await pool.chat_completion(
+            model="stub", messages=[{"role": "user", "content": "hello"}], max_completion_tokens=16
+        )
+    try:
+        return await asyncio.gather(*(one() for _ in range(total)))
+    finally:
+        # Close the HTTP clients while their event loop is still running
+        await asyncio.gather(*(key.client.close() for key in pool.keys))
+
+
+def throughput(base_url, key_count, total=40):
+    pool = make_pool(base_url, [f"stub-key-{i}" for i in range(key_count)])
+    start = time.perf_counter()
+    asyncio.run(complete(pool, total))
+    return total / (time.perf_counter() - start)
+
+
+def test_throughput_scales_with_keys(stub):
+    base_url = stub()
+    one_key = throughput(base_url, 1)
+    four_keys = throughput(base_url, 4)
+    # Ideal is 4x; leave room for client and stub overhead
+    assert four_keys >= 3 * one_key, (one_key, four_keys)
+
+
+def test_rate_limited_key_fails_over(stub, caplog):
+    base_url = stub(rate_limited_keys=["stub-key-limited"], retry_after=30)
+    pool = make_pool(base_url, ["stub-key-limited", "stub-key-ok"])
+
+    completions = asyncio.run(complete(pool, 10))
+
+    assert all(c.choices[0].message.content for c in completions)
+    limited, ok = pool.keys
+    assert limited.rate_limited >= 1
+    assert limited.successes == 0
+    assert ok.successes == 10
+    # The 429 is quota, not a broken key: it cools down for retry-after instead of being benched
+    assert limited.failures == 0
+    assert limited.cooldown_until - time.monotonic() > 20
+    # Cool-downs are logged with the key index as a field, not printed
+    assert {r.key_index for r in caplog.records if hasattr(r, "key_index")} == {limited.index}
+
+
+def test_waits_for_benched_and_cooling_keys(stub):
+    base_url = stub()
+    pool = make_pool(base_url, ["stub-key-benched", "stub-key-cooling"], queue_deadline=5)
+    benched, cooling = pool.keys
+    now = time.monotonic()
+    benched.unhealthy_until = now + 0.3  # e.g. after another request's error
+    cooling.cooldown_until = now + 0.3  # e.g. after another request's 429
+
+    start = time.perf_counter()
+    completions = asyncio.run(complete(pool, 2))
+
+    assert len(completions) == 2
+    assert time.perf_counter() - start >= 0.25
+    assert pool.timeouts == 0
+
+
+def test_failed_request_refunds_reserved_tokens(stub):
+    base_url = stub(rate_limited_keys=["stub-key-limited"], retry_after=30)
+    pool = GroqClientPool(["stub-key-limited"], base_url=base_url, rpm=100000, tpm=600, queue_deadline=0.2)
+    key = pool.keys[0]
+
+    with pytest.raises(Exception, match="exhausted"):
+        asyncio.run(complete(pool, 1))
+
+    # 10 tokens/s refill is far less than the reserved estimate within the deadline
+    key.tokens.refill(time.monotonic())
+    assert key.tokens.level == key.tokens.capacity
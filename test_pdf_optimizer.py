@@ -0,0 +1,82 @@
+"""
+optimize_pdf's object merging on PDFs with known duplicates.
+
+Run with:
+    python -m pytest -q test_pdf_optimizer.py
+"""
+import io
+import os
+import zlib
+
+import pytest
+from PyPDF2 import PdfReader
+
+from pdf_optimizer import optimize_pdf
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+
+def build_pdf(objects: list) -> bytes:
+    """Serialize numbered object bodies (object n is objects[n - 1]) with a valid xref table"""
+    out = io.BytesIO()
+    out.write(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, 1):
+        offsets.append(out.tell())
+        out.write(b"%d 0 obj\n" % number + body + b"\nendobj\n")
+    xref = out.tell()
+    out.write(b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1))
+    for offset in offsets:
+        out.write(b"%010d 00000 n \n" % offset)
+    out.write(b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref))
+    return out.getvalue()
+
+
+def stream(dictionary: bytes, data: bytes) -> bytes:
+    return b"<< " + dictionary + b" /Length %d >>\nstream\n" % len(data) + data + b"\nendstream"
+
+
+def pdf_with_duplicate_images(pages: int = 3) -> bytes:
+    """Every page draws its own copy of the same 64x64 image, as renderers emit for a repeated logo"""
+    pixels = bytes((x * 7 + y * 13) % 256 for y in range(64) for x in range(64 * 3))
+    image = stream(b"/Type /XObject /Subtype /Image /Width 64 /Height 64 /ColorSpace /DeviceRGB "
+                   b"/BitsPerComponent 8 /Filter /FlateDecode", zlib.compress(pixels))
+    content = stream(b"", b"q 100 0 0 100 50 600 cm /Im0 Do Q")
+    objects = [b"<< /Type /Catalog /Pages 2 0 R >>", None]
+    kids = []
+    for _ in range(pages):
+        page_number = len(objects) + 1
+        kids.append(b"%d 0 R" % page_number)
+        objects += [
+            b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] /Contents %d 0 R"
+            b" /Resources << /XObject << /Im0 %d 0 R >> >> >>" % (page_number + 1, page_number + 2),
+            content,
+            image,
+        ]
+    objects[1] = b"<< /Type /Pages /Kids [%s] /Count %d >>" % (b" ".join(kids), pages)
+    return build_pdf(objects)
+
+
+def test_duplicate_objects_are_merged():
+    original = pdf_with_duplicate_images(pages=3)
+    optimized = optimize_pdf(original, level=1)
+
+    # Three copies of the image (and of the content stream) collapse into one
+    assert len(optimized) < len(original) * 0.6, (len(original), len(optimized))
+    reader = PdfReader(io.BytesIO(optimized))
+    assert len(reader.pages) == 3
+    images = {page["/Resources"]["/XObject"].raw_get("/Im0").idnum for page in reader.pages}
+    assert len(images) == 1
+    assert reader.pages[2]["/Resources"]["/XObject"]["/Im0"]["/Width"] == 64
+
+
+@pytest.mark.parametrize("name", ["resume.pdf", "resume_production.pdf"])
+def test_renderer_output_gets_smaller_and_keeps_its_text(name):
+    with open(os.path.join(HERE, name), "rb") as f:
+        original = f.read()
+    optimized = optimize_pdf(original, level=1)
+
+    assert len(optimized) < len(original)
+    before, after = PdfReader(io.BytesIO(original)), PdfReader(io.BytesIO(optimized))
+    assert len(after.pages) == len(before.pages)
+    assert [page.extract_text() for page in after.pages] == [page.extract_text() for page in before.pages]
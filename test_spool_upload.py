@@ -0,0 +1,74 @@
+"""
+spool_upload with starlette UploadFiles held in memory and rolled over to disk.
+
+Run with:
+    python -m pytest -q test_spool_upload.py
+"""
+import asyncio
+import hashlib
+import os
+import tempfile
+
+import pytest
+from starlette.datastructures import UploadFile
+
+import text_extraction
+from text_extraction import UploadTooLarge, extract_upload_text, spool_upload
+
+MAX_MEMORY = 1024 * 1024  # starlette's default spool size
+
+
+def make_upload(content: bytes) -> UploadFile:
+    # As starlette builds it: a SpooledTemporaryFile that rolls to disk past MAX_MEMORY
+    file = tempfile.SpooledTemporaryFile(max_size=MAX_MEMORY)
+    file.write(content)
+    file.seek(0)
+    return UploadFile(file, size=len(content), filename="cv.txt")
+
+
+def text_upload(size: int) -> bytes:
+    line = b"Senior engineer with Python, FastAPI and PostgreSQL experience.\n"
+    return line * (size // len(line) + 1)
+
+
+@pytest.fixture
+def spool_dir(monkeypatch):
+    with tempfile.TemporaryDirectory() as directory:
+        monkeypatch.setattr(text_extraction, "UPLOAD_SPOOL_DIR", directory)
+        yield directory
+
+
+def test_upload_on_disk_is_hashed_in_place(spool_dir):
+    content = text_upload(3 * MAX_MEMORY)
+    upload_file = make_upload(content)
+    assert not upload_file._in_memory
+
+    upload = asyncio.run(spool_upload(upload_file))
+
+    assert upload.path is None
+    assert os.listdir(spool_dir) == []
+    assert upload.size == len(content)
+    assert upload.sha256 == hashlib.sha256(content).hexdigest()
+    assert upload.file_type == "txt"
+    assert extract_upload_text(upload).startswith("Senior engineer")
+    upload.close()
+    assert not upload_file.file.closed  # starlette closes it with the request
+
+
+def test_upload_in_memory_is_copied_to_disk(spool_dir):
+    content = text_upload(MAX_MEMORY // 4)
+    upload_file = make_upload(content)
+    assert upload_file._in_memory
+
+    with asyncio.run(spool_upload(upload_file)) as upload:
+        assert upload_file._in_memory  # checking for a descriptor did not roll it over
+        assert os.listdir(spool_dir) == [os.path.basename(upload.path)]
+        assert upload.sha256 == hashlib.sha256(content).hexdigest()
+    assert os.listdir(spool_dir) == []
+
+
+def test_upload_on_disk_over_limit_is_rejected(spool_dir):
+    upload_file = make_upload(text_upload(2 * MAX_MEMORY))
+
+    with pytest.raises(UploadTooLarge):
+        asyncio.run(spool_upload(upload_file, max_bytes=MAX_MEMORY))
@@ -0,0 +1,533 @@
+import asyncio
+import codecs
+import hashlib
+import io
+import json
+import math
+import multiprocessing
+import os
+import re
+import shutil
+import tempfile
+import threading
+import time
+import unicodedata
+import zipfile
+import logging
+from concurrent.futures import ProcessPoolExecutor
+from PyPDF2 import PdfReader
+import pdfplumber
+from docx import Document
+from metrics import observe_stage
+from tiered_cache import TieredCache
+
+logger = logging.getLogger(__name__)
+
+# ========== TEXT EXTRACTION CONFIGURATION ==========
+
+UPLOAD_CHUNK_SIZE = int(os.getenv("UPLOAD_CHUNK_SIZE", 1024 * 1024))
+MAX_UPLOAD_BYTES = int(os.getenv("MAX_UPLOAD_BYTES", os.getenv("MAX_REQUEST_SIZE", 52428800)))
+UPLOAD_SPOOL_DIR = os.getenv("UPLOAD_SPOOL_DIR") or None
+# Extraction stops at whichever cap is hit first; the character cap is the
+# prompt budget for resume text, so reading beyond it is wasted work
+EXTRACT_MAX_PAGES = int(os.getenv("EXTRACT_MAX_PAGES", 30))
+EXTRACT_MAX_CHARS = int(os.getenv("EXTRACT_MAX_CHARS", 24000))
+
+# "pypdf2" is fast; "pdfplumber" follows layout (columns, tables) but is several
+# times slower; "auto" uses pypdf2 and switches when its output looks unusable
+PDF_BACKEND = os.getenv("PDF_BACKEND", "auto").lower()
+PDF_BACKENDS = ("auto", "pypdf2", "pdfplumber")
+PDF_EXTRACT_WORKERS = int(os.getenv("PDF_EXTRACT_WORKERS", min(4, os.cpu_count() or 1)))
+# Below this many pages the process hop costs more than it saves
+PDF_PARALLEL_MIN_PAGES = int(os.getenv("PDF_PARALLEL_MIN_PAGES", 8))
+# auto: pypdf2 output under this many characters per page, or with almost no
+# spaces (words run together), is re-extracted with pdfplumber
+AUTO_MIN_CHARS_PER_PAGE = 40
+AUTO_MIN_SPACE_RATIO = 0.05
+
+# Extracted text keyed by upload SHA-256, so re-uploads of the same file skip parsing
+TEXT_CACHE_ENABLED = os.getenv("TEXT_CACHE_ENABLED", "true").lower() == "true"
+TEXT_CACHE_MEMORY_BYTES = int(os.getenv("TEXT_CACHE_MEMORY_BYTES", 32 * 1024 * 1024))
+# The disk tier is opt-in: extracted resume text is personal data, and by default it
+# never outlives the process. Set TEXT_CACHE_DIR (ideally on tmpfs) to enable it.
+TEXT_CACHE_DIR = os.getenv("TEXT_CACHE_DIR") or None
+TEXT_CACHE_DISK_BYTES = int(os.getenv("TEXT_CACHE_DISK_BYTES", 256 * 1024 * 1024))
+# Bump when extraction or normalization changes so stale entries are not served
+TEXT_CACHE_VERSION = 1
+
+# Chunk sizes for formats without real pages
+TEXT_CHUNK_CHARS = 8192
+DOCX_PARAGRAPHS_PER_PAGE = 40
+
+HEAD_BYTES = 8
+
+
+class UploadTooLarge(Exception):
+    """Raised when an upload exceeds MAX_UPLOAD_BYTES while it is being spooled"""
+
+    def __init__(self, max_bytes: int):
+        super().__init__(f"Upload exceeds the {max_bytes} byte limit")
+        self.max_bytes = max_bytes
+
+
+class SpooledUpload:
+    """
+    An upload on disk, read in fixed-size chunks and never held in memory whole.
+
+    Starlette has usually spooled the upload to a temp file already; that file is
+    then read in place and `path` stays None until materialize() copies it out.
+    Otherwise the upload was copied to `path` chunk by chunk. The SHA-256 of the
+    content is computed either way. Use as a context manager (or call close())
+    to delete any copy.
+    """
+
+    def __init__(self, path: str, size: int, sha256: str, head: bytes, filename: str = None, file=None):
+        self.path = path
+        self.size = size
+        self.sha256 = sha256
+        self.head = head
+        self.filename = filename
+        self.file = file
+        self._file_type = None
+
+    @property
+    def source(self):
+        """The path, or the upload's own file rewound to the start"""
+        if self.path is not None:
+            return self.path
+        self.file.seek(0)
+        return self.file
+
+    @property
+    def file_type(self):
+        if self._file_type is None:
+            self._file_type = detect_file_type_at(self.source, self.head)
+        return self._file_type
+
+    def materialize(self) -> str:
+        """Copy an in-place upload to a temp file (for worker processes, which need a path)"""
+        if self.path is None:
+            fd, path = tempfile.mkstemp(prefix="upload_", dir=UPLOAD_SPOOL_DIR)
+            with os.fdopen(fd, "wb") as f:
+                self.file.seek(0)
+                shutil.copyfileobj(self.file, f, UPLOAD_CHUNK_SIZE)
+            self.path = path
+        return self.path
+
+    def close(self):
+        # An in-place file belongs to the request and is closed with it
+        if self.path is None:
+            return
+        try:
+            os.remove(self.path)
+        except OSError:
+            pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def _on_disk(file) -> bool:
+    """Whether file has a real descriptor, without rolling a SpooledTemporaryFile over to disk"""
+    if file is None or not getattr(file, "_rolled", True):
+        return False
+    try:
+        file.fileno()
+        return file.seekable()
+    except (AttributeError, OSError, ValueError):
+        return False
+
+
+def _hash_in_place(file, max_bytes: int, chunk_size: int):
+    digest = hashlib.sha256()
+    size = 0
+    head = b""
+    file.seek(0)
+    while True:
+        chunk = file.read(chunk_size)
+        if not chunk:
+            break
+        size += len(chunk)
+        if size > max_bytes:
+            raise UploadTooLarge(max_bytes)
+        if len(head) < HEAD_BYTES:
+            head = (head + chunk)[:HEAD_BYTES]
+        digest.update(chunk)
+    file.seek(0)
+    return size, digest.hexdigest(), head
+
+
+async def spool_upload(upload, max_bytes: int = MAX_UPLOAD_BYTES,
+                       chunk_size: int = UPLOAD_CHUNK_SIZE) -> SpooledUpload:
+    """
+    Hash an UploadFile whose file is already on disk in place; copy anything else
+    (in-memory uploads, objects with only async read(size)) to a temp file chunk by chunk
+    """
+    filename = getattr(upload, "filename", None)
+    file = getattr(upload, "file", None)
+    if _on_disk(file):
+        size, sha256, head = await asyncio.to_thread(_hash_in_place, file, max_bytes, chunk_size)
+        return SpooledUpload(None, size, sha256, head, filename, file=file)
+
+    digest = hashlib.sha256()
+    size = 0
+    head = b""
+    fd, path = tempfile.mkstemp(prefix="upload_", dir=UPLOAD_SPOOL_DIR)
+    try:
+        with os.fdopen(fd, "wb") as f:
+            while True:
+                chunk = await upload.read(chunk_size)
+                if not chunk:
+                    break
+                size += len(chunk)
+                if size > max_bytes:
+                    raise UploadTooLarge(max_bytes)
+                if len(head) < HEAD_BYTES:
+                    head = (head + chunk)[:HEAD_BYTES]
+                digest.update(chunk)
+                await asyncio.to_thread(f.write, chunk)
+    except BaseException:
+        os.remove(path)
+        raise
+    return SpooledUpload(path, size, digest.hexdigest(), head, filename)
+
+
+# ---------- file type detection ----------
+
+def _looks_like_docx(source) -> bool:
+    try:
+        with zipfile.ZipFile(source) as archive:
+            return "word/document.xml" in archive.namelist()
+    except (zipfile.BadZipFile, OSError):
+        return False
+
+
+def _looks_like_text(sample: bytes) -> bool:
+    try:
+        # A multi-byte character may be cut at the end of the sample
+        codecs.getincrementaldecoder("utf-8")().decode(sample, final=False)
+        return True
+    except UnicodeDecodeError:
+        # latin-1 decodes any byte; reject binary data by its control characters
+        return not any(b < 9 or 13 < b < 32 for b in sample)
+
+
+def detect_file_type_at(source, head: bytes = None):
+    """Detect pdf/docx/txt from a path or binary file object by reading only what is needed"""
+    if head is None:
+        head = _read_sample(source, HEAD_BYTES)
+    if head.startswith(b'%PDF'):
+        return 'pdf'
+    if head.startswith(b'PK\x03\x04'):
+        return 'docx' if _looks_like_docx(source) else None
+    return 'txt' if _looks_like_text(_read_sample(source, 64 * 1024)) else None
+
+
+def _read_sample(source, size: int) -> bytes:
+    if isinstance(source, (str, os.PathLike)):
+        with open(source, "rb") as f:
+            return f.read(size)
+    position = source.tell()
+    sample = source.read(size)
+    source.seek(position)
+    return sample
+
+
+# ---------- page generators ----------
+
+def _pdf_pages(f):
+    # Reading from the open file keeps pages lazy; PdfReader(path) loads the whole file
+    yield from _pypdf2_pages(f, 0, math.inf)
+
+
+def _docx_pages(f):
+    document = Document(f)
+    batch = []
+    for paragraph in document.paragraphs:
+        batch.append(paragraph.text)
+        if len(batch) >= DOCX_PARAGRAPHS_PER_PAGE:
+            yield "\n".join(batch) + "\n"
+            batch = []
+    if batch:
+        yield "\n".join(batch)
+
+
+def _txt_pages(f):
+    # Pick the encoding from a sample so the rest can be decoded as it streams
+    sample = _read_sample(f, 64 * 1024)
+    try:
+        codecs.getincrementaldecoder("utf-8")().decode(sample, final=False)
+        encoding = "utf-8"
+    except UnicodeDecodeError:
+        encoding = "cp1252"
+    decoder = codecs.getincrementaldecoder(encoding)(errors="replace")
+    while True:
+        chunk = f.read(TEXT_CHUNK_CHARS)
+        text = decoder.decode(chunk, final=not chunk)
+        if text:
+            yield text
+        if not chunk:
+            break
+
+
+_PAGE_READERS = {"pdf": _pdf_pages, "docx": _docx_pages, "txt": _txt_pages}
+
+
+def iter_pages(source, file_type: str = None):
+    """
+    Yield text one page at a time (paragraph batches for DOCX, chunks for TXT).
+
+    source is a path or a seekable binary file object.
+    """
+    if isinstance(source, (str, os.PathLike)):
+        with open(source, "rb") as f:
+            yield from iter_pages(f, file_type)
+        return
+    file_type = file_type or detect_file_type_at(source)
+    if file_type not in _PAGE_READERS:
+        raise ValueError(f"Unsupported file type: {file_type}")
+    yield from _PAGE_READERS[file_type](source)
+
+
+# ---------- PDF backends ----------
+
+def _open_pdf(source):
+    return open(source, "rb") if isinstance(source, (str, os.PathLike)) else None
+
+
+def _pypdf2_pages(source, start, stop):
+    handle = _open_pdf(source)
+    try:
+        reader = PdfReader(handle or source)
+        for index in range(start, min(stop, len(reader.pages))):
+            yield reader.pages[index].extract_text() or ""
+    finally:
+        if handle:
+            handle.close()
+
+
+def _pdfplumber_pages(source, start, stop):
+    with pdfplumber.open(source) as pdf:
+        for page in pdf.pages[start:stop]:
+            yield page.extract_text() or ""
+            page.flush_cache()  # parsed layout objects are the bulk of pdfplumber's memory
+
+
+_PDF_BACKEND_READERS = {"pypdf2": _pypdf2_pages, "pdfplumber": _pdfplumber_pages}
+
+
+def extract_page_range(source, backend: str, start: int, stop: int) -> list:
+    """Text of pages [start, stop) with one backend; runs in extraction worker processes"""
+    return list(_PDF_BACKEND_READERS[backend](source, start, stop))
+
+
+def pdf_page_count(source) -> int:
+    handle = _open_pdf(source)
+    try:
+        return len(PdfReader(handle or source).pages)
+    finally:
+        if handle:
+            handle.close()
+
+
+_page_executor = None
+_page_executor_lock = threading.Lock()
+
+
+def _get_page_executor():
+    global _page_executor
+    with _page_executor_lock:
+        if _page_executor is None:
+            # forkserver: extraction is submitted from request threads, and forking a
+            # multi-threaded process can copy held locks into the child
+            method = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else None
+            _page_executor = ProcessPoolExecutor(
+                max_workers=PDF_EXTRACT_WORKERS,
+                mp_context=multiprocessing.get_context(method) if method else None,
+            )
+        return _page_executor
+
+
+def shutdown_page_executor():
+    global _page_executor
+    with _page_executor_lock:
+        executor, _page_executor = _page_executor, None
+    if executor is not None:
+        executor.shutdown(wait=True, cancel_futures=True)
+
+
+def _extract_pages(source, backend, pages, max_chars, workers):
+    """Concatenate up to `pages` pages, stopping once max_chars is reached"""
+    parts = []
+    total = 0
+    parallel = (workers > 1 and pages >= PDF_PARALLEL_MIN_PAGES
+                and isinstance(source, (str, os.PathLike)))
+    if not parallel:
+        page_texts = _PDF_BACKEND_READERS[backend](source, 0, pages)
+        try:
+            for text in page_texts:
+                parts.append(text)
+                total += len(text)
+                if total >= max_chars:
+                    break
+        finally:
+            page_texts.close()
+        return "".join(parts)
+
+    chunk = math.ceil(pages / workers)
+    executor = _get_page_executor()
+    futures = [executor.submit(extract_page_range, source, backend, start, min(start + chunk, pages))
+               for start in range(0, pages, chunk)]
+    try:
+        # Ranges are joined in page order; later ranges are dropped once the budget is full
+        for future in futures:
+            for text in future.result():
+                parts.append(text)
+                total += len(text)
+            if total >= max_chars:
+                break
+    finally:
+        for future in futures:
+            future.cancel()
+    return "".join(parts)
+
+
+def _looks_unusable(text: str, pages: int) -> bool:
+    stripped = text.strip()
+    if len(stripped) < AUTO_MIN_CHARS_PER_PAGE * pages:
+        return True
+    return stripped.count(" ") / len(stripped) < AUTO_MIN_SPACE_RATIO
+
+
+def extract_pdf_text(source, backend: str = None, max_pages: int = EXTRACT_MAX_PAGES,
+                     max_chars: int = EXTRACT_MAX_CHARS, workers: int = PDF_EXTRACT_WORKERS) -> str:
+    """
+    Extract PDF text with the chosen backend, splitting page ranges across worker
+    processes for long documents. If a backend yields no text (or, for "auto",
+    text that looks unusable) the other backend is tried and the longer result kept.
+    """
+    backend = backend or PDF_BACKEND
+    if backend not in PDF_BACKENDS:
+        raise ValueError(f"Unknown PDF backend: {backend}")
+    pages = min(pdf_page_count(source), max_pages)
+    first = "pypdf2" if backend == "auto" else backend
+    text = _extract_pages(source, first, pages, max_chars, workers)
+
+    if not text.strip() or (backend == "auto" and _looks_unusable(text, pages)):
+        other = "pdfplumber" if first == "pypdf2" else "pypdf2"
+        logger.info(f"{first} extracted {len(text.strip())} chars from {pages} pages; trying {other}")
+        if not isinstance(source, (str, os.PathLike)):
+            source.seek(0)
+        alternative = _extract_pages(source, other, pages, max_chars, workers)
+        if len(alternative.strip()) > len(text.strip()):
+            text = alternative
+    return text[:max_chars]
+
+
+def extract_text(source, file_type: str = None, max_pages: int = EXTRACT_MAX_PAGES,
+                 max_chars: int = EXTRACT_MAX_CHARS, backend: str = None) -> str:
+    """Join pages until max_pages or max_chars is reached, then stop reading the document"""
+    file_type = file_type or detect_file_type_at(source)
+    if file_type == "pdf":
+        return extract_pdf_text(source, backend, max_pages, max_chars)
+
+    parts = []
+    total = 0
+    pages = iter_pages(source, file_type)
+    try:
+        for index, page in enumerate(pages):
+            if index >= max_pages:
+                logger.info(f"Text extraction stopped at the {max_pages} page cap")
+                break
+            parts.append(page)
+            total += len(page)
+            if total >= max_chars:
+                break
+    finally:
+        pages.close()
+    return "".join(parts)[:max_chars]
+
+
+def extract_text_from_bytes(file_bytes: bytes, file_type: str = None, **limits) -> str:
+    return extract_text(io.BytesIO(file_bytes), file_type, **limits)
+
+
+# ---------- extracted text cache ----------
+
+text_cache = TieredCache(
+    "text",
+    memory_max_bytes=TEXT_CACHE_MEMORY_BYTES,
+    disk_dir=TEXT_CACHE_DIR if TEXT_CACHE_ENABLED else None,  # None unless TEXT_CACHE_DIR is set
+    disk_max_bytes=TEXT_CACHE_DISK_BYTES,
+    suffix=".json",
+)
+
+_HORIZONTAL_SPACE_RE = re.compile(r"[ \t\f\v\u00a0]+")
+_BLANK_LINES_RE = re.compile(r"\n{3,}")
+
+
+def normalize_text(text: str) -> str:
+    """NFKC-normalize, drop NULs and collapse runs of spaces and blank lines"""
+    text = unicodedata.normalize("NFKC", text).replace("\x00", "").replace("\r\n", "\n")
+    text = _HORIZONTAL_SPACE_RE.sub(" ", text)
+    text = "\n".join(line.strip() for line in text.split("\n"))
+    return _BLANK_LINES_RE.sub("\n\n", text).strip()
+
+
+def _text_cache_key(sha256: str, backend: str) -> str:
+    material = json.dumps([TEXT_CACHE_VERSION, sha256, backend or PDF_BACKEND, EXTRACT_MAX_PAGES, EXTRACT_MAX_CHARS])
+    return hashlib.sha256(material.encode("utf-8")).hexdigest()
+
+
+def _cached_text(sha256: str, backend: str, extract):
+    """Return (file_type, text), calling extract() -> (file_type, raw_text) only on a miss"""
+    key = _text_cache_key(sha256, backend)
+    if TEXT_CACHE_ENABLED:
+        cached = text_cache.get(key)
+        if cached is not None:
+            entry = json.loads(cached)
+            text_cache.record_saving(entry["parse_seconds"])
+            return entry["file_type"], entry["text"]
+
+    start_time = time.perf_counter()
+    file_type, text = extract()
+    text = normalize_text(text)
+    parse_seconds = time.perf_counter() - start_time
+    observe_stage("text_extract", parse_seconds)
+    if TEXT_CACHE_ENABLED:
+        entry = {"file_type": file_type, "text": text, "parse_seconds": parse_seconds}
+        text_cache.put(key, json.dumps(entry).encode("utf-8"))
+    return file_type, text
+
+
+def extract_upload_text(upload: SpooledUpload, backend: str = None) -> str:
+    """Normalized text of a spooled upload, served from text_cache when the same file was seen before"""
+    def extract():
+        if not upload.file_type:
+            raise ValueError("Unsupported file type")
+        source = upload.source
+        if (upload.file_type == "pdf" and source is upload.file and PDF_EXTRACT_WORKERS > 1
+                and min(pdf_page_count(source), EXTRACT_MAX_PAGES) >= PDF_PARALLEL_MIN_PAGES):
+            # Only PDFs long enough to be split across worker processes are copied out
+            source = upload.materialize()
+        elif source is upload.file:
+            source.seek(0)
+        return upload.file_type, extract_text(source, upload.file_type, backend=backend)
+
+    file_type, text = _cached_text(upload.sha256, backend, extract)
+    upload._file_type = file_type
+    return text
+
+
+def extract_bytes_text(file_bytes: bytes, backend: str = None) -> str:
+    """Normalized text of an in-memory file, cached like extract_upload_text"""
+    def extract():
+        file_type = detect_file_type_at(io.BytesIO(file_bytes))
+        if not file_type:
+            raise ValueError("Unsupported file type")
+        return file_type, extract_text_from_bytes(file_bytes, file_type, backend=backend)
+
+    return _cached_text(hashlib.sha256(file_bytes).hexdigest(), backend, extract)[1]
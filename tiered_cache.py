@@ -0,0 +1,206 @@
+import os
+import threading
+import uuid
+import logging
+from collections import OrderedDict, defaultdict
+from metrics import count_cache
+
+logger = logging.getLogger(__name__)
+
+
+class TieredCache:
+    """
+    Two-tier content-addressed byte cache: a bounded in-memory LRU in front of an
+    on-disk directory with size-based, least-recently-used eviction.
+
+    Keys must be hex digests (they are used as file names).
+
+    Args:
+        name (str): Label used in logs and stats
+        memory_max_bytes (int): Byte budget for the in-memory tier (0 disables it)
+        disk_dir (str, optional): Directory for the on-disk tier (None disables it)
+        disk_max_bytes (int): Byte budget for the on-disk tier
+        suffix (str): File extension for on-disk entries
+    """
+
+    def __init__(self, name: str, memory_max_bytes: int, disk_dir: str = None,
+                 disk_max_bytes: int = 0, suffix: str = ".bin"):
+        self.name = name
+        self.memory_max_bytes = memory_max_bytes
+        self.disk_dir = disk_dir
+        self.disk_max_bytes = disk_max_bytes
+        self.suffix = suffix
+
+        self._memory = OrderedDict()
+        self._memory_bytes = 0
+        self._disk_bytes = None  # computed lazily from a directory scan
+        self._lock = threading.Lock()
+        self._stats = defaultdict(int)
+
+        if disk_dir:
+            os.makedirs(disk_dir, exist_ok=True)
+
+    # ---------- memory tier ----------
+
+    def _memory_get(self, key):
+        value = self._memory.get(key)
+        if value is not None:
+            self._memory.move_to_end(key)
+        return value
+
+    def _memory_put(self, key, value: bytes):
+        if len(value) > self.memory_max_bytes:
+            return
+        old = self._memory.pop(key, None)
+        if old is not None:
+            self._memory_bytes -= len(old)
+        self._memory[key] = value
+        self._memory_bytes += len(value)
+        while self._memory_bytes > self.memory_max_bytes:
+            _, evicted = self._memory.popitem(last=False)
+            self._memory_bytes -= len(evicted)
+            self._stats["memory_evictions"] += 1
+
+    # ---------- disk tier ----------
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.disk_dir, key[:2], f"{key}{self.suffix}")
+
+    def _disk_get(self, key):
+        path = self._path(key)
+        try:
+            with open(path, "rb") as f:
+                value = f.read()
+            os.utime(path)  # mtime doubles as last-access time for eviction
+            return value
+        except OSError:
+            return None
+
+    def _disk_put(self, key, value: bytes):
+        path = self._path(key)
+        if len(value) > self.disk_max_bytes:
+            return
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(value)
+        try:
+            old_size = os.stat(path).st_size  # an overwrite replaces these bytes rather than adding to them
+        except OSError:
+            old_size = 0
+        os.replace(tmp_path, path)  # atomic, so concurrent workers never read partial files
+
+        with self._lock:
+            if self._disk_bytes is None:
+                self._disk_bytes = self._scan_disk_bytes()
+            else:
+                self._disk_bytes += len(value) - old_size
+            over_quota = self._disk_bytes > self.disk_max_bytes
+        if over_quota:
+            self._evict_disk()
+
+    def _disk_entries(self):
+        entries = []
+        for root, _, files in os.walk(self.disk_dir):
+            for filename in files:
+                if not filename.endswith(self.suffix):
+                    continue
+                path = os.path.join(root, filename)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, path))
+        return entries
+
+    def _scan_disk_bytes(self) -> int:
+        return sum(size for _, size, _ in self._disk_entries())
+
+    def _evict_disk(self):
+        """Delete least recently used files until the tier is back under 90% of quota"""
+        entries = sorted(self._disk_entries())
+        total = sum(size for _, size, _ in entries)
+        target = int(self.disk_max_bytes * 0.9)
+        evicted = 0
+        for _, size, path in entries:
+            if total <= target:
+                break
+            try:
+                os.remove(path)
+                total -= size
+                evicted += 1
+            except OSError:
+                pass
+        with self._lock:
+            self._disk_bytes = total
+            self._stats["disk_evictions"] += evicted
+        logger.info(f"[{self.name}] evicted {evicted} cache files, {total} bytes remain on disk")
+
+    # ---------- public API ----------
+
+    def get(self, key: str):
+        """Return cached bytes for key, or None on a miss"""
+        with self._lock:
+            value = self._memory_get(key) if self.memory_max_bytes else None
+            if value is not None:
+                self._stats["memory_hits"] += 1
+                self._stats["bytes_served"] += len(value)
+                count_cache(self.name, "memory_hit")
+                return value
+
+        value = self._disk_get(key) if self.disk_dir else None
+        with self._lock:
+            if value is None:
+                self._stats["misses"] += 1
+                count_cache(self.name, "miss")
+                return None
+            self._stats["disk_hits"] += 1
+            count_cache(self.name, "disk_hit")
+            self._stats["bytes_served"] += len(value)
+            if self.memory_max_bytes:
+                self._memory_put(key, value)
+        return value
+
+    def put(self, key: str, value: bytes):
+        with self._lock:
+            self._stats["stores"] += 1
+            if self.memory_max_bytes:
+                self._memory_put(key, value)
+        if self.disk_dir:
+            try:
+                self._disk_put(key, value)
+            except OSError as e:
+                logger.warning(f"[{self.name}] failed to write cache entry: {str(e)}")
+
+    def record_saving(self, seconds: float):
+        """Record work avoided by a hit (e.g. render or parse time)"""
+        with self._lock:
+            self._stats["seconds_saved_micro"] += int(seconds * 1_000_000)
+
+    def stats(self) -> dict:
+        with self._lock:
+            stats = dict(self._stats)
+            memory_entries = len(self._memory)
+            memory_bytes = self._memory_bytes
+            disk_bytes = self._disk_bytes
+        hits = stats.get("memory_hits", 0) + stats.get("disk_hits", 0)
+        lookups = hits + stats.get("misses", 0)
+        return {
+            "name": self.name,
+            "hits": hits,
+            "memory_hits": stats.get("memory_hits", 0),
+            "disk_hits": stats.get("disk_hits", 0),
+            "misses": stats.get("misses", 0),
+            "hit_ratio": round(hits / lookups, 4) if lookups else 0.0,
+            "bytes_served_from_cache": stats.get("bytes_served", 0),
+            "seconds_saved": round(stats.get("seconds_saved_micro", 0) / 1_000_000, 3),
+            "stores": stats.get("stores", 0),
+            "memory_entries": memory_entries,
+            "memory_bytes": memory_bytes,
+            "memory_max_bytes": self.memory_max_bytes,
+            "memory_evictions": stats.get("memory_evictions", 0),
+            "disk_dir": self.disk_dir,
+            "disk_bytes": disk_bytes,
+            "disk_max_bytes": self.disk_max_bytes,
+            "disk_evictions": stats.get("disk_evictions", 0),
+        }
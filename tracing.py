@@ -0,0 +1,308 @@
+import contextvars
+import json
+import os
+import queue
+import random
+import re
+import tempfile
+import threading
+import time
+import logging
+from collections import defaultdict
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+# ========== TRACING CONFIGURATION ==========
+
+# Opt-in: traces cost a little per request and can be exported off the host
+TRACING_ENABLED = os.getenv("TRACING_ENABLED", "false").lower() == "true"
+TRACE_SAMPLE_RATE = float(os.getenv("TRACE_SAMPLE_RATE", 1.0))
+TRACE_EXPORTER = os.getenv("TRACE_EXPORTER", "none").lower()  # none | jsonl | otlp
+TRACE_FILE = os.getenv("TRACE_FILE", os.path.join(tempfile.gettempdir(), "resume_traces.jsonl"))
+# OTLP/HTTP JSON endpoint of a local collector (OpenTelemetry Collector, Jaeger, Tempo...)
+OTLP_ENDPOINT = os.getenv("OTLP_ENDPOINT", "http://localhost:4318/v1/traces")
+TRACE_SERVICE_NAME = os.getenv("TRACE_SERVICE_NAME", "resume-generator")
+# Add a Server-Timing header so browser devtools show the span breakdown. Off by
+# default: it tells every client the internal stage names, timings and cache hits
+TRACE_SERVER_TIMING = os.getenv("TRACE_SERVER_TIMING", "false").lower() == "true"
+TRACE_EXPORT_QUEUE = int(os.getenv("TRACE_EXPORT_QUEUE", 1000))
+TRACE_EXPORT_BATCH = 64
+
+_SERVER_TIMING_NAME_RE = re.compile(r"[^A-Za-z0-9_.-]")
+
+
+class Span:
+    __slots__ = ("name", "span_id", "parent_id", "start_ns", "end_ns", "attributes")
+
+    def __init__(self, name: str, parent_id: str = None, attributes: dict = None, start_ns: int = None):
+        self.name = name
+        self.span_id = os.urandom(8).hex()
+        self.parent_id = parent_id
+        self.start_ns = start_ns if start_ns is not None else time.time_ns()
+        self.end_ns = None
+        self.attributes = attributes or {}
+
+    @property
+    def duration_ms(self) -> float:
+        return ((self.end_ns or time.time_ns()) - self.start_ns) / 1e6
+
+    def to_dict(self) -> dict:
+        return {
+            "name": self.name, "span_id": self.span_id, "parent_id": self.parent_id,
+            "start_ns": self.start_ns, "end_ns": self.end_ns, "attributes": self.attributes,
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict):
+        span = cls(data["name"], data["parent_id"], data["attributes"], data["start_ns"])
+        span.span_id = data["span_id"]
+        span.end_ns = data["end_ns"]
+        return span
+
+
+class Trace:
+    """All spans of one request; the root span covers the whole request"""
+
+    def __init__(self, name: str, request_id: str = None, attributes: dict = None):
+        self.trace_id = os.urandom(16).hex()
+        self.request_id = request_id
+        self.root = Span(name, attributes=attributes)
+        self.spans = [self.root]
+
+    def server_timing(self) -> str:
+        """Server-Timing value: total plus the summed duration of each finished span name"""
+        totals = defaultdict(float)
+        for span in self.spans[1:]:
+            if span.end_ns is not None:
+                totals[span.name] += span.duration_ms
+        entries = [f"total;dur={self.root.duration_ms:.1f}"]
+        entries += [f"{_SERVER_TIMING_NAME_RE.sub('_', name)};dur={ms:.1f}" for name, ms in totals.items()]
+        return ", ".join(entries)
+
+    def to_dict(self) -> dict:
+        return {
+            "trace_id": self.trace_id,
+            "request_id": self.request_id,
+            "name": self.root.name,
+            "duration_ms": round(self.root.duration_ms, 3),
+            "spans": [span.to_dict() for span in self.spans],
+        }
+
+
+# (trace, current span) for the running request; None outside traced requests
+_active = contextvars.ContextVar("active_trace", default=None)
+
+
+def active() -> bool:
+    return _active.get() is not None
+
+
+@contextmanager
+def span(name: str, **attributes):
+    """Record the with-block as a child of the current span; a no-op outside a traced request"""
+    current = _active.get()
+    if current is None:
+        yield None
+        return
+    trace, parent = current
+    child = Span(name, parent.span_id, attributes)
+    trace.spans.append(child)
+    token = _active.set((trace, child))
+    try:
+        yield child
+    finally:
+        child.end_ns = time.time_ns()
+        _active.reset(token)
+
+
+def record_span(name: str, seconds: float, **attributes):
+    """Add a span that ended just now, for stages that time themselves"""
+    current = _active.get()
+    if current is None:
+        return
+    trace, parent = current
+    end_ns = time.time_ns()
+    child = Span(name, parent.span_id, attributes, start_ns=end_ns - int(seconds * 1e9))
+    child.end_ns = end_ns
+    trace.spans.append(child)
+
+
+def run_traced(fn, *args, **kwargs):
+    """
+    Run fn in a pool worker under a throwaway trace and return (result, spans).
+    Context variables do not cross into executor threads or processes, so the
+    caller re-parents the spans with adopt().
+    """
+    trace = Trace("worker")
+    token = _active.set((trace, trace.root))
+    try:
+        result = fn(*args, **kwargs)
+    finally:
+        _active.reset(token)
+    return result, [span.to_dict() for span in trace.spans[1:]]
+
+
+def adopt(spans: list):
+    """Attach spans returned by run_traced under the current span"""
+    current = _active.get()
+    if current is None or not spans:
+        return
+    trace, parent = current
+    worker_root = spans[0]["parent_id"]
+    for data in spans:
+        child = Span.from_dict(data)
+        if child.parent_id == worker_root:
+            child.parent_id = parent.span_id
+        trace.spans.append(child)
+
+
+# ========== EXPORTERS ==========
+
+class JSONLinesExporter:
+    """One JSON trace per line, appended to a file shared by all workers"""
+
+    def __init__(self, path: str = TRACE_FILE):
+        self.path = path
+
+    def export(self, traces: list):
+        lines = "".join(json.dumps(trace.to_dict(), separators=(",", ":")) + "\n" for trace in traces)
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write(lines)
+
+
+class OTLPExporter:
+    """POSTs OTLP/HTTP JSON to a collector"""
+
+    def __init__(self, endpoint: str = OTLP_ENDPOINT, service_name: str = TRACE_SERVICE_NAME, timeout: float = 5):
+        self.endpoint = endpoint
+        self.service_name = service_name
+        self.timeout = timeout
+
+    @staticmethod
+    def _attributes(attributes: dict) -> list:
+        encoded = []
+        for key, value in attributes.items():
+            if isinstance(value, bool):
+                encoded.append({"key": key, "value": {"boolValue": value}})
+            elif isinstance(value, int):
+                encoded.append({"key": key, "value": {"intValue": str(value)}})
+            elif isinstance(value, float):
+                encoded.append({"key": key, "value": {"doubleValue": value}})
+            else:
+                encoded.append({"key": key, "value": {"stringValue": str(value)}})
+        return encoded
+
+    def payload(self, traces: list) -> dict:
+        spans = []
+        for trace in traces:
+            for span in trace.spans:
+                attributes = dict(span.attributes)
+                if span is trace.root and trace.request_id:
+                    attributes["http.request_id"] = trace.request_id
+                spans.append({
+                    "traceId": trace.trace_id,
+                    "spanId": span.span_id,
+                    "parentSpanId": span.parent_id or "",
+                    "name": span.name,
+                    "kind": 2 if span is trace.root else 1,  # SERVER / INTERNAL
+                    "startTimeUnixNano": str(span.start_ns),
+                    "endTimeUnixNano": str(span.end_ns or span.start_ns),
+                    "attributes": self._attributes(attributes),
+                })
+        return {"resourceSpans": [{
+            "resource": {"attributes": self._attributes({"service.name": self.service_name})},
+            "scopeSpans": [{"scope": {"name": "tracing"}, "spans": spans}],
+        }]}
+
+    def export(self, traces: list):
+        import requests
+        response = requests.post(self.endpoint, json=self.payload(traces), timeout=self.timeout)
+        response.raise_for_status()
+
+
+class Tracer:
+    """
+    Starts a trace per request and exports finished traces from a background
+    thread, so a slow file or collector never delays responses. When the export
+    queue is full, traces are dropped and counted.
+    """
+
+    def __init__(self, exporter=None, sample_rate: float = TRACE_SAMPLE_RATE, server_timing: bool = TRACE_SERVER_TIMING,
+                 max_queue: int = TRACE_EXPORT_QUEUE):
+        self.exporter = exporter
+        self.sample_rate = sample_rate
+        self.server_timing = server_timing
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._thread = None
+        self._lock = threading.Lock()
+        self._stats = defaultdict(int)
+
+    def start(self, name: str, request_id: str = None, **attributes):
+        """Begin a trace and make it current; returns (trace, token) or None when not sampled"""
+        if self.sample_rate < 1.0 and random.random() >= self.sample_rate:
+            return None
+        trace = Trace(name, request_id, attributes)
+        return trace, _active.set((trace, trace.root))
+
+    def finish(self, started, **attributes):
+        trace, token = started
+        trace.root.end_ns = time.time_ns()
+        trace.root.attributes.update(attributes)
+        _active.reset(token)
+        self._stats["traces"] += 1
+        if self.exporter is None:
+            return
+        self._ensure_thread()
+        try:
+            self._queue.put_nowait(trace)
+        except queue.Full:
+            self._stats["dropped"] += 1
+
+    def _ensure_thread(self):
+        if self._thread is None:
+            with self._lock:
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._export_loop, name="trace-export", daemon=True)
+                    self._thread.start()
+
+    def _export_loop(self):
+        while True:
+            batch = [self._queue.get()]
+            while len(batch) < TRACE_EXPORT_BATCH:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            try:
+                self.exporter.export(batch)
+                self._stats["exported"] += len(batch)
+            except Exception as e:
+                self._stats["export_errors"] += 1
+                self._stats["dropped"] += len(batch)
+                logger.warning(f"Trace export failed, dropped {len(batch)} traces: {str(e)}")
+
+    def stats(self) -> dict:
+        return {
+            "exporter": type(self.exporter).__name__ if self.exporter else None,
+            "sample_rate": self.sample_rate,
+            "server_timing": self.server_timing,
+            "traces": self._stats["traces"],
+            "exported": self._stats["exported"],
+            "dropped": self._stats["dropped"],
+            "export_errors": self._stats["export_errors"],
+            "queued": self._queue.qsize(),
+        }
+
+
+def make_tracer():
+    if not TRACING_ENABLED:
+        return None
+    if TRACE_EXPORTER == "otlp":
+        exporter = OTLPExporter()
+    elif TRACE_EXPORTER == "jsonl":
+        exporter = JSONLinesExporter()
+    else:
+        exporter = None
+    logger.info(f"Tracing enabled, exporter: {TRACE_EXPORTER}")
+    return Tracer(exporter)
@@ -0,0 +1,58 @@
+import time
+import zipfile
+
+
+class _ChunkSink:
+    """
+    Write-only file object for ZipFile. It has no tell/seek, so zipfile writes each
+    entry with a trailing data descriptor instead of seeking back to patch the header.
+    """
+
+    def __init__(self):
+        self._chunks = []
+
+    def write(self, data) -> int:
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self) -> bytes:
+        data, self._chunks = b"".join(self._chunks), []
+        return data
+
+
+class ZipStream:
+    """
+    Build a ZIP archive incrementally: each add() returns the bytes of that entry,
+    ready to send, and close() returns the central directory. Only the entry being
+    written is held in memory.
+
+    Args:
+        compression (int): zipfile compression method; PDFs are already deflated
+            internally, so ZIP_STORED (the default) saves CPU for little size
+    """
+
+    def __init__(self, compression: int = zipfile.ZIP_STORED):
+        self._sink = _ChunkSink()
+        self._zip = zipfile.ZipFile(self._sink, mode="w", compression=compression)
+        self.entries = 0
+        self.bytes_written = 0
+
+    def _drain(self) -> bytes:
+        data = self._sink.drain()
+        self.bytes_written += len(data)
+        return data
+
+    def add(self, name: str, data: bytes) -> bytes:
+        info = zipfile.ZipInfo(name, date_time=time.localtime()[:6])
+        info.compress_type = self._zip.compression
+        info.external_attr = 0o644 << 16
+        self._zip.writestr(info, data)
+        self.entries += 1
+        return self._drain()
+
+    def close(self) -> bytes:
+        self._zip.close()
+        return self._drain()